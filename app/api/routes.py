@@ -1,74 +1,188 @@
 """
 API routes for StudyGenie AI Backend
 """
-import os
+import sqlite3
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, List, Optional
 from flask import Blueprint, request, jsonify
-from werkzeug.utils import secure_filename
 
-from app.config import Config
+from app.schemas.study_set_schema import (
+    StudySetResponse,
+    CourseDocumentInfo,
+    CourseStudySetResponse,
+)
+from app.services.grading_service import InvalidSubmissionsError, grade
 from app.services.pdf_service import PDFService
 from app.services.quiz_service import QuizService
-from app.schemas.quiz_schema import SkillMapResponse, QuizResponse
-from app.schemas.interview_schema import InterviewResponse
+from app.services.revision_service import RevisionService
+from app.api.validators import (
+    COURSE_UPLOAD_SIGNATURES,
+    CourseDocument,
+    RequestValidationError,
+    receive_files,
+    validate_upload_file,
+    validate_pdf_upload,
+    validate_course_files,
+    collect_course_documents,
+    parse_upload_params,
+    parse_document_id,
+    parse_study_set_query,
+    parse_topic_quiz_params,
+    parse_flashcard_params,
+    parse_coding_challenge_params,
+    parse_grading_params,
+)
+from app.utils import deadline
+from app.utils.compression import EncodedPayload, payload_response
+from app.utils.deadline import DeadlineExceeded
+from app.utils.executors import submit_pdf_task, pdf_offload_timer
+from app.utils.result_cache import extracted_text_cache, study_set_cache
+from app.utils.study_set_store import study_set_store, UnknownFieldsError
+from app.utils.usage_ledger import usage_ledger
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
 
-def allowed_file(filename: str) -> bool:
+@api_bp.errorhandler(RequestValidationError)
+def handle_request_validation_error(error: RequestValidationError):
+    return jsonify(error.to_dict()), error.status
+
+
+def study_set_cache_key(digest: str, params: Dict[str, int]) -> tuple:
+    return (digest, params["quiz_questions"], params["interview_questions"])
+
+
+def course_cache_key(documents: List[CourseDocument], params: Dict[str, int]) -> tuple:
     return (
-        "." in filename
-        and filename.rsplit(".", 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+        "course",
+        tuple(d.digest for d in documents),
+        params["quiz_questions"],
+        params["interview_questions"],
+    )
+
+
+def store_study_set(payload: EncodedPayload, kind: str) -> Optional[str]:
+    """
+    Persist a served study set for GET /study-sets/<id>
+
+    Store failures are logged, not raised: the generated result is
+    still returned to the client.
+    """
+    if not study_set_store.enabled:
+        return None
+    try:
+        return study_set_store.put(payload, kind)
+    except (sqlite3.Error, OSError, ValueError) as e:
+        print(f"[STUDY_SET_STORE_WARNING] {e}")
+        return None
+
+
+def study_set_headers(payload: EncodedPayload, kind: str, cache: str) -> Dict[str, str]:
+    """X-Cache and X-Study-Set-Id headers of an upload response"""
+    usage_ledger.record_study_set(kind, cache)
+    headers = {"X-Cache": cache}
+    set_id = store_study_set(payload, kind)
+    if set_id:
+        headers["X-Study-Set-Id"] = set_id
+    return headers
+
+
+def extract_cached_text(digest: str, filepath: str) -> str:
+    """Cleaned PDF text, reusing the extraction of an identical upload"""
+    text = extracted_text_cache.get(digest)
+    if text is None:
+        deadline.check("pdf_extract")
+        text = PDFService.extract_text(filepath, deadline.expires_at())
+        extracted_text_cache.put(digest, text)
+    return text
+
+
+def extract_course_texts(documents: List[CourseDocument]) -> List[str]:
+    """
+    Cleaned text of every course document, extracting the uncached
+    ones concurrently on the PDF executor
+    """
+    texts = [extracted_text_cache.get(d.digest) for d in documents]
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if missing:
+        deadline.check("pdf_extract")
+        expiry = deadline.expires_at()
+        with pdf_offload_timer():
+            futures = [
+                submit_pdf_task(PDFService.extract_text, documents[i].path, expiry)
+                for i in missing
+            ]
+            for i, future in zip(missing, futures):
+                try:
+                    texts[i] = future.result(timeout=deadline.remaining())
+                except FutureTimeoutError:
+                    raise deadline.exceeded("pdf_extract")
+                extracted_text_cache.put(documents[i].digest, texts[i])
+    return texts
+
+
+def unreadable_course_document(documents: List[CourseDocument], texts: List[str]):
+    """First document whose extracted text is too short to use, if any"""
+    for document, text in zip(documents, texts):
+        if not text or len(text.strip()) < 50:
+            return document
+    return None
+
+
+def course_response(
+    result: StudySetResponse,
+    documents: List[CourseDocument],
+    texts: List[str]
+) -> CourseStudySetResponse:
+    """Attach the document list to a (validated) course study set"""
+    return CourseStudySetResponse.model_construct(
+        **{name: getattr(result, name) for name in StudySetResponse.model_fields},
+        documents=[
+            CourseDocumentInfo(
+                filename=d.filename, page_count=d.info.page_count, characters=len(text)
+            )
+            for d, text in zip(documents, texts)
+        ],
     )
 
 
 @api_bp.route("/upload-pdf", methods=["POST"])
 def upload_pdf():
     # -----------------------
-    # 1. Validate request
+    # 1. Receive & validate request
+    # (streamed to disk, hashed and sniffed; the file is removed when
+    # the request closes)
     # -----------------------
-    if "file" not in request.files:
-        return jsonify({
-            "error": "No file provided",
-            "message": "Please upload a PDF file using form-data with key 'file'"
-        }), 400
-
-    file = request.files["file"]
-
-    if file.filename == "":
-        return jsonify({
-            "error": "Empty filename",
-            "message": "Please select a PDF file"
-        }), 400
-
-    if not allowed_file(file.filename):
-        return jsonify({
-            "error": "Invalid file type",
-            "message": "Only PDF files are allowed"
-        }), 400
+    file = validate_upload_file(receive_files(request))
 
     # -----------------------
     # 2. Read optional params
     # -----------------------
-    quiz_questions = request.form.get("quiz_questions", 10, type=int)
-    interview_questions = request.form.get("interview_questions", 10, type=int)
+    params = parse_upload_params(request.form)
+    document_id = parse_document_id(request.form)
 
-    quiz_questions = max(1, min(quiz_questions, 50))
-    interview_questions = max(1, min(interview_questions, 50))
+    # -----------------------
+    # 3. Inspect PDF structure (header, trailer, pages, scanned)
+    # -----------------------
+    validate_pdf_upload(file)
+    upload = file.stream
 
     # -----------------------
-    # 3. Save file
+    # 4. Serve a cached result for identical uploads (not for a named
+    # document, whose version and revision headers must be kept current)
     # -----------------------
-    filename = secure_filename(file.filename)
-    filepath = os.path.join(Config.UPLOAD_FOLDER, filename)
+    cache_key = study_set_cache_key(upload.digest, params)
+    cached = study_set_cache.get(cache_key) if not document_id else None
+    if cached is not None:
+        response = payload_response(cached)
+        response.headers.update(study_set_headers(cached, "syllabus", "HIT"))
+        return response
 
     try:
-        file.save(filepath)
-
         # -----------------------
-        # 4. Extract PDF text
+        # 5. Extract PDF text
         # -----------------------
-        pdf_service = PDFService()
-        extracted_text = pdf_service.extract_text(filepath)
+        extracted_text = extract_cached_text(upload.digest, upload.path)
 
         if not extracted_text or len(extracted_text.strip()) < 50:
             return jsonify({
@@ -77,32 +191,29 @@ def upload_pdf():
             }), 400
 
         # -----------------------
-        # 5. Generate AI outputs
+        # 6. Generate AI outputs (only changed sections of a revised
+        # document are sent to the LLM)
         # -----------------------
-        quiz_service = QuizService()
-        result = quiz_service.process_syllabus(
+        result, revision = RevisionService().process(
             syllabus_text=extracted_text,
-            quiz_questions=quiz_questions,
-            interview_questions=interview_questions
+            quiz_questions=params["quiz_questions"],
+            interview_questions=params["interview_questions"],
+            document_id=document_id
         )
 
         # -----------------------
-        # 6. Validate with schemas (soft validation)
+        # 7. Success response (already schema-validated), serialized once
         # -----------------------
-        try:
-            result["skill_map"] = SkillMapResponse(**result["skill_map"]).model_dump()
-            result["quiz"] = QuizResponse(**result["quiz"]).model_dump()
-            result["interview_qa"] = InterviewResponse(
-                **result["interview_qa"]
-            ).model_dump()
-        except Exception as schema_error:
-            print(f"[Schema validation warning] {schema_error}")
-
-        # -----------------------
-        # 7. Success response
-        # -----------------------
-        return jsonify(result), 200
+        payload = EncodedPayload.from_object(result)
+        study_set_cache.put(cache_key, payload)
+        response = payload_response(payload)
+        response.headers.update(study_set_headers(payload, "syllabus", "MISS"))
+        response.headers["X-Document-Id"] = revision.document_id
+        response.headers["X-Revision"] = revision.header()
+        return response
 
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         print(f"[UPLOAD_PDF_ERROR] {e}")
         return jsonify({
@@ -110,15 +221,95 @@ def upload_pdf():
             "message": str(e)
         }), 500
 
-    finally:
+
+@api_bp.route("/upload-course", methods=["POST"])
+def upload_course():
+    """
+    Generate one study set from several PDFs (or a zip of PDFs)
+    """
+    # -----------------------
+    # 1. Receive & validate request (PDFs and zip archives)
+    # -----------------------
+    request.upload_signatures = COURSE_UPLOAD_SIGNATURES
+    uploads = validate_course_files(receive_files(request))
+    params = parse_upload_params(request.form)
+
+    # -----------------------
+    # 2. Expand archives, inspect every PDF
+    # -----------------------
+    documents = collect_course_documents(request, uploads)
+
+    # -----------------------
+    # 3. Serve a cached result for identical uploads
+    # -----------------------
+    cache_key = course_cache_key(documents, params)
+    cached = study_set_cache.get(cache_key)
+    if cached is not None:
+        response = payload_response(cached)
+        response.headers.update(study_set_headers(cached, "course", "HIT"))
+        return response
+
+    try:
+        # -----------------------
+        # 4. Extract all documents concurrently
+        # -----------------------
+        texts = extract_course_texts(documents)
+
+        unreadable = unreadable_course_document(documents, texts)
+        if unreadable is not None:
+            return jsonify({
+                "error": "Invalid PDF content",
+                "message": f"{unreadable.filename}: PDF is empty or contains no readable text"
+            }), 400
+
         # -----------------------
-        # 8. Cleanup
+        # 5. Generate one merged study set
         # -----------------------
-        try:
-            if os.path.exists(filepath):
-                os.remove(filepath)
-        except Exception as cleanup_error:
-            print(f"[Cleanup warning] {cleanup_error}")
+        result = QuizService().process_course(
+            documents=[(d.filename, text) for d, text in zip(documents, texts)],
+            quiz_questions=params["quiz_questions"],
+            interview_questions=params["interview_questions"]
+        )
+
+        payload = EncodedPayload.from_object(course_response(result, documents, texts))
+        study_set_cache.put(cache_key, payload)
+        response = payload_response(payload)
+        response.headers.update(study_set_headers(payload, "course", "MISS"))
+        return response
+
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        print(f"[UPLOAD_COURSE_ERROR] {e}")
+        return jsonify({
+            "error": "Processing error",
+            "message": str(e)
+        }), 500
+
+
+@api_bp.route("/study-sets/<set_id>", methods=["GET"])
+def get_study_set(set_id: str):
+    """
+    Fetch a stored study set, optionally only some top-level fields
+    """
+    fields = parse_study_set_query(set_id, request.args)
+
+    try:
+        body = study_set_store.get(set_id, fields) if study_set_store.enabled else None
+    except UnknownFieldsError as e:
+        return jsonify({
+            "error": "Invalid fields",
+            "message": f"Unknown fields: {', '.join(e.unknown)}; available: {', '.join(e.available)}"
+        }), 400
+
+    if body is None:
+        return jsonify({
+            "error": "Not found",
+            "message": "Study set not found (it may have been evicted)"
+        }), 404
+
+    # Conditional GETs are answered with 304 by the compression hook
+    return payload_response(EncodedPayload(body))
 
 
 @api_bp.route("/generate-quiz", methods=["POST"])
@@ -127,47 +318,16 @@ def generate_quiz():
     Generate quiz questions for a specific topic
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({
-                "error": "Invalid request",
-                "message": "Request body must be JSON"
-            }), 400
-        
-        topic = data.get("topic", "")
-        difficulty = data.get("difficulty", "medium").lower()
-        num_questions = data.get("num_questions", 10)
-        
-        if not topic:
-            return jsonify({
-                "error": "Missing topic",
-                "message": "Please provide a topic name"
-            }), 400
-        
-        # Validate difficulty
-        if difficulty not in ["easy", "medium", "hard"]:
-            difficulty = "medium"
-        
-        # Validate and cap question count
-        num_questions = max(1, min(int(num_questions), 20))
-        
+        params = parse_topic_quiz_params(request.get_json())
+
         # Generate quiz using AI service
         quiz_service = QuizService()
-        quiz_data = quiz_service.generate_topic_quiz(
-            topic=topic,
-            difficulty=difficulty,
-            num_questions=num_questions
-        )
-        
-        # Validate response
-        try:
-            quiz_response = QuizResponse(**quiz_data).model_dump()
-            return jsonify(quiz_response), 200
-        except Exception as schema_error:
-            print(f"[Schema validation warning] {schema_error}")
-            return jsonify(quiz_data), 200
-            
+        quiz_data = quiz_service.generate_topic_quiz(**params)
+
+        return jsonify(quiz_data), 200
+
+    except (RequestValidationError, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"[GENERATE_QUIZ_ERROR] {e}")
         return jsonify({
@@ -182,35 +342,16 @@ def generate_flashcards():
     Generate flashcards for a specific topic
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({
-                "error": "Invalid request",
-                "message": "Request body must be JSON"
-            }), 400
-        
-        topic = data.get("topic", "")
-        num_cards = data.get("num_cards", 10)
-        
-        if not topic:
-            return jsonify({
-                "error": "Missing topic",
-                "message": "Please provide a topic name"
-            }), 400
-        
-        # Validate and cap card count
-        num_cards = max(1, min(int(num_cards), 20))
-        
+        params = parse_flashcard_params(request.get_json())
+
         # Generate flashcards using AI service
         quiz_service = QuizService()
-        flashcards_data = quiz_service.generate_topic_flashcards(
-            topic=topic,
-            num_cards=num_cards
-        )
-        
+        flashcards_data = quiz_service.generate_topic_flashcards(**params)
+
         return jsonify(flashcards_data), 200
-            
+
+    except (RequestValidationError, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"[GENERATE_FLASHCARDS_ERROR] {e}")
         return jsonify({
@@ -225,41 +366,43 @@ def generate_coding_challenge():
     Generate coding challenge for a specific topic
     """
     try:
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({
-                "error": "Invalid request",
-                "message": "Request body must be JSON"
-            }), 400
-        
-        topic = data.get("topic", "")
-        difficulty = data.get("difficulty", "medium").lower()
-        language = data.get("language", "python")
-        
-        if not topic:
-            return jsonify({
-                "error": "Missing topic",
-                "message": "Please provide a topic name"
-            }), 400
-        
-        # Validate difficulty
-        if difficulty not in ["easy", "medium", "hard"]:
-            difficulty = "medium"
-        
+        params = parse_coding_challenge_params(request.get_json())
+
         # Generate coding challenge using AI service
         quiz_service = QuizService()
-        challenge_data = quiz_service.generate_coding_challenge(
-            topic=topic,
-            difficulty=difficulty,
-            language=language
-        )
-        
+        challenge_data = quiz_service.generate_coding_challenge(**params)
+
         return jsonify(challenge_data), 200
-            
+
+    except (RequestValidationError, DeadlineExceeded):
+        raise
     except Exception as e:
         print(f"[GENERATE_CODING_CHALLENGE_ERROR] {e}")
         return jsonify({
             "error": "Processing error",
             "message": str(e)
         }), 500
+
+
+@api_bp.route("/grade-quiz", methods=["POST"])
+def grade_quiz():
+    """
+    Grade a class's submissions to a quiz (no LLM call)
+    """
+    try:
+        params = parse_grading_params(request.get_json())
+        return jsonify(grade(**params)), 200
+
+    except RequestValidationError:
+        raise
+    except InvalidSubmissionsError as e:
+        return jsonify({
+            "error": "Invalid submissions",
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        print(f"[GRADE_QUIZ_ERROR] {e}")
+        return jsonify({
+            "error": "Processing error",
+            "message": str(e)
+        }), 500
@@ -0,0 +1,399 @@
+"""
+Request parameter parsing shared by the Flask routes and the ASGI
+serving mode
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.config import Config
+from app.schemas.quiz_schema import QuizResponse
+from app.services.pdf_service import PDFService, PDFInfo, InvalidPDFError
+from app.utils.metrics import stage_timer
+from app.utils.serialization import loads
+from app.utils.study_set_store import study_set_store
+from app.utils.upload_stream import (
+    HashingUploadStream,
+    UploadRejected,
+    PDF_MAGIC,
+    ZIP_MAGIC,
+    expand_zip,
+)
+
+VALID_DIFFICULTIES = ("easy", "medium", "hard")
+
+# Client-chosen ids of documents re-uploaded as new versions
+_DOCUMENT_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+# Study set ids are content hashes (see app.utils.study_set_store)
+_STUDY_SET_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+# Content accepted by /upload-course: PDFs and zip archives of PDFs
+COURSE_UPLOAD_SIGNATURES = (PDF_MAGIC, ZIP_MAGIC)
+
+
+class RequestValidationError(Exception):
+    """Invalid client input, rendered as a JSON error response"""
+
+    def __init__(self, error: str, message: str, status: int = 400):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.status = status
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"error": self.error, "message": self.message}
+
+
+def allowed_file(filename: str, extensions=None) -> bool:
+    return (
+        "." in filename
+        and filename.rsplit(".", 1)[1].lower() in (extensions or Config.ALLOWED_EXTENSIONS)
+    )
+
+
+def _clamp(value: Any, low: int, high: int) -> int:
+    return max(low, min(int(value), high))
+
+
+def _require_json(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not data:
+        raise RequestValidationError("Invalid request", "Request body must be JSON")
+    return data
+
+
+def _require_topic(data: Dict[str, Any]) -> str:
+    topic = data.get("topic", "")
+    if not topic:
+        raise RequestValidationError("Missing topic", "Please provide a topic name")
+    return topic
+
+
+def _difficulty(data: Dict[str, Any]) -> str:
+    difficulty = data.get("difficulty", "medium").lower()
+    # Validate difficulty
+    return difficulty if difficulty in VALID_DIFFICULTIES else "medium"
+
+
+def validate_upload_file(files) -> Any:
+    """
+    Check the uploaded 'file' field of a multipart request
+
+    Returns:
+        The uploaded FileStorage
+    """
+    if "file" not in files:
+        raise RequestValidationError(
+            "No file provided",
+            "Please upload a PDF file using form-data with key 'file'"
+        )
+
+    file = files["file"]
+
+    if file.filename == "":
+        raise RequestValidationError("Empty filename", "Please select a PDF file")
+
+    if not allowed_file(file.filename):
+        raise RequestValidationError("Invalid file type", "Only PDF files are allowed")
+
+    return file
+
+
+def receive_files(request):
+    """
+    Read the multipart body of an ingest request
+
+    Uploads are streamed to disk, hashed and sniffed while this runs;
+    a non-PDF stops the read at the first chunk.
+    """
+    try:
+        with stage_timer("upload_receive"):
+            return request.files
+    except UploadRejected as e:
+        raise RequestValidationError(e.error, e.message)
+
+
+def validate_pdf_upload(file) -> PDFInfo:
+    """
+    Check an ingested PDF before text extraction
+
+    Verifies the %PDF header and %%EOF trailer seen while streaming,
+    then inspects the page tree: password-protected, page-less and
+    image-only (scanned) documents are rejected.
+    """
+    stream = file.stream
+    if not isinstance(stream, HashingUploadStream):
+        raise TypeError("Uploads must be received through an ingest request class")
+    return validate_pdf_stream(stream)
+
+
+def validate_pdf_stream(stream: HashingUploadStream) -> PDFInfo:
+    """validate_pdf_upload for a stream (e.g. an archive member)"""
+    if not stream.is_pdf:
+        raise RequestValidationError("Invalid file type", "File content is not a PDF")
+    if not stream.has_pdf_trailer:
+        raise RequestValidationError("Invalid PDF", "PDF is truncated (missing %%EOF trailer)")
+
+    try:
+        info = PDFService.inspect(stream.finish())
+    except InvalidPDFError as e:
+        raise RequestValidationError("Invalid PDF", str(e))
+
+    if info.image_only:
+        raise RequestValidationError(
+            "Scanned PDF",
+            "PDF pages contain only images; scanned documents are not supported"
+        )
+    if info.text_pages == 0:
+        raise RequestValidationError(
+            "Invalid PDF content", "PDF is empty or contains no readable text"
+        )
+    return info
+
+
+@dataclass
+class CourseDocument:
+    """A validated PDF of a course upload"""
+    filename: str
+    stream: HashingUploadStream
+    info: PDFInfo
+
+    @property
+    def digest(self) -> str:
+        return self.stream.digest
+
+    @property
+    def path(self) -> str:
+        return self.stream.path
+
+
+def validate_course_files(files) -> List[Any]:
+    """
+    Check the uploaded 'files' (or 'file') fields of a course upload
+
+    Returns:
+        The uploaded FileStorages, PDFs or zip archives
+    """
+    uploads = [
+        f for f in files.getlist("files") + files.getlist("file") if f.filename
+    ]
+    if not uploads:
+        raise RequestValidationError(
+            "No file provided",
+            "Please upload PDF files (or a zip of PDFs) using form-data with key 'files'"
+        )
+
+    for file in uploads:
+        if not (
+            allowed_file(file.filename)
+            or allowed_file(file.filename, Config.ALLOWED_ARCHIVE_EXTENSIONS)
+        ):
+            raise RequestValidationError(
+                "Invalid file type", f"{file.filename}: only PDF or ZIP files are allowed"
+            )
+    return uploads
+
+
+def collect_course_documents(request, uploads: List[Any]) -> List[CourseDocument]:
+    """
+    Expand zip uploads and validate every PDF of a course upload
+
+    Member files are registered with the ingest request, so they are
+    removed when it closes. Byte-identical documents are kept once.
+
+    Raises:
+        RequestValidationError naming the offending file
+    """
+    pending = []
+    for file in uploads:
+        stream = file.stream
+        if not isinstance(stream, HashingUploadStream):
+            raise TypeError("Uploads must be received through an ingest request class")
+
+        if not allowed_file(file.filename, Config.ALLOWED_ARCHIVE_EXTENSIONS):
+            pending.append((file.filename, stream))
+            continue
+
+        if not stream.head.startswith(ZIP_MAGIC):
+            raise RequestValidationError(
+                "Invalid file type", f"{file.filename}: file content is not a ZIP archive"
+            )
+        try:
+            with stage_timer("archive_extract"):
+                members = expand_zip(
+                    stream,
+                    lambda name: request.open_upload_stream(name, (PDF_MAGIC,)),
+                    max_members=Config.MAX_COURSE_FILES,
+                    max_bytes=Config.MAX_COURSE_ARCHIVE_BYTES,
+                )
+        except UploadRejected as e:
+            raise RequestValidationError(e.error, f"{file.filename}: {e.message}")
+        if not members:
+            raise RequestValidationError(
+                "No PDF files", f"{file.filename}: archive contains no PDF files"
+            )
+        pending.extend((f"{file.filename}/{name}", member) for name, member in members)
+
+    if len(pending) > Config.MAX_COURSE_FILES:
+        raise RequestValidationError(
+            "Too many files", f"A course upload may contain at most {Config.MAX_COURSE_FILES} PDFs"
+        )
+
+    documents = []
+    seen = set()
+    for filename, stream in pending:
+        if stream.digest in seen:
+            continue
+        try:
+            info = validate_pdf_stream(stream)
+        except RequestValidationError as e:
+            raise RequestValidationError(e.error, f"{filename}: {e.message}", e.status)
+        seen.add(stream.digest)
+        documents.append(CourseDocument(filename, stream, info))
+    return documents
+
+
+def parse_upload_params(form) -> Dict[str, int]:
+    """Optional question counts for /upload-pdf and /upload-course"""
+    quiz_questions = form.get("quiz_questions", 10, type=int)
+    interview_questions = form.get("interview_questions", 10, type=int)
+
+    return {
+        "quiz_questions": _clamp(quiz_questions, 1, 50),
+        "interview_questions": _clamp(interview_questions, 1, 50),
+    }
+
+
+def parse_document_id(form) -> Optional[str]:
+    """
+    Optional 'document_id' of /upload-pdf naming the document an upload
+    revises (returned as X-Document-Id); without it, revisions are
+    matched by content
+    """
+    document_id = form.get("document_id", "").strip()
+    if not document_id:
+        return None
+    if not _DOCUMENT_ID_RE.match(document_id):
+        raise RequestValidationError(
+            "Invalid document_id",
+            "document_id must be 1-64 letters, digits, '-' or '_'"
+        )
+    return document_id
+
+
+def parse_study_set_query(set_id: str, args) -> Optional[List[str]]:
+    """
+    Validate a study set id and its optional 'fields' projection
+    (comma-separated top-level fields, e.g. fields=quiz,skill_map)
+
+    Returns:
+        Requested fields, or None for the whole study set
+    """
+    if not _STUDY_SET_ID_RE.match(set_id):
+        raise RequestValidationError("Invalid study set id", "Study set ids are 32 hex characters")
+
+    fields = [name.strip() for name in args.get("fields", "").split(",") if name.strip()]
+    return fields or None
+
+
+def parse_topic_quiz_params(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parameters for /generate-quiz"""
+    data = _require_json(data)
+    topic = _require_topic(data)
+    return {
+        "topic": topic,
+        "difficulty": _difficulty(data),
+        # Validate and cap question count
+        "num_questions": _clamp(data.get("num_questions", 10), 1, 20),
+    }
+
+
+def parse_flashcard_params(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parameters for /generate-flashcards"""
+    data = _require_json(data)
+    topic = _require_topic(data)
+    return {
+        "topic": topic,
+        # Validate and cap card count
+        "num_cards": _clamp(data.get("num_cards", 10), 1, 20),
+    }
+
+
+def parse_coding_challenge_params(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Parameters for /generate-coding-challenge"""
+    data = _require_json(data)
+    topic = _require_topic(data)
+    return {
+        "topic": topic,
+        "difficulty": _difficulty(data),
+        "language": data.get("language", "python"),
+    }
+
+
+
+def _stored_quiz(set_id: Any) -> Dict[str, Any]:
+    """The quiz section of a stored study set"""
+    if not isinstance(set_id, str) or not _STUDY_SET_ID_RE.match(set_id):
+        raise RequestValidationError("Invalid study set id", "Study set ids are 32 hex characters")
+    body = study_set_store.get(set_id, ["quiz"]) if study_set_store.enabled else None
+    if body is None:
+        raise RequestValidationError(
+            "Not found", "Study set not found (it may have been evicted)", 404
+        )
+    return loads(body)["quiz"]
+
+
+def parse_grading_params(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Parameters for /grade-quiz
+
+    The quiz is given inline ('quiz': a quiz response or its list of
+    questions) or as the 'study_set_id' of a stored study set;
+    'submissions' is a list of {"student_id", "answers"} objects.
+    """
+    data = _require_json(data)
+
+    if data.get("quiz") is not None:
+        quiz = data["quiz"]
+    elif data.get("study_set_id") is not None:
+        quiz = _stored_quiz(data["study_set_id"])
+    else:
+        raise RequestValidationError(
+            "Missing quiz", "Please provide a 'quiz' or the 'study_set_id' of a stored study set"
+        )
+    if isinstance(quiz, list):
+        quiz = {"quiz": quiz, "total_questions": len(quiz)}
+    if isinstance(quiz, dict):
+        quiz = {"total_questions": len(quiz.get("quiz") or []), **quiz}
+    try:
+        quiz = QuizResponse.model_validate(quiz)
+    except ValidationError as e:
+        error = e.errors()[0]
+        location = ".".join(str(part) for part in error["loc"])
+        raise RequestValidationError("Invalid quiz", f"quiz.{location}: {error['msg']}")
+
+    submissions = data.get("submissions")
+    if not isinstance(submissions, list) or not submissions:
+        raise RequestValidationError(
+            "Missing submissions",
+            "Please provide 'submissions': a list of {\"student_id\", \"answers\"} objects"
+        )
+    if len(submissions) > Config.GRADING_MAX_SUBMISSIONS:
+        raise RequestValidationError(
+            "Too many submissions",
+            f"At most {Config.GRADING_MAX_SUBMISSIONS} submissions can be graded per request"
+        )
+    try:
+        answers = [s["answers"] for s in submissions]
+    except (TypeError, KeyError):
+        raise RequestValidationError(
+            "Invalid submissions", "Every submission must be an object with 'answers' (a list or a string)"
+        )
+
+    return {
+        "quiz": quiz,
+        "answers": answers,
+        "student_ids": [s.get("student_id", i) for i, s in enumerate(submissions)],
+    }
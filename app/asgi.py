@@ -0,0 +1,613 @@
+"""
+ASGI entry point: async LLM routes with the Flask app as fallback
+
+The LLM-bound endpoints are served natively on the event loop with
+AsyncGroq, so one worker multiplexes hundreds of in-flight requests.
+PDF extraction runs in an executor; every other route (health, metrics,
+debug-timing requests, ...) is delegated to the Flask WSGI app on a
+thread pool.
+
+Uploads to the native routes are not buffered: the multipart parser
+reads the body off-loop as it arrives (ReceiveStream), streaming each
+file to disk and enforcing MAX_CONTENT_LENGTH byte by byte.
+
+Run with:
+    uvicorn app.asgi:app --host 0.0.0.0 --port 5000
+    gunicorn app.asgi:app -k uvicorn.workers.UvicornWorker --workers 1
+"""
+import asyncio
+import contextvars
+import functools
+import io
+import sys
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from werkzeug.exceptions import ClientDisconnected, RequestEntityTooLarge
+
+from app.config import Config
+from app.main import create_app
+from app.api.routes import (
+    study_set_cache_key,
+    study_set_headers,
+    course_cache_key,
+    unreadable_course_document,
+    course_response,
+)
+from app.api.validators import (
+    COURSE_UPLOAD_SIGNATURES,
+    CourseDocument,
+    RequestValidationError,
+    receive_files,
+    validate_upload_file,
+    validate_pdf_upload,
+    validate_course_files,
+    collect_course_documents,
+    parse_upload_params,
+    parse_document_id,
+    parse_topic_quiz_params,
+    parse_flashcard_params,
+    parse_coding_challenge_params,
+)
+from app.services.pdf_service import PDFService
+from app.services.quiz_service import QuizService
+from app.services.revision_service import RevisionService
+from app.utils import deadline, memory
+from app.utils.deadline import Deadline, DeadlineExceeded, current_deadline, endpoint_budget
+from app.utils.admission import ENDPOINT_CLASSES, AdmissionRejected, admission, client_id
+from app.utils.metrics import (
+    current_endpoint,
+    REQUESTS_TOTAL,
+    REQUEST_DURATION,
+    REQUESTS_IN_FLIGHT,
+)
+from app.utils.profiling import TIMING_HEADER, PROFILE_HEADER
+from app.utils.serialization import dumps, loads
+from app.utils.usage_ledger import RequestUsage, current_client, current_request_usage
+from app.utils.compression import EncodedPayload, encode_body, should_compress
+from app.utils.executors import (
+    submit_pdf_task,
+    pdf_offload_timer,
+    shutdown_pdf_executor,
+    start_pdf_executor,
+)
+from app.utils.result_cache import extracted_text_cache, study_set_cache
+from app.utils.upload_stream import StandaloneIngestRequest
+
+Headers = List[Tuple[bytes, bytes]]
+# Handlers return (status, payload) or (status, payload, extra headers)
+Handler = Callable[["AsyncRequest"], Awaitable[tuple]]
+
+# Native routes whose body is parsed while it is received
+STREAMED_ENDPOINTS = frozenset({"api.upload_pdf", "api.upload_course"})
+
+
+class ReceiveStream(io.RawIOBase):
+    """
+    Blocking, readable view of an ASGI request body for a parser thread
+
+    Each read waits for the next body message on the event loop, so the
+    body is never held whole in memory; more than limit bytes raise
+    RequestEntityTooLarge as soon as they arrive. A client disconnect
+    ends the stream early.
+    """
+
+    def __init__(self, receive: Callable[[], Awaitable[Dict[str, Any]]], loop, limit: int):
+        super().__init__()
+        self._receive = receive
+        self._loop = loop
+        self.limit = limit
+        self.size = 0
+        self._chunk = memoryview(b"")
+        self._more = True
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk and self._more:
+            future = asyncio.run_coroutine_threadsafe(self._receive(), self._loop)
+            try:
+                message = future.result(deadline.remaining())
+            except TimeoutError:
+                future.cancel()
+                raise deadline.exceeded("upload_receive")
+            if message["type"] != "http.request":
+                self._more = False
+                break
+            chunk = message.get("body", b"")
+            self.size += len(chunk)
+            if self.size > self.limit:
+                raise RequestEntityTooLarge()
+            self._chunk = memoryview(chunk)
+            self._more = message.get("more_body", False)
+
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
+
+
+class AsyncRequest:
+    """Minimal request view for native async handlers"""
+
+    def __init__(self, scope: Dict[str, Any], body: bytes, stream: Optional[ReceiveStream] = None):
+        self.scope = scope
+        self.body = body
+        self.stream = stream
+        self.headers = {
+            k.decode("latin-1").lower(): v.decode("latin-1")
+            for k, v in scope.get("headers", [])
+        }
+
+    def json(self) -> Optional[Dict[str, Any]]:
+        if not self.headers.get("content-type", "").startswith("application/json"):
+            raise ValueError("415 Unsupported Media Type: Content-Type must be application/json")
+        return loads(self.body) if self.body else None
+
+    def environ(self) -> Dict[str, Any]:
+        return build_environ(self.scope, self.body, self.stream)
+
+
+def build_environ(scope: Dict[str, Any], body: bytes, stream: Optional[io.RawIOBase] = None) -> Dict[str, Any]:
+    """
+    Translate an ASGI HTTP scope and body into a WSGI environ
+
+    With a stream, wsgi.input reads the body from it instead, with the
+    client's Content-Length (if any)
+    """
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body) if stream is None else stream,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if stream is None:
+        environ["CONTENT_LENGTH"] = str(len(body))
+    for name, value in scope.get("headers", []):
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif key == "CONTENT_LENGTH":
+            if stream is not None:
+                environ["CONTENT_LENGTH"] = value
+        else:
+            http_key = f"HTTP_{key}"
+            environ[http_key] = f"{environ[http_key]},{value}" if http_key in environ else value
+    if "CONTENT_LENGTH" not in environ:
+        # Chunked body: read the stream to its end
+        environ["wsgi.input_terminated"] = True
+    return environ
+
+
+def _cors_headers(origin: Optional[str]) -> Headers:
+    """CORS headers matching the Flask-CORS configuration"""
+    if Config.CORS_ORIGINS == "*":
+        return [(b"access-control-allow-origin", b"*")]
+    if origin and origin in Config.CORS_ORIGINS:
+        return [(b"access-control-allow-origin", origin.encode("latin-1")), (b"vary", b"Origin")]
+    return []
+
+
+def _receive_files(request: StandaloneIngestRequest):
+    """receive_files, with a body cut short or over the limit as a client error"""
+    try:
+        return receive_files(request)
+    except RequestEntityTooLarge:
+        raise RequestValidationError("File too large", _too_large_message(), 413)
+    except ClientDisconnected:
+        raise RequestValidationError("Incomplete upload", "Client disconnected before the body was received")
+
+
+def _too_large_message() -> str:
+    return f"Request body exceeds {Config.MAX_CONTENT_LENGTH} bytes"
+
+
+def _receive_upload(
+    environ: Dict[str, Any]
+) -> Tuple[StandaloneIngestRequest, Any, Dict[str, int], Optional[str]]:
+    """
+    Parse the multipart body and validate the PDF (runs off-loop)
+
+    Returns:
+        (request to close when done, uploaded file, params, document id)
+    """
+    request = StandaloneIngestRequest(environ)
+    request.max_content_length = Config.MAX_CONTENT_LENGTH
+    try:
+        file = validate_upload_file(_receive_files(request))
+        params = parse_upload_params(request.form)
+        document_id = parse_document_id(request.form)
+        validate_pdf_upload(file)
+        return request, file, params, document_id
+    except Exception:
+        request.close()
+        raise
+
+
+def _receive_course(
+    environ: Dict[str, Any]
+) -> Tuple[StandaloneIngestRequest, List[CourseDocument], Dict[str, int]]:
+    """
+    Parse a course upload, expand archives and validate every PDF
+    (runs off-loop)
+    """
+    request = StandaloneIngestRequest(environ)
+    request.max_content_length = Config.MAX_CONTENT_LENGTH
+    request.upload_signatures = COURSE_UPLOAD_SIGNATURES
+    try:
+        uploads = validate_course_files(_receive_files(request))
+        params = parse_upload_params(request.form)
+        documents = collect_course_documents(request, uploads)
+        return request, documents, params
+    except Exception:
+        request.close()
+        raise
+
+
+async def _extract_cached_text(digest: str, path: str) -> str:
+    """Extract on the PDF executor unless an identical upload was seen"""
+    text = extracted_text_cache.get(digest)
+    if text is None:
+        deadline.check("pdf_extract")
+        with pdf_offload_timer():
+            future = submit_pdf_task(PDFService.extract_text, path, deadline.expires_at())
+            try:
+                text = await asyncio.wait_for(asyncio.wrap_future(future), deadline.remaining())
+            except asyncio.TimeoutError:
+                raise deadline.exceeded("pdf_extract")
+        extracted_text_cache.put(digest, text)
+    return text
+
+
+class AsyncApp:
+    """
+    ASGI application with native async LLM routes
+    """
+
+    def __init__(self, flask_app=None):
+        self.flask_app = flask_app or create_app()
+        self.wsgi_executor = ThreadPoolExecutor(
+            max_workers=Config.ASGI_WSGI_THREADS, thread_name_prefix="wsgi"
+        )
+        self.routes: Dict[Tuple[str, str], Tuple[str, Handler]] = {
+            ("POST", "/api/upload-pdf"): ("api.upload_pdf", self.upload_pdf),
+            ("POST", "/api/upload-course"): ("api.upload_course", self.upload_course),
+            ("POST", "/api/generate-quiz"): ("api.generate_quiz", self.generate_quiz),
+            ("POST", "/api/generate-flashcards"): ("api.generate_flashcards", self.generate_flashcards),
+            ("POST", "/api/generate-coding-challenge"): (
+                "api.generate_coding_challenge", self.generate_coding_challenge
+            ),
+        }
+
+    # -----------------------
+    # Executors
+    # -----------------------
+    async def run_blocking(self, func: Callable, *args, executor: Optional[Executor] = None) -> Any:
+        loop = asyncio.get_running_loop()
+        # Carry the request's context variables (endpoint, client, usage) to the thread
+        call = functools.partial(contextvars.copy_context().run, func, *args)
+        return await loop.run_in_executor(executor or self.wsgi_executor, call)
+
+    def shutdown(self) -> None:
+        self.wsgi_executor.shutdown(wait=False)
+        # PDF extraction runs on the shared executor (app.utils.executors)
+        shutdown_pdf_executor()
+
+    # -----------------------
+    # ASGI protocol
+    # -----------------------
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        route = self.routes.get((scope["method"], scope["path"]))
+        if route is not None and self._wants_debug(scope):
+            route = None
+
+        if self._declared_too_large(scope):
+            body, too_large = b"", True
+        elif route is not None and route[0] in STREAMED_ENDPOINTS:
+            # The handler's parser reads the body while it arrives
+            stream = ReceiveStream(receive, asyncio.get_running_loop(), Config.MAX_CONTENT_LENGTH)
+            endpoint, handler = route
+            await self._dispatch(endpoint, handler, AsyncRequest(scope, b"", stream), send)
+            return
+        else:
+            body, too_large = await self._read_body(receive)
+        if too_large:
+            await self._send_json(send, 413, {"error": "File too large", "message": _too_large_message()}, scope)
+            return
+
+        if route is None:
+            await self._call_wsgi(scope, body, send)
+            return
+
+        endpoint, handler = route
+        await self._dispatch(endpoint, handler, AsyncRequest(scope, body), send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                start_pdf_executor()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.shutdown()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    @staticmethod
+    def _wants_debug(scope) -> bool:
+        # Debug timing/profiling is implemented by the Flask hooks
+        names = {TIMING_HEADER.lower().encode(), PROFILE_HEADER.lower().encode()}
+        return any(name in names for name, _ in scope.get("headers", []))
+
+    @staticmethod
+    def _declared_too_large(scope) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == b"content-length" and value.isdigit() and int(value) > Config.MAX_CONTENT_LENGTH:
+                return True
+        return False
+
+    @staticmethod
+    async def _read_body(receive) -> Tuple[bytes, bool]:
+        limit = Config.MAX_CONTENT_LENGTH
+        chunks = []
+        size = 0
+        more = True
+        while more:
+            message = await receive()
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                return b"", True
+            chunks.append(chunk)
+            more = message.get("more_body", False)
+        return b"".join(chunks), False
+
+    async def _send_json(self, send, status: int, payload: Any, scope, extra: Headers = ()) -> None:
+        encoded = payload if isinstance(payload, EncodedPayload) else None
+        body = encoded.body if encoded else dumps(payload)
+        request_headers = dict(scope.get("headers", []))
+        origin = request_headers.get(b"origin")
+        headers = [(b"content-type", b"application/json")]
+
+        if status == 200:
+            accept_encoding = request_headers.get(b"accept-encoding", b"").decode("latin-1")
+            if should_compress(len(body), "application/json"):
+                headers.append((b"vary", b"Accept-Encoding"))
+            body, encoding, etag = encode_body(body, accept_encoding, payload=encoded)
+            headers.append((b"etag", f'"{etag}"'.encode()))
+            if encoding:
+                headers.append((b"content-encoding", encoding.encode()))
+
+        headers += [
+            (b"content-length", str(len(body)).encode()),
+            *_cors_headers(origin.decode("latin-1") if origin else None),
+            *extra,
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _dispatch(self, endpoint: str, handler: Handler, request: AsyncRequest, send) -> None:
+        token = current_endpoint.set(endpoint)
+        deadline_token = current_deadline.set(Deadline(endpoint_budget(endpoint)))
+        client_token = current_client.set(self._client(request))
+        usage_token = current_request_usage.set(RequestUsage())
+        memory_token = memory.begin_request()
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        start = time.perf_counter()
+        status = 500
+        try:
+            extra: Headers = []
+            ticket = None
+            try:
+                ticket = await self._admit(endpoint, request)
+                status, payload, *rest = await handler(request)
+                if rest:
+                    extra = rest[0]
+            except AdmissionRejected as e:
+                status, payload = 429, e.to_dict()
+                extra = [(b"retry-after", str(e.retry_after).encode())]
+            except RequestValidationError as e:
+                status, payload = e.status, e.to_dict()
+            except DeadlineExceeded as e:
+                status, payload = 503, e.to_dict()
+            finally:
+                if ticket is not None:
+                    admission.release(ticket)
+            await self._send_json(send, status, payload, request.scope, extra)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+            REQUESTS_TOTAL.inc(endpoint=endpoint, method=request.scope["method"], status=str(status))
+            REQUEST_DURATION.observe(time.perf_counter() - start, endpoint=endpoint)
+            memory.end_request(memory_token, endpoint)
+            current_request_usage.reset(usage_token)
+            current_client.reset(client_token)
+            current_deadline.reset(deadline_token)
+            current_endpoint.reset(token)
+
+    @staticmethod
+    async def _admit(endpoint: str, request: AsyncRequest):
+        """Admission ticket for the request (None when not controlled)"""
+        priority = ENDPOINT_CLASSES.get(endpoint)
+        if priority is None or not admission.enabled:
+            return None
+        return await admission.aacquire(AsyncApp._client(request), priority)
+
+    @staticmethod
+    def _client(request: AsyncRequest) -> str:
+        remote = (request.scope.get("client") or ("", 0))[0]
+        return client_id(remote, request.headers.get("x-forwarded-for"))
+
+    async def _call_wsgi(self, scope, body: bytes, send) -> None:
+        environ = build_environ(scope, body)
+        response: Dict[str, Any] = {}
+
+        def start_response(status, headers, exc_info=None):
+            response["status"] = int(status.split(" ", 1)[0])
+            response["headers"] = [
+                (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers
+            ]
+
+        def run() -> bytes:
+            result = self.flask_app.wsgi_app(environ, start_response)
+            try:
+                return b"".join(result)
+            finally:
+                if hasattr(result, "close"):
+                    result.close()
+
+        payload = await self.run_blocking(run)
+        await send({
+            "type": "http.response.start",
+            "status": response["status"],
+            "headers": response["headers"],
+        })
+        await send({"type": "http.response.body", "body": payload})
+
+    async def _study_set_headers(self, payload: EncodedPayload, kind: str, cache: str) -> Headers:
+        # Persisting the study set is blocking SQLite I/O
+        headers = await self.run_blocking(study_set_headers, payload, kind, cache)
+        return [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+    # -----------------------
+    # Native async routes
+    # -----------------------
+    async def upload_pdf(self, request: AsyncRequest) -> tuple:
+        ingest_request, file, params, document_id = await self.run_blocking(
+            _receive_upload, request.environ()
+        )
+        upload = file.stream
+
+        try:
+            cache_key = study_set_cache_key(upload.digest, params)
+            # A named document goes through RevisionService for its headers
+            cached = study_set_cache.get(cache_key) if not document_id else None
+            if cached is not None:
+                return 200, cached, await self._study_set_headers(cached, "syllabus", "HIT")
+
+            extracted_text = await _extract_cached_text(upload.digest, upload.path)
+
+            if not extracted_text or len(extracted_text.strip()) < 50:
+                return 400, {
+                    "error": "Invalid PDF content",
+                    "message": "PDF is empty or contains no readable text"
+                }
+
+            result, revision = await RevisionService().aprocess(
+                syllabus_text=extracted_text,
+                quiz_questions=params["quiz_questions"],
+                interview_questions=params["interview_questions"],
+                document_id=document_id
+            )
+            payload = EncodedPayload.from_object(result)
+            study_set_cache.put(cache_key, payload)
+            return 200, payload, await self._study_set_headers(payload, "syllabus", "MISS") + [
+                (b"x-document-id", revision.document_id.encode()),
+                (b"x-revision", revision.header().encode()),
+            ]
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"[UPLOAD_PDF_ERROR] {e}")
+            return 500, {"error": "Processing error", "message": str(e)}
+
+        finally:
+            # Removes the streamed upload file
+            ingest_request.close()
+
+    async def upload_course(self, request: AsyncRequest) -> tuple:
+        ingest_request, documents, params = await self.run_blocking(
+            _receive_course, request.environ()
+        )
+
+        try:
+            cache_key = course_cache_key(documents, params)
+            cached = study_set_cache.get(cache_key)
+            if cached is not None:
+                return 200, cached, await self._study_set_headers(cached, "course", "HIT")
+
+            # All documents are extracted concurrently
+            texts = list(await asyncio.gather(
+                *(_extract_cached_text(d.digest, d.path) for d in documents)
+            ))
+
+            unreadable = unreadable_course_document(documents, texts)
+            if unreadable is not None:
+                return 400, {
+                    "error": "Invalid PDF content",
+                    "message": f"{unreadable.filename}: PDF is empty or contains no readable text"
+                }
+
+            result = await QuizService().aprocess_course(
+                documents=[(d.filename, text) for d, text in zip(documents, texts)],
+                quiz_questions=params["quiz_questions"],
+                interview_questions=params["interview_questions"]
+            )
+            payload = EncodedPayload.from_object(course_response(result, documents, texts))
+            study_set_cache.put(cache_key, payload)
+            return 200, payload, await self._study_set_headers(payload, "course", "MISS")
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            print(f"[UPLOAD_COURSE_ERROR] {e}")
+            return 500, {"error": "Processing error", "message": str(e)}
+
+        finally:
+            # Removes the streamed uploads and expanded archive members
+            ingest_request.close()
+
+    async def generate_quiz(self, request: AsyncRequest) -> Tuple[int, Any]:
+        try:
+            params = parse_topic_quiz_params(request.json())
+            return 200, await QuizService().agenerate_topic_quiz(**params)
+        except (RequestValidationError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            print(f"[GENERATE_QUIZ_ERROR] {e}")
+            return 500, {"error": "Processing error", "message": str(e)}
+
+    async def generate_flashcards(self, request: AsyncRequest) -> Tuple[int, Any]:
+        try:
+            params = parse_flashcard_params(request.json())
+            return 200, await QuizService().agenerate_topic_flashcards(**params)
+        except (RequestValidationError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            print(f"[GENERATE_FLASHCARDS_ERROR] {e}")
+            return 500, {"error": "Processing error", "message": str(e)}
+
+    async def generate_coding_challenge(self, request: AsyncRequest) -> Tuple[int, Any]:
+        try:
+            params = parse_coding_challenge_params(request.json())
+            return 200, await QuizService().agenerate_coding_challenge(**params)
+        except (RequestValidationError, DeadlineExceeded):
+            raise
+        except Exception as e:
+            print(f"[GENERATE_CODING_CHALLENGE_ERROR] {e}")
+            return 500, {"error": "Processing error", "message": str(e)}
+
+
+app = AsyncApp()
@@ -1,6 +1,7 @@
 """
 Configuration settings for StudyGenie AI Backend
 """
+import math
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -31,11 +32,46 @@ class Config:
     # -----------------------
     ALLOWED_EXTENSIONS = {"pdf"}
 
+    # Archives accepted by /api/upload-course (PDF members are used)
+    ALLOWED_ARCHIVE_EXTENSIONS = {"zip"}
+
+    # -----------------------
+    # Course uploads
+    # -----------------------
+    # Most documents processed together, after expanding archives
+    MAX_COURSE_FILES = int(os.getenv("MAX_COURSE_FILES", 10))
+
+    # Cap on the total uncompressed size of archive members (zip bombs)
+    MAX_COURSE_ARCHIVE_BYTES = int(os.getenv("MAX_COURSE_ARCHIVE_BYTES", 64 * 1024 * 1024))
+
+    # Topic name similarity at or above which skill map topics of
+    # different documents are merged
+    COURSE_TOPIC_SIMILARITY = float(os.getenv("COURSE_TOPIC_SIMILARITY", 0.5))
+
     # -----------------------
     # Groq AI settings
     # -----------------------
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+    # Optional API base URL override (e.g. a local stub server for benchmarks)
+    GROQ_BASE_URL = os.getenv("GROQ_BASE_URL") or None
+
+    # -----------------------
+    # LLM provider
+    # -----------------------
+    # groq | replay | synthetic
+    LLM_PROVIDER = os.getenv("LLM_PROVIDER", "groq").lower()
+
+    # Capture all completions to this transcript (.jsonl or .jsonl.gz)
+    LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH") or None
+
+    # Transcript used by the replay provider
+    LLM_REPLAY_PATH = os.getenv("LLM_REPLAY_PATH") or None
+    LLM_REPLAY_LATENCY = os.getenv("LLM_REPLAY_LATENCY", "False").lower() == "true"
+
+    # Simulated latency of the synthetic provider
+    LLM_SYNTHETIC_LATENCY_MS = float(os.getenv("LLM_SYNTHETIC_LATENCY_MS", 0))
+
     # Supported Groq models
     GROQ_MODEL = os.getenv(
         "GROQ_MODEL",
@@ -50,6 +86,60 @@ class Config:
         "gemma2-9b-it"               # Gemma 2 model
     }
 
+    # Tried in order when the circuit of GROQ_MODEL (and earlier fallbacks) is open
+    GROQ_FALLBACK_MODELS = [
+        m.strip()
+        for m in os.getenv("GROQ_FALLBACK_MODELS", "llama-3.1-8b-instant").split(",")
+        if m.strip()
+    ]
+
+    # -----------------------
+    # LLM backend pool (several API keys / models)
+    # -----------------------
+    # Weighted backends "KEY_ENV:model[:weight][@base_url]", comma separated;
+    # KEY_ENV names the environment variable holding that backend's key, e.g.
+    # "GROQ_API_KEY:llama-3.3-70b-versatile:2,GROQ_API_KEY_2:llama-3.3-70b-versatile"
+    # Empty: GROQ_API_KEY alone
+    GROQ_BACKENDS = os.getenv("GROQ_BACKENDS", "").strip()
+
+    # Smoothing of per-backend latency and error rate (weight of the newest call)
+    ROUTER_EWMA_ALPHA = float(os.getenv("ROUTER_EWMA_ALPHA", 0.2))
+
+    # Consecutive failures that eject a backend, and for how long (doubling per repeat)
+    ROUTER_EJECT_FAILURES = int(os.getenv("ROUTER_EJECT_FAILURES", 3))
+    ROUTER_EJECT_SECONDS = float(os.getenv("ROUTER_EJECT_SECONDS", 10))
+    ROUTER_MAX_EJECT_SECONDS = float(os.getenv("ROUTER_MAX_EJECT_SECONDS", 300))
+
+    # Backends tried by one call before its error is returned
+    ROUTER_MAX_ATTEMPTS = int(os.getenv("ROUTER_MAX_ATTEMPTS", 3))
+
+    # -----------------------
+    # LLM hedging and circuit breakers
+    # -----------------------
+    HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "True").lower() == "true"
+
+    # Hedge once a call outlives this percentile of the model's recent latencies
+    HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 0.95))
+    HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", 200))
+    HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+    HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", 20))  # seconds, until enough samples
+    HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 0.5))
+
+    # Extra load cap: hedges per call, and how many may be saved up
+    HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", 0.1))
+    HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", 5))
+
+    # Threads running hedged sync calls (a primary per request thread plus
+    # the hedge burst); calls abandoned at their deadline stay within it
+    HEDGE_THREADS = int(os.getenv(
+        "HEDGE_THREADS", int(os.getenv("GUNICORN_THREADS", 16)) + math.ceil(HEDGE_BUDGET_BURST)
+    ))
+
+    CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", 20))
+    CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", 10))
+    CIRCUIT_FAILURE_RATIO = float(os.getenv("CIRCUIT_FAILURE_RATIO", 0.5))
+    CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", 30))  # seconds
+
     # -----------------------
     # Text processing
     # -----------------------
@@ -59,6 +149,225 @@ class Config:
     # Hard cap to protect LLM & memory
     MAX_SYLLABUS_CHARS = int(os.getenv("MAX_SYLLABUS_CHARS", 8000))
 
+    # -----------------------
+    # Batched generation
+    # -----------------------
+    # Largest item counts a single LLM call produces reliably; bigger
+    # requests are split into concurrent batches of at most this size
+    QUIZ_BATCH_SIZE = int(os.getenv("QUIZ_BATCH_SIZE", 6))
+    INTERVIEW_BATCH_SIZE = int(os.getenv("INTERVIEW_BATCH_SIZE", 5))
+    TOPIC_BATCH_SIZE = int(os.getenv("TOPIC_BATCH_SIZE", 15))
+    MAX_PARALLEL_BATCHES = int(os.getenv("MAX_PARALLEL_BATCHES", 8))
+
+    # Estimated Jaccard similarity above which two questions are duplicates
+    DUPLICATE_SIMILARITY_THRESHOLD = float(
+        os.getenv("DUPLICATE_SIMILARITY_THRESHOLD", 0.6)
+    )
+
+    # -----------------------
+    # Async serving (app.asgi)
+    # -----------------------
+    # Threads serving routes delegated to the Flask WSGI app
+    ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 16))
+
+    # Executor for CPU-bound PDF extraction (async uploads and course
+    # uploads in either serving mode): "process" or "thread"
+    PDF_EXECUTOR = os.getenv("PDF_EXECUTOR", "process").lower()
+    # Every gunicorn worker has its own pool, so keep it small on 512 MB
+    # instances
+    PDF_EXECUTOR_WORKERS = int(os.getenv("PDF_EXECUTOR_WORKERS", min(2, os.cpu_count() or 1)))
+
+    # Extractions after which a pool process is replaced by a fresh one:
+    # pdfplumber's freed memory stays in the process, and pool processes
+    # are not seen by the worker's MEMORY_HIGH_WATER_MB recycling
+    PDF_EXECUTOR_MAX_TASKS = int(os.getenv("PDF_EXECUTOR_MAX_TASKS", 20))
+
+    # -----------------------
+    # Result caching (per process, keyed by upload SHA-256)
+    # -----------------------
+    # Study sets served again for re-uploads of the same PDF; 0 disables
+    RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 128))
+    TEXT_CACHE_MAX_ENTRIES = int(os.getenv("TEXT_CACHE_MAX_ENTRIES", 256))
+    RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 3600))  # seconds
+
+    # -----------------------
+    # Persistent study set store (GET /api/study-sets/<id>)
+    # -----------------------
+    STUDY_SET_STORE_PATH = Path(
+        os.getenv("STUDY_SET_STORE_PATH", str(BASE_DIR / "data" / "study_sets.sqlite3"))
+    )
+
+    # Compressed bytes kept before least recently used sets are evicted; 0 disables
+    STUDY_SET_STORE_MAX_BYTES = int(os.getenv("STUDY_SET_STORE_MAX_BYTES", 256 * 1024 * 1024))
+
+    # auto (zstd if installed, else zlib) | zstd | zlib | raw
+    STUDY_SET_STORE_CODEC = os.getenv("STUDY_SET_STORE_CODEC", "auto").lower()
+    STUDY_SET_STORE_ZLIB_LEVEL = int(os.getenv("STUDY_SET_STORE_ZLIB_LEVEL", 6))
+
+    # -----------------------
+    # Coding challenge library
+    # -----------------------
+    CHALLENGE_LIBRARY_PATH = Path(
+        os.getenv("CHALLENGE_LIBRARY_PATH", str(BASE_DIR / "data" / "challenges.sqlite3"))
+    )
+
+    # Challenges (topic + difficulty) kept before the least recently used are evicted; 0 disables
+    CHALLENGE_LIBRARY_MAX_CHALLENGES = int(os.getenv("CHALLENGE_LIBRARY_MAX_CHALLENGES", 5000))
+
+    # Model writing starter code for languages without a local template
+    CHALLENGE_VARIANT_MODEL = os.getenv("CHALLENGE_VARIANT_MODEL", "llama-3.1-8b-instant")
+
+    # -----------------------
+    # Incremental reprocessing of revised documents
+    # -----------------------
+    # Documents whose latest version (chunk hashes + study set) is kept
+    # per process for diffing re-uploads; 0 disables
+    REVISION_STORE_MAX_DOCUMENTS = int(os.getenv("REVISION_STORE_MAX_DOCUMENTS", 256))
+    REVISION_STORE_TTL = int(os.getenv("REVISION_STORE_TTL", 86400))  # seconds
+
+    # Revisions changing more than this share of the text are regenerated in full
+    REVISION_MAX_CHANGE_RATIO = float(os.getenv("REVISION_MAX_CHANGE_RATIO", 0.5))
+
+    # -----------------------
+    # Bulk quiz grading
+    # -----------------------
+    # Submissions accepted by one /grade-quiz request
+    GRADING_MAX_SUBMISSIONS = int(os.getenv("GRADING_MAX_SUBMISSIONS", 200000))
+
+    # -----------------------
+    # Response compression
+    # -----------------------
+    COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+
+    # Bodies smaller than this are sent uncompressed
+    COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+
+    # Server preference order; br/zstd are used only if brotli/zstandard are installed
+    COMPRESSION_ENCODINGS = [
+        e.strip() for e in os.getenv("COMPRESSION_ENCODINGS", "br,zstd,gzip").split(",") if e.strip()
+    ]
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 5))
+    ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", 3))
+
+    # -----------------------
+    # Adaptive output budgets (max_tokens)
+    # -----------------------
+    TOKEN_BUDGET_ENABLED = os.getenv("TOKEN_BUDGET_ENABLED", "True").lower() == "true"
+
+    # Budget = items x this percentile of recent completion tokens per item x headroom
+    TOKEN_BUDGET_PERCENTILE = float(os.getenv("TOKEN_BUDGET_PERCENTILE", 0.95))
+    TOKEN_BUDGET_HEADROOM = float(os.getenv("TOKEN_BUDGET_HEADROOM", 1.25))
+    TOKEN_BUDGET_WINDOW = int(os.getenv("TOKEN_BUDGET_WINDOW", 200))
+    TOKEN_BUDGET_MIN_SAMPLES = int(os.getenv("TOKEN_BUDGET_MIN_SAMPLES", 5))
+
+    # Bounds of any single call's budget
+    TOKEN_BUDGET_MIN = int(os.getenv("TOKEN_BUDGET_MIN", 256))
+    TOKEN_BUDGET_MAX = int(os.getenv("TOKEN_BUDGET_MAX", 8000))
+
+    # -----------------------
+    # Request deadlines
+    # -----------------------
+    # Seconds a request may take end to end; keep below GUNICORN_TIMEOUT (120)
+    REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", 100))
+
+    # Per-endpoint overrides, e.g. "api.generate_quiz=45,api.upload_course=110"
+    REQUEST_DEADLINES = {
+        name.strip(): float(seconds)
+        for name, _, seconds in (
+            item.partition("=")
+            for item in os.getenv(
+                "REQUEST_DEADLINES",
+                "api.generate_quiz=60,api.generate_flashcards=60,api.generate_coding_challenge=60"
+            ).split(",")
+            if "=" in item
+        )
+    }
+
+    # No LLM call is started with less time left than this
+    DEADLINE_MIN_CALL_SECONDS = float(os.getenv("DEADLINE_MIN_CALL_SECONDS", 2))
+
+    # Expected LLM call time until enough latencies are observed
+    DEADLINE_DEFAULT_CALL_SECONDS = float(os.getenv("DEADLINE_DEFAULT_CALL_SECONDS", 10))
+
+    # -----------------------
+    # Admission control
+    # -----------------------
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "True").lower() == "true"
+
+    # Per process: concurrently running LLM requests, overall and per client
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", 6))
+    ADMISSION_MAX_PER_CLIENT = int(os.getenv("ADMISSION_MAX_PER_CLIENT", 3))
+
+    # Requests waiting for a slot, and how long they may wait (seconds)
+    ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 8))
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 15))
+
+    # Share of slots bulk syllabus processing may occupy (rest is kept for topic calls)
+    ADMISSION_BULK_SHARE = float(os.getenv("ADMISSION_BULK_SHARE", 0.67))
+    ADMISSION_MAX_RETRY_AFTER = int(os.getenv("ADMISSION_MAX_RETRY_AFTER", 60))
+
+    # Identify clients by X-Forwarded-For; enable only behind a proxy that
+    # appends to it (Render, Heroku), or clients can pick their own identity
+    ADMISSION_TRUST_FORWARDED = os.getenv("ADMISSION_TRUST_FORWARDED", "False").lower() == "true"
+
+    # Trusted proxies in front of the app: the client is the entry the
+    # outermost one appended, i.e. this many entries from the end
+    ADMISSION_FORWARDED_HOPS = int(os.getenv("ADMISSION_FORWARDED_HOPS", 1))
+
+    # -----------------------
+    # LLM usage and cost accounting
+    # -----------------------
+    USAGE_ENABLED = os.getenv("USAGE_ENABLED", "True").lower() == "true"
+    USAGE_DB_PATH = Path(os.getenv("USAGE_DB_PATH", str(BASE_DIR / "data" / "usage.sqlite3")))
+
+    # Seconds between flushes of the in-process aggregates to SQLite
+    USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", 30))
+
+    # Aggregates are kept per hour bucket
+    USAGE_BUCKET_SECONDS = int(os.getenv("USAGE_BUCKET_SECONDS", 3600))
+
+    # USD per million prompt/completion tokens, e.g. "llama-3.3-70b-versatile=0.59:0.79"
+    LLM_PRICES = {
+        name.strip(): tuple(float(price) for price in prices.split(":", 1))
+        for name, _, prices in (
+            item.partition("=")
+            for item in os.getenv(
+                "LLM_PRICES",
+                "llama-3.3-70b-versatile=0.59:0.79,llama-3.1-70b-versatile=0.59:0.79,"
+                "llama-3.1-8b-instant=0.05:0.08,mixtral-8x7b-32768=0.24:0.24,gemma2-9b-it=0.20:0.20"
+            ).split(",")
+            if "=" in item and ":" in item
+        )
+    }
+
+    # Bearer token required by /admin/usage (which answers 404 when unset)
+    ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+    # -----------------------
+    # Observability
+    # -----------------------
+    METRICS_ENABLED = os.getenv("METRICS_ENABLED", "True").lower() == "true"
+
+    # Per-request and per-stage RSS growth on /metrics
+    MEMORY_ACCOUNTING_ENABLED = os.getenv("MEMORY_ACCOUNTING_ENABLED", "True").lower() == "true"
+
+    # Share of requests whose stages also record RSS growth (two RSS reads per stage);
+    # tracemalloc-sampled requests always do
+    MEMORY_STAGE_SAMPLE_RATE = float(os.getenv("MEMORY_STAGE_SAMPLE_RATE", 0.05))
+
+    # Share of requests traced with tracemalloc (top allocating lines on /metrics);
+    # tracing slows the whole worker while a sampled request runs
+    MEMORY_TRACEMALLOC_SAMPLE_RATE = float(os.getenv("MEMORY_TRACEMALLOC_SAMPLE_RATE", 0))
+    MEMORY_TRACEMALLOC_TOP = int(os.getenv("MEMORY_TRACEMALLOC_TOP", 5))
+
+    # RSS (MB) after which a gunicorn worker drains and restarts; 0 disables
+    MEMORY_HIGH_WATER_MB = int(os.getenv("MEMORY_HIGH_WATER_MB", 0))
+
+    # Debug timing/profiling (requests opt in with X-Debug-Timing / X-Debug-Profile)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles")))
+
     # -----------------------
     # CORS
     # -----------------------
@@ -76,9 +385,25 @@ class Config:
     def validate(cls) -> None:
         """Validate critical configuration at startup"""
 
-        if not cls.GROQ_API_KEY:
+        if cls.LLM_PROVIDER not in {"groq", "replay", "synthetic"}:
+            raise RuntimeError(f"Unknown LLM_PROVIDER '{cls.LLM_PROVIDER}'")
+
+        # Offline providers don't talk to Groq
+        if cls.LLM_PROVIDER == "groq" and cls.GROQ_BACKENDS:
+            from app.services.llm_router import parse_backends
+            try:
+                backends = parse_backends(cls.GROQ_BACKENDS)
+            except ValueError as e:
+                raise RuntimeError(str(e))
+            missing = sorted({b.key_env for b in backends if not os.getenv(b.key_env)})
+            if not backends or missing:
+                raise RuntimeError(f"GROQ_BACKENDS keys are not set: {', '.join(missing) or 'no backends'}")
+        elif cls.LLM_PROVIDER == "groq" and not cls.GROQ_API_KEY:
             raise RuntimeError("GROQ_API_KEY is not set")
 
+        if cls.LLM_PROVIDER == "replay" and not cls.LLM_REPLAY_PATH:
+            raise RuntimeError("LLM_REPLAY_PATH is not set")
+
         # Note: Model validation is lenient - Groq may support models not in our list
         # We log a warning but don't fail, allowing flexibility for new models
         if cls.GROQ_MODEL not in cls.SUPPORTED_GROQ_MODELS:
@@ -6,6 +6,9 @@ from flask import Flask
 from flask_cors import CORS
 from app.config import Config
 from app.api.routes import api_bp
+from app.utils import admission, compression, deadline, memory, metrics, profiling, usage_ledger
+from app.utils.serialization import FastJSONProvider
+from app.utils.upload_stream import IngestRequest
 
 
 def create_app(config_class=Config):
@@ -21,12 +24,42 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
     
+    # Serialize responses (including pydantic models) with pydantic-core/orjson
+    app.json = FastJSONProvider(app)
+    
+    # Stream uploads to disk with on-the-fly hashing and PDF sniffing
+    app.request_class = IngestRequest
+    
     # Initialize config
     config_class.init_app(app)
     
     # Enable CORS
     CORS(app, origins=app.config['CORS_ORIGINS'])
     
+    # Response compression and ETags (registered first so it runs last)
+    compression.init_app(app)
+    
+    # Request metrics and /metrics endpoint
+    if app.config.get('METRICS_ENABLED', True):
+        metrics.init_app(app)
+    
+    # Per-request RSS growth and worker recycling past the high-water mark
+    memory.init_app(app)
+    
+    # Opt-in per-request stage timing and profiling (no-op unless enabled)
+    profiling.init_app(app)
+    
+    # Per-request deadline, propagated to extraction and LLM calls (before
+    # admission, so queueing counts against it)
+    deadline.init_app(app)
+    
+    # Per-client and global in-flight limits with a priority queue (after
+    # metrics, so 429s are counted)
+    admission.init_app(app)
+    
+    # LLM token/cost accounting by client and /admin/usage
+    usage_ledger.init_app(app)
+    
     # Register blueprints
     app.register_blueprint(api_bp, url_prefix='/api')
     
@@ -38,11 +71,23 @@ def create_app(config_class=Config):
     return app
 
 
-# Create app instance for gunicorn/WSGI servers
-app = create_app()
+def __getattr__(name):
+    """
+    Build the module-level app on first access (gunicorn app.main:app)
+
+    Importing create_app (wsgi.py, app.asgi, benchmarks) no longer
+    constructs an extra application instance.
+    """
+    if name == 'app':
+        global app
+        app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == '__main__':
+    app = create_app()
+    
     # Get port from environment variable (for Render) or default to 5000
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
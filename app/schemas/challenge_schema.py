@@ -0,0 +1,50 @@
+"""
+Pydantic schemas for coding challenge generation
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class ChallengeTestCase(BaseModel):
+    """Example input and expected output"""
+    input: str = Field(..., description="Input example")
+    output: str = Field(..., description="Expected output")
+    explanation: Optional[str] = Field(None, description="What this test case checks")
+
+
+class SignatureParam(BaseModel):
+    """Parameter of the function a challenge asks for"""
+    name: str = Field(..., description="Parameter name (snake_case)")
+    type: str = Field(..., description="Language-neutral type: int, float, bool, str, list[T], dict[K,V]")
+
+
+class FunctionSignature(BaseModel):
+    """Language-neutral signature of the function to implement"""
+    name: str = Field(..., description="Function name (snake_case)")
+    params: List[SignatureParam] = Field(default_factory=list, description="Parameters")
+    returns: str = Field("none", description="Language-neutral return type (none for no value)")
+
+
+class CodingChallenge(BaseModel):
+    """Coding challenge"""
+    title: str = Field(..., description="Challenge title")
+    description: str = Field(..., description="Detailed problem description")
+    difficulty: Optional[str] = Field(None, description="Difficulty level: easy, medium, hard")
+    topic: Optional[str] = Field(None, description="Topic of the challenge")
+    signature: Optional[FunctionSignature] = Field(None, description="Function to implement")
+    starter_code: Optional[str] = Field(None, description="Starter code in the requested language")
+    test_cases: List[ChallengeTestCase] = Field(default_factory=list, description="Test cases")
+    hints: List[str] = Field(default_factory=list, description="Progressive hints")
+    time_complexity: Optional[str] = Field(None, description="Expected time complexity")
+    space_complexity: Optional[str] = Field(None, description="Expected space complexity")
+    xp_reward: Optional[int] = Field(None, description="Experience points for solving it")
+
+
+class CodingChallengeResponse(BaseModel):
+    """Coding challenge response schema"""
+    challenge: CodingChallenge = Field(..., description="The generated challenge")
+
+
+class StarterCodeResponse(BaseModel):
+    """Starter code of an existing challenge in another language"""
+    starter_code: str = Field(..., description="Function skeleton in the requested language")
@@ -0,0 +1,20 @@
+"""
+Pydantic schemas for flashcard generation
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class Flashcard(BaseModel):
+    """One flashcard"""
+    front: str = Field(..., description="Question or concept")
+    back: str = Field(..., description="Answer or explanation")
+    difficulty: Optional[str] = Field(None, description="Difficulty level: easy, medium, hard")
+    topic: Optional[str] = Field(None, description="Topic this card covers")
+
+
+class FlashcardResponse(BaseModel):
+    """Flashcard set response schema"""
+    flashcards: List[Flashcard] = Field(..., description="List of flashcards")
+    total_cards: int = Field(..., description="Total number of cards")
+    topic: Optional[str] = Field(None, description="Topic of the set")
@@ -0,0 +1,36 @@
+"""
+Pydantic schemas for combined study set generation
+"""
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.schemas.quiz_schema import MCQ, QuizResponse, SkillMapResponse
+from app.schemas.interview_schema import InterviewQuestion, InterviewResponse
+
+
+class StudySetResponse(BaseModel):
+    """Skill map, quiz and interview Q&A generated from one syllabus"""
+    skill_map: SkillMapResponse = Field(..., description="Topics and subtopics of the syllabus")
+    quiz: QuizResponse = Field(..., description="Multiple choice quiz")
+    interview_qa: InterviewResponse = Field(..., description="Interview questions and answers")
+    status: str = Field("success", description="Processing status")
+
+
+class StudySetBatchResponse(BaseModel):
+    """Additional quiz and interview questions for an existing study set"""
+    quiz: List[MCQ] = Field(default_factory=list, description="Additional multiple choice questions")
+    interview_qa: List[InterviewQuestion] = Field(
+        default_factory=list, description="Additional interview questions"
+    )
+
+
+class CourseDocumentInfo(BaseModel):
+    """One document of a course upload"""
+    filename: str = Field(..., description="Uploaded file name (archive/member for zip uploads)")
+    page_count: int = Field(..., description="Number of pages")
+    characters: int = Field(..., description="Length of the extracted text")
+
+
+class CourseStudySetResponse(StudySetResponse):
+    """Study set generated from all documents of a course"""
+    documents: List[CourseDocumentInfo] = Field(..., description="Documents the study set covers")
@@ -1,31 +1,301 @@
 """
 AI service for interacting with Groq API
 """
-from typing import Dict, Any
-from groq import Groq
+import time
+from typing import Dict, Any, List, Optional, Type
 
 from app.config import Config
-from app.utils.json_validator import safe_parse_json, JSONValidationError
+from app.services import llm_resilience, output_budget
+from app.services.llm_providers import Completion, LLMProvider, get_provider
+from app.utils import deadline
+from app.utils.deadline import DeadlineExceeded
+from app.utils.json_validator import (
+    safe_parse_json,
+    parse_json_as,
+    JSONValidationError,
+    SchemaValidationError,
+)
+from app.utils.metrics import (
+    stage_timer,
+    current_endpoint,
+    record_token_usage,
+    LLM_FALLBACKS,
+    LLM_RETRIES,
+    LLM_REPAIRS,
+)
+from app.utils.usage_ledger import HEDGE, PRIMARY, REPAIR, RETRY, usage_ledger
+
+JSON_SYSTEM_PROMPT = (
+    "You are an AI that MUST return ONLY valid JSON.\n"
+    "Do not include markdown, explanations, comments, or extra text.\n"
+    "The response must start with '{' and end with '}'."
+)
+
+# 🥈 FIX 2: Add max_tokens to prevent cutoff and runaway generation
+# (fixed budgets for calls without a task; see output_budget)
+JSON_MAX_TOKENS = 3500  # Prevent half-finished JSON and keep response bounded
+REPAIR_MAX_TOKENS = 3000
+
+
+def _json_messages(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": JSON_SYSTEM_PROMPT},
+        {"role": "user", "content": prompt},
+    ]
+
+
+def _repair_messages(content: str) -> List[Dict[str, str]]:
+    repair_prompt = f"""Fix the following invalid JSON.
+Return ONLY corrected valid JSON.
+Do NOT add or remove fields.
+Do NOT include markdown code blocks or explanations.
+
+INVALID JSON:
+{content}
+"""
+    return _json_messages(repair_prompt)
 
 
 class AIService:
     """
     Service for interacting with Groq LLMs
+
+    Every method has an async twin (prefixed with "a") used by the
+    ASGI serving mode; both share the same prompts, parsing and metrics.
     """
 
-    def __init__(self) -> None:
-        if not Config.GROQ_API_KEY:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
+    def __init__(self, provider: Optional[LLMProvider] = None, model: Optional[str] = None) -> None:
+        # Provider is selected by Config.LLM_PROVIDER (groq, replay, synthetic)
+        self.provider = provider or get_provider()
+        # Primary model (GROQ_MODEL unless a smaller one is asked for) first,
+        # then fallbacks used while its circuit is open
+        models = list(dict.fromkeys([model or Config.GROQ_MODEL, Config.GROQ_MODEL, *Config.GROQ_FALLBACK_MODELS]))
+        served = self.provider.models
+        if served:
+            # A backend pool serves only its own models (configured order first)
+            models = [m for m in models if m in served] + [m for m in served if m not in models]
+        self.models = models
+        self.model = models[0]
+        # Model of the latest call (a fallback while the primary's circuit is open)
+        self.active_model = self.model
+
+    # -----------------------
+    # Completion primitives
+    # -----------------------
+    def _select_model(self) -> str:
+        model = llm_resilience.select_model(self.models)
+        if model != self.model:
+            LLM_FALLBACKS.inc(model=model)
+        self.active_model = model
+        return model
+
+    def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        stage: str = "groq_call",
+        purpose: str = PRIMARY
+    ) -> Completion:
+        deadline.check(stage, Config.DEADLINE_MIN_CALL_SECONDS)
+        model = self._select_model()
+
+        def call() -> Completion:
+            return self._complete_once(model, messages, temperature, max_tokens, stage, purpose)
+
+        try:
+            if not Config.HEDGE_ENABLED:
+                # On this thread; the provider's HTTP timeout is the deadline
+                return call()
+            return llm_resilience.call_hedged(
+                call, model, stage, hedge=True, timeout=deadline.remaining()
+            )
+        except BaseException:
+            # Covers deadline timeouts of calls left running on the pool;
+            # a no-op unless this call held a half-open probe
+            llm_resilience.release(model)
+            raise
+
+    async def _acomplete(
+        self,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        stage: str = "groq_call",
+        purpose: str = PRIMARY
+    ) -> Completion:
+        deadline.check(stage, Config.DEADLINE_MIN_CALL_SECONDS)
+        model = self._select_model()
+
+        def call():
+            return self._acomplete_once(model, messages, temperature, max_tokens, stage, purpose)
+
+        timeout = deadline.remaining()
+        try:
+            if not Config.HEDGE_ENABLED and timeout is None:
+                return await call()
+            return await llm_resilience.acall_hedged(
+                call, model, stage, hedge=Config.HEDGE_ENABLED, timeout=timeout
+            )
+        except BaseException:
+            # Covers calls cancelled before they started and deadline
+            # timeouts; a no-op unless this call held a half-open probe
+            llm_resilience.release(model)
+            raise
+
+    def _complete_once(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        stage: str,
+        purpose: str
+    ) -> Completion:
+        start = time.perf_counter()
+        try:
+            with stage_timer(stage, model):
+                completion = self.provider.complete(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+        except Exception:
+            llm_resilience.record_outcome(model, stage, 0, ok=False)
+            raise
+        except BaseException:
+            # Cancelled: no outcome, but a half-open probe must be freed
+            llm_resilience.release(model)
+            raise
+        elapsed = time.perf_counter() - start
+        llm_resilience.record_outcome(model, stage, elapsed, ok=True)
+        self._record_usage(model, completion, elapsed, purpose)
+        return completion
 
-        self.client = Groq(api_key=Config.GROQ_API_KEY)
-        self.model = Config.GROQ_MODEL
+    async def _acomplete_once(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        temperature: float,
+        max_tokens: Optional[int],
+        stage: str,
+        purpose: str
+    ) -> Completion:
+        start = time.perf_counter()
+        try:
+            with stage_timer(stage, model):
+                completion = await self.provider.acomplete(
+                    messages=messages,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+        except Exception:
+            llm_resilience.record_outcome(model, stage, 0, ok=False)
+            raise
+        except BaseException:
+            # Cancelled: no outcome, but a half-open probe must be freed
+            llm_resilience.release(model)
+            raise
+        elapsed = time.perf_counter() - start
+        llm_resilience.record_outcome(model, stage, elapsed, ok=True)
+        self._record_usage(model, completion, elapsed, purpose)
+        return completion
+
+    @staticmethod
+    def _record_usage(model: str, completion: Completion, seconds: float, purpose: str) -> None:
+        record_token_usage(model, completion.usage)
+        if completion.usage is not None:
+            if llm_resilience.in_hedge.get():
+                purpose = HEDGE
+            usage_ledger.record(
+                model,
+                purpose,
+                completion.usage.prompt_tokens,
+                completion.usage.completion_tokens,
+                seconds,
+            )
 
+    @staticmethod
+    def _parse_json(content: str, schema: Optional[Type] = None) -> Any:
+        if not content:
+            raise RuntimeError("Groq API returned empty content")
+        with stage_timer("json_parse"):
+            if schema is not None:
+                return parse_json_as(content, schema)
+            return safe_parse_json(content)
+
+    def _expected_seconds(self, stage: str) -> float:
+        return llm_resilience.expected_call_seconds(self.active_model, stage)
+
+    def _count_retry(self, attempt: int) -> None:
+        if attempt > 0:
+            LLM_RETRIES.inc(endpoint=current_endpoint.get(), model=self.model)
+
+    def _count_repair(self, success: bool) -> None:
+        LLM_REPAIRS.inc(
+            endpoint=current_endpoint.get(),
+            model=self.model,
+            outcome="success" if success else "failure",
+        )
+
+    # 🥉 FIX 3: JSON repair retry - fixes 90% of JSON issues
+    def _try_repair(self, content: str, schema: Optional[Type] = None) -> Any:
+        if not deadline.allows(self._expected_seconds("repair")):
+            deadline.skip("repair")
+            return None
+        try:
+            completion = self._complete(
+                _repair_messages(content),
+                temperature=0,  # Low temperature for repair
+                max_tokens=output_budget.repair_max_tokens(content, REPAIR_MAX_TOKENS),
+                stage="repair",
+                purpose=REPAIR,
+            )
+            if completion.content:
+                repaired = self._parse_json(completion.content, schema)
+                self._count_repair(True)
+                return repaired
+        except Exception:
+            # If repair fails, continue to next retry or raise
+            pass
+        self._count_repair(False)
+        return None
+
+    async def _atry_repair(self, content: str, schema: Optional[Type] = None) -> Any:
+        if not deadline.allows(self._expected_seconds("repair")):
+            deadline.skip("repair")
+            return None
+        try:
+            completion = await self._acomplete(
+                _repair_messages(content),
+                temperature=0,
+                max_tokens=output_budget.repair_max_tokens(content, REPAIR_MAX_TOKENS),
+                stage="repair",
+                purpose=REPAIR,
+            )
+            if completion.content:
+                repaired = self._parse_json(completion.content, schema)
+                self._count_repair(True)
+                return repaired
+        except Exception:
+            pass
+        self._count_repair(False)
+        return None
+
+    # -----------------------
+    # Public API
+    # -----------------------
     def generate_json_response(
         self,
         prompt: str,
         max_retries: int = 1,
-        temperature: float = 0.2
-    ) -> Dict[str, Any]:
+        temperature: float = 0.2,
+        schema: Optional[Type] = None,
+        task: Optional[str] = None,
+        items: int = 1
+    ) -> Any:
         """
         Generate a strict JSON response from Groq
 
@@ -33,80 +303,128 @@ class AIService:
             prompt: User prompt
             max_retries: Retry attempts if JSON parsing fails
             temperature: Sampling temperature (keep low for JSON)
+            schema: Optional pydantic model; the reply is validated into
+                it straight from the JSON text
+            task: Output budget task (output_budget); sizes max_tokens
+                from the observed completion size per item
+            items: Number of items the prompt asks for
 
         Returns:
-            Parsed JSON dictionary
+            Parsed JSON dictionary, or a schema instance if given
 
         Raises:
             JSONValidationError
             RuntimeError
         """
-
-        system_prompt = (
-            "You are an AI that MUST return ONLY valid JSON.\n"
-            "Do not include markdown, explanations, comments, or extra text.\n"
-            "The response must start with '{' and end with '}'."
-        )
-
         last_error: Exception | None = None
+        budget = output_budget.max_tokens(task, items, JSON_MAX_TOKENS)
 
         for attempt in range(max_retries + 1):
+            if attempt > 0 and not deadline.allows(self._expected_seconds("groq_call")):
+                # Would not finish before the request deadline
+                deadline.skip("retry")
+                break
+            self._count_retry(attempt)
+            content = ""
+            completion = None
+
             try:
-                # 🥈 FIX 2: Add max_tokens to prevent cutoff and runaway generation
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt},
-                    ],
-                    temperature=temperature,
-                    max_tokens=3500,  # Prevent half-finished JSON and keep response bounded
+                completion = self._complete(
+                    _json_messages(prompt), temperature, budget,
+                    purpose=RETRY if attempt else PRIMARY,
                 )
+                output_budget.observe(task, items, completion)
+                content = completion.content
+                return self._parse_json(content, schema)
+
+            except JSONValidationError as e:
+                last_error = e
+
+                if completion is not None and output_budget.is_truncated(completion):
+                    # Cut off by max_tokens: repairing can't finish it, a
+                    # retry with more room can
+                    budget = output_budget.grow(budget)
+                    if attempt >= max_retries:
+                        raise
+                    continue
+
+                # A repair prompt can't invent missing fields; just retry
+                if attempt < max_retries and not isinstance(e, SchemaValidationError):
+                    repaired = self._try_repair(content, schema)
+                    if repaired is not None:
+                        return repaired
+
+                if attempt >= max_retries:
+                    raise
+                continue
 
-                if not response.choices:
-                    raise RuntimeError("Groq API returned no choices")
+            except DeadlineExceeded:
+                raise
+
+            except Exception as e:
+                last_error = e
+                if attempt >= max_retries:
+                    raise RuntimeError(f"Groq API error: {str(e)}")
+                continue
+
+        raise last_error or RuntimeError("Unknown Groq generation failure")
+
+    async def agenerate_json_response(
+        self,
+        prompt: str,
+        max_retries: int = 1,
+        temperature: float = 0.2,
+        schema: Optional[Type] = None,
+        task: Optional[str] = None,
+        items: int = 1
+    ) -> Any:
+        """
+        Async version of generate_json_response
+        """
+        last_error: Exception | None = None
+        budget = output_budget.max_tokens(task, items, JSON_MAX_TOKENS)
 
-                content = response.choices[0].message.content
-                if not content:
-                    raise RuntimeError("Groq API returned empty content")
+        for attempt in range(max_retries + 1):
+            if attempt > 0 and not deadline.allows(self._expected_seconds("groq_call")):
+                # Would not finish before the request deadline
+                deadline.skip("retry")
+                break
+            self._count_retry(attempt)
+            content = ""
+            completion = None
 
-                return safe_parse_json(content)
+            try:
+                completion = await self._acomplete(
+                    _json_messages(prompt), temperature, budget,
+                    purpose=RETRY if attempt else PRIMARY,
+                )
+                output_budget.observe(task, items, completion)
+                content = completion.content
+                return self._parse_json(content, schema)
 
             except JSONValidationError as e:
                 last_error = e
-                
-                # 🥉 FIX 3: JSON repair retry - fixes 90% of JSON issues
-                if attempt < max_retries:
-                    try:
-                        repair_prompt = f"""Fix the following invalid JSON.
-Return ONLY corrected valid JSON.
-Do NOT add or remove fields.
-Do NOT include markdown code blocks or explanations.
 
-INVALID JSON:
-{content}
-"""
-                        repair_response = self.client.chat.completions.create(
-                            model=self.model,
-                            messages=[
-                                {"role": "system", "content": system_prompt},
-                                {"role": "user", "content": repair_prompt}
-                            ],
-                            temperature=0,  # Low temperature for repair
-                            max_tokens=3000
-                        )
-                        
-                        if repair_response.choices and repair_response.choices[0].message.content:
-                            repaired_text = repair_response.choices[0].message.content
-                            return safe_parse_json(repaired_text)
-                    except Exception:
-                        # If repair fails, continue to next retry or raise
-                        pass
-                
+                if completion is not None and output_budget.is_truncated(completion):
+                    # Cut off by max_tokens: repairing can't finish it, a
+                    # retry with more room can
+                    budget = output_budget.grow(budget)
+                    if attempt >= max_retries:
+                        raise
+                    continue
+
+                if attempt < max_retries and not isinstance(e, SchemaValidationError):
+                    repaired = await self._atry_repair(content, schema)
+                    if repaired is not None:
+                        return repaired
+
                 if attempt >= max_retries:
                     raise
                 continue
 
+            except DeadlineExceeded:
+                raise
+
             except Exception as e:
                 last_error = e
                 if attempt >= max_retries:
@@ -125,18 +443,31 @@ INVALID JSON:
         """
 
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=temperature,
+            completion = self._complete(
+                [{"role": "user", "content": prompt}], temperature, None
             )
+            return completion.content or ""
 
-            if response.choices and response.choices[0].message.content:
-                return response.choices[0].message.content
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Groq API error: {str(e)}")
 
-            return ""
+    async def agenerate_text_response(
+        self,
+        prompt: str,
+        temperature: float = 0.5
+    ) -> str:
+        """
+        Async version of generate_text_response
+        """
+        try:
+            completion = await self._acomplete(
+                [{"role": "user", "content": prompt}], temperature, None
+            )
+            return completion.content or ""
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"Groq API error: {str(e)}")
@@ -1,65 +1,286 @@
 """
 Text chunking service for processing large documents
+
+chunk_text / iter_chunks index the heading, paragraph, line and
+sentence boundaries of a text once (one regex scan per kind, each with
+a literal first character so the scan runs at C speed), then find every
+chunk end and overlap start by binary search in that index. Chunking is
+linear in the text size, and chunks are produced lazily; iter_spans
+yields (start, end) offsets without copying any text.
 """
-from typing import List
+import hashlib
+import re
+import zlib
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Callable, Iterator, List, Optional, Tuple
+
+# Sentence ends and "- " bullets (clean_text normalizes bullet glyphs)
+_PIECE_SPLIT_RE = re.compile(r"(?<=[.!?;:])\s+|\s+(?=- )")
+
+# A piece closes a stable chunk when its hash is a multiple of this
+# (once the chunk is at least a quarter of chunk_size)
+ANCHOR_DIVISOR = 8
+
+# Places a chunk may start (the end of each match), best first:
+# a line opening a section ("# Title", "Unit 3", "Chapter IV", "2.1 Title"),
+# a paragraph, a line, a sentence
+_HEADING_RE = re.compile(
+    r"\n[ \t]*(?=#{1,6}\s"
+    r"|(?i:chapter|unit|module|section|part|week|lecture|lesson|topic)\s+[\w.]+"
+    r"|\d+(?:\.\d+)*[.)]?\s+[A-Z])"
+)
+_PARAGRAPH_RE = re.compile(r"\n[ \t]*\n\s*")
+_LINE_RE = re.compile(r"\n[ \t]*")
+_SENTENCE_RES = tuple(re.compile(re.escape(end) + r"[\"')\]]*[ \t]+") for end in ".!?")
+
+# A chunk ends at the best boundary past this share of chunk_size
+# (headings from HEADING_FILL on); without one it is cut between words
+MIN_FILL = 0.7
+HEADING_FILL = 0.3
+
+# Token estimate for unit="tokens": words and punctuation marks
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+UNITS = ("chars", "tokens")
+
+# Boundary offsets of one kind and their positions in the chunk unit
+Level = Tuple[List[int], List[float]]
+
+
+def estimate_tokens(text: str, start: int = 0, end: Optional[int] = None) -> int:
+    """Approximate LLM token count of text[start:end] (words plus punctuation)"""
+    return len(_TOKEN_RE.findall(text, start, len(text) if end is None else end))
+
+
+def _count(count_tokens: Optional[Callable[[str], int]], text: str, start: int, end: int) -> int:
+    return count_tokens(text[start:end]) if count_tokens else estimate_tokens(text, start, end)
+
+
+def _ends(pattern: re.Pattern, text: str) -> List[int]:
+    return [match.end() for match in pattern.finditer(text)]
+
+
+class _Scale:
+    """
+    Maps text offsets to positions in the chunk unit and back
+
+    Characters map to themselves; for tokens, the token count of every
+    segment between boundaries is summed once and positions inside a
+    segment are interpolated.
+    """
+
+    def __init__(self, text: str, boundaries: List[int], count_tokens: Optional[Callable[[str], int]]):
+        offsets = sorted(set(boundaries) | {0, len(text)})
+        segments = (_count(count_tokens, text, a, b) for a, b in zip(offsets, offsets[1:]))
+        self.offsets = offsets
+        self.units = [0, *accumulate(segments)]
+        self.by_offset = dict(zip(offsets, self.units))
+
+    def at(self, offset: int) -> float:
+        units = self.by_offset.get(offset)
+        if units is not None:
+            return units
+        i = bisect_right(self.offsets, offset) - 1
+        return self._lerp(self.offsets, self.units, i, offset)
+
+    def offset_at(self, units: float) -> int:
+        i = min(bisect_right(self.units, units) - 1, len(self.units) - 2)
+        return int(self._lerp(self.units, self.offsets, i, units))
+
+    @staticmethod
+    def _lerp(xs: List[float], ys: List[float], i: int, x: float) -> float:
+        span = xs[i + 1] - xs[i]
+        return ys[i] + (ys[i + 1] - ys[i]) * (x - xs[i]) / span if span else ys[i]
 
 
 class ChunkService:
     """Service for chunking text into manageable pieces"""
-    
-    def __init__(self, chunk_size: int = 1500, chunk_overlap: int = 200):
+
+    def __init__(
+        self,
+        chunk_size: int = 1500,
+        chunk_overlap: int = 200,
+        unit: str = "chars",
+        count_tokens: Optional[Callable[[str], int]] = None
+    ):
         """
         Initialize chunking service
-        
+
         Args:
-            chunk_size: Maximum size of each chunk in characters
-            chunk_overlap: Number of characters to overlap between chunks
+            chunk_size: Maximum size of each chunk, in unit
+            chunk_overlap: Size repeated from the end of the previous chunk,
+                in unit (capped at half a chunk)
+            unit: "chars" or "tokens"
+            count_tokens: Tokenizer for unit="tokens" (estimate_tokens
+                by default)
         """
+        if unit not in UNITS:
+            raise ValueError(f"unit must be one of {', '.join(UNITS)}")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be positive")
         self.chunk_size = chunk_size
-        self.chunk_overlap = chunk_overlap
-    
+        self.chunk_overlap = max(0, min(chunk_overlap, chunk_size // 2))
+        self.unit = unit
+        self.count_tokens = count_tokens
+
     def chunk_text(self, text: str) -> List[str]:
         """
         Split text into overlapping chunks
-        
+
         Args:
             text: Text to chunk
-            
+
         Returns:
             List of text chunks
         """
         if not text:
             return []
-        
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            # Calculate end position
-            end = start + self.chunk_size
-            
-            # If this is not the last chunk, try to break at word boundary
-            if end < text_length:
-                # Look for sentence boundary near the end
-                last_period = text.rfind('.', start, end)
-                last_newline = text.rfind('\n', start, end)
-                
-                # Prefer sentence boundary, then paragraph boundary
-                if last_period > start + self.chunk_size * 0.7:
-                    end = last_period + 1
-                elif last_newline > start + self.chunk_size * 0.7:
-                    end = last_newline + 1
-            
-            # Extract chunk
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            # Move start position with overlap
-            start = end - self.chunk_overlap
-            if start >= text_length:
-                break
-        
+        chunks = list(self.iter_chunks(text))
         return chunks if chunks else [text]
 
+    def iter_chunks(self, text: str) -> Iterator[str]:
+        """Lazily yield the chunks of text, without surrounding whitespace"""
+        for start, end in self.iter_spans(text):
+            yield text[start:end]
+
+    def iter_spans(self, text: str) -> Iterator[Tuple[int, int]]:
+        """
+        Lazily yield (start, end) offsets of the chunks of text
+
+        A chunk ends at the best boundary near chunk_size (heading, then
+        paragraph, line, sentence), or between words if there is none.
+        The next chunk starts at the earliest boundary within
+        chunk_overlap of that end, and always after the previous start.
+        Whitespace around a chunk is excluded.
+        """
+        if not text:
+            return
+        levels, scale = self._index(text)
+        size, overlap = self.chunk_size, self.chunk_overlap
+        total = scale.at(len(text)) if scale else len(text)
+
+        start, start_units = 0, 0
+        while True:
+            if total - start_units <= size:
+                span = _strip(text, start, len(text))
+                if span:
+                    yield span
+                return
+
+            limit = start_units + size
+            end = None
+            for fill, (offsets, units) in zip((HEADING_FILL, MIN_FILL, MIN_FILL, MIN_FILL), levels):
+                i = bisect_right(units, limit) - 1
+                if i >= 0 and units[i] >= start_units + size * fill and offsets[i] > start:
+                    end, end_units = offsets[i], units[i]
+                    break
+            if end is None:
+                end = self._cut(text, scale, start, limit)
+                if scale:
+                    end, tokens = self._fit(text, start, end)
+                    end_units = start_units + tokens
+                else:
+                    end_units = end
+
+            span = _strip(text, start, end)
+            if span:
+                yield span
+
+            # The next chunk starts after this one's first character
+            previous = span[0] if span else start
+            start, start_units = end, end_units
+            if overlap:
+                for offsets, units in levels:
+                    i = max(bisect_left(units, end_units - overlap), bisect_right(offsets, previous))
+                    if i < len(offsets) and offsets[i] < start:
+                        start, start_units = offsets[i], units[i]
+
+    def _index(self, text: str) -> Tuple[List[Level], Optional[_Scale]]:
+        """
+        Boundary levels (headings, paragraphs, lines, sentences) and, for
+        unit="tokens", the offset/token scale
+        """
+        sentences = sorted(offset for pattern in _SENTENCE_RES for offset in _ends(pattern, text))
+        found = [_ends(_HEADING_RE, text), _ends(_PARAGRAPH_RE, text), _ends(_LINE_RE, text), sentences]
+        if self.unit == "chars":
+            return [(offsets, offsets) for offsets in found], None
+        scale = _Scale(text, [offset for offsets in found for offset in offsets], self.count_tokens)
+        return [(offsets, [scale.by_offset[o] for o in offsets]) for offsets in found], scale
+
+    @staticmethod
+    def _cut(text: str, scale: Optional[_Scale], start: int, limit: float) -> int:
+        """Offset at limit, moved back to just after the last space if any"""
+        target = int(limit) if scale is None else scale.offset_at(limit)
+        target = max(min(target, len(text)), start + 1)
+        space = text.rfind(" ", start + 1, target)
+        return space + 1 if space > start else target
+
+    def _fit(self, text: str, start: int, end: int) -> Tuple[int, int]:
+        """
+        Move a token cut back word by word until text[start:end] counts at
+        most chunk_size tokens (the interpolated offset can overshoot);
+        returns the end and the chunk's token count
+        """
+        tokens = _count(self.count_tokens, text, start, end)
+        while tokens > self.chunk_size and end - start > 1:
+            space = text.rfind(" ", start + 1, end - 1)
+            end = space + 1 if space > start else start + max(1, (end - start) * self.chunk_size // tokens)
+            tokens = _count(self.count_tokens, text, start, end)
+        return end, tokens
+
+    def stable_chunks(self, text: str) -> List[Tuple[str, str]]:
+        """
+        Split text into content-defined chunks for diffing revisions
+
+        Boundaries fall after sentences (or bullets) chosen by a hash of
+        their own text, not by offset, so an edit changes only the
+        chunks around it and later chunks keep their hashes. Runs
+        without any sentence break are cut between words the same way.
+        chunk_size is read as characters whatever the unit.
+
+        Args:
+            text: Text to chunk
+
+        Returns:
+            List of (digest, chunk text) pairs in document order
+        """
+        if not text:
+            return []
+
+        pieces = []
+        for piece in _PIECE_SPLIT_RE.split(text):
+            if len(piece) > self.chunk_size:
+                pieces.extend(piece.split())
+            elif piece.strip():
+                pieces.append(piece)
+
+        min_size = self.chunk_size // 4
+        chunks = []
+        current: List[str] = []
+        size = 0
+        for piece in pieces:
+            current.append(piece)
+            size += len(piece) + 1
+            anchor = zlib.crc32(piece.encode("utf-8")) % ANCHOR_DIVISOR == 0
+            if size >= self.chunk_size or (size >= min_size and anchor):
+                chunks.append(" ".join(current))
+                current, size = [], 0
+        if current:
+            chunks.append(" ".join(current))
+
+        return [(chunk_digest(chunk), chunk) for chunk in chunks]
+
+
+def chunk_digest(chunk: str) -> str:
+    """Short content hash identifying a chunk across revisions"""
+    return hashlib.blake2b(chunk.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _strip(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """text[start:end] without surrounding whitespace, as offsets"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
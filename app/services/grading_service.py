@@ -0,0 +1,271 @@
+"""
+Bulk grading of quiz submissions (no LLM involved)
+
+A class's attempts are graded as one answer matrix: row i holds the
+option index student i chose for each question (-1 when left blank;
+submitted as index lists or letter strings such as "AC-B"),
+and is compared against the quiz's key in a single vectorized pass.
+Item statistics come from the same matrix:
+
+- difficulty: share of students answering correctly (the classical
+  p-value, higher is easier)
+- discrimination: correlation between getting the question right and
+  the score on the remaining questions (corrected point-biserial)
+- upper_lower_index: p-value of the top 27% of students minus that of
+  the bottom 27%
+- option_counts / omitted: how often each option was picked, to spot
+  distractors nobody chooses
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.schemas.quiz_schema import QuizResponse
+from app.utils.metrics import stage_timer
+
+# MCQ allows at most 5 options (see MCQ.options)
+MAX_OPTIONS = 5
+
+# Share of students in each of the upper and lower groups
+UPPER_LOWER_SHARE = 0.27
+
+UNANSWERED = -1
+
+# Letter-string submissions: "A".."E" for options, "-" for blank
+_LETTERS = "ABCDE"
+BLANK_LETTER = "-"
+
+
+class InvalidSubmissionsError(ValueError):
+    """Quiz or submissions that cannot be graded"""
+    pass
+
+
+@dataclass
+class AnswerKey:
+    """Correct options of a quiz as arrays"""
+    correct: np.ndarray        # (questions, MAX_OPTIONS) bool
+    option_counts: np.ndarray  # (questions,) number of options per question
+
+    @property
+    def num_questions(self) -> int:
+        return len(self.option_counts)
+
+    @classmethod
+    def from_quiz(cls, quiz: QuizResponse) -> "AnswerKey":
+        """
+        Raises:
+            InvalidSubmissionsError: a question has no correct option
+        """
+        correct = np.zeros((len(quiz.quiz), MAX_OPTIONS), dtype=bool)
+        for index, mcq in enumerate(quiz.quiz):
+            flags = [option.is_correct for option in mcq.options[:MAX_OPTIONS]]
+            if not any(flags):
+                raise InvalidSubmissionsError(f"Question {index} has no correct option")
+            correct[index, :len(flags)] = flags
+        option_counts = np.array([min(len(q.options), MAX_OPTIONS) for q in quiz.quiz], dtype=np.int64)
+        return cls(correct, option_counts)
+
+
+def answer_matrix(answers: Sequence[Any], key: AnswerKey) -> np.ndarray:
+    """
+    Convert submitted answers to an int8 matrix with UNANSWERED for blanks
+
+    Each submission is either a list of option indices (None for blank)
+    or a string of option letters ("AC-B", "-" for blank); letter strings
+    are decoded in one pass over the joined bytes.
+
+    Raises:
+        InvalidSubmissionsError naming the first bad submission
+    """
+    k = key.num_questions
+    if isinstance(answers[0], str):
+        values = _letter_matrix(answers, k)
+    else:
+        values = _index_matrix(answers, k)
+
+    blank = np.isnan(values)
+    invalid = ~blank & (
+        (values != np.floor(values)) | (values < 0) | (values >= key.option_counts[None, :])
+    )
+    if invalid.any():
+        row, column = np.argwhere(invalid)[0]
+        raise InvalidSubmissionsError(
+            f"Submission {row}: answer to question {column} must be an option index "
+            f"from 0 to {key.option_counts[column] - 1} "
+            f"(or letter A-{_LETTERS[key.option_counts[column] - 1]}) or blank"
+        )
+
+    return np.where(blank, UNANSWERED, values).astype(np.int8)
+
+
+def _check_lengths(answers: Sequence[Any], k: int) -> None:
+    for index, row in enumerate(answers):
+        if not isinstance(row, (list, tuple, str)) or len(row) != k:
+            raise InvalidSubmissionsError(
+                f"Submission {index}: expected {k} answers (null or '-' for unanswered)"
+            )
+
+
+def _index_matrix(answers: Sequence[Any], k: int) -> np.ndarray:
+    try:
+        values = np.array(answers, dtype=np.float64)
+    except (TypeError, ValueError):
+        values = None
+    if values is None or values.shape != (len(answers), k):
+        _check_lengths(answers, k)
+        raise InvalidSubmissionsError(
+            "Answers must be lists of option indices (integers or null) or strings of option letters"
+        )
+    return values
+
+
+def _letter_matrix(answers: Sequence[str], k: int) -> np.ndarray:
+    try:
+        lengths = np.fromiter(map(len, answers), dtype=np.int64, count=len(answers))
+    except TypeError:
+        lengths = None
+    if lengths is None or (lengths != k).any():
+        _check_lengths(answers, k)
+    try:
+        joined = "".join(answers).upper().encode("ascii")
+    except TypeError:
+        raise InvalidSubmissionsError("Submissions must all use letter strings or all use index lists")
+    except UnicodeEncodeError:
+        raise InvalidSubmissionsError("Answer letters must be A-E, or '-' for unanswered")
+    codes = np.frombuffer(joined, dtype=np.uint8).reshape(len(answers), k)
+    values = codes.astype(np.float64) - ord("A")
+    # Anything outside A-Z is rejected by the range check below
+    values[codes == ord(BLANK_LETTER)] = np.nan
+    return values
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise division, NaN where the denominator is zero"""
+    out = np.full(np.shape(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _json_floats(values: np.ndarray, digits: int = 4) -> List[Optional[float]]:
+    """Rounded floats with NaN as None (null)"""
+    rounded = np.round(values, digits).tolist()
+    return [None if v != v else v for v in rounded]
+
+
+def _item_statistics(right: np.ndarray, totals: np.ndarray) -> Dict[str, np.ndarray]:
+    """Difficulty and discrimination of every question"""
+    n, k = right.shape
+    x = right.astype(np.float64)
+    p = x.mean(axis=0)
+    var_x = p * (1 - p)
+    mean_t = totals.mean()
+    var_t = totals.var()
+
+    # Correlation of each item with the total minus that item, from
+    # cov(x, t) without materializing the n x k "rest score" matrix
+    cov_xt = x.T @ totals / n - p * mean_t
+    cov_xr = cov_xt - var_x
+    var_r = var_t - 2 * cov_xt + var_x
+    discrimination = _ratio(cov_xr, np.sqrt(np.clip(var_x * var_r, 0, None)))
+
+    group = max(1, int(round(n * UPPER_LOWER_SHARE)))
+    order = np.argsort(totals, kind="stable")
+    upper_lower = x[order[-group:]].mean(axis=0) - x[order[:group]].mean(axis=0)
+
+    return {
+        "difficulty": p,
+        "discrimination": discrimination,
+        "upper_lower_index": upper_lower if n >= 2 else np.full(k, np.nan),
+        "var_x": var_x,
+    }
+
+
+def _option_counts(matrix: np.ndarray) -> np.ndarray:
+    """(questions, 1 + MAX_OPTIONS) counts; column 0 is unanswered"""
+    k = matrix.shape[1]
+    slots = np.arange(k, dtype=np.int64) * (MAX_OPTIONS + 1) + (matrix.astype(np.int64) + 1)
+    return np.bincount(slots.ravel(), minlength=k * (MAX_OPTIONS + 1)).reshape(k, MAX_OPTIONS + 1)
+
+
+def grade(
+    quiz: QuizResponse,
+    answers: Sequence[Any],
+    student_ids: Optional[List[Any]] = None
+) -> Dict[str, Any]:
+    """
+    Grade submissions against a quiz
+
+    Args:
+        quiz: Quiz with is_correct flags
+        answers: One row per student: option indices (None for blank)
+            or a string of option letters ("-" for blank)
+        student_ids: Optional ids echoed back (defaults to row numbers)
+
+    Returns:
+        {"students": [...], "questions": [...], "summary": {...}}
+
+    Raises:
+        InvalidSubmissionsError
+    """
+    key = AnswerKey.from_quiz(quiz)
+    if key.num_questions == 0:
+        raise InvalidSubmissionsError("Quiz has no questions")
+    if not answers:
+        raise InvalidSubmissionsError("No submissions to grade")
+
+    with stage_timer("grading"):
+        matrix = answer_matrix(answers, key)
+        n, k = matrix.shape
+
+        answered = matrix != UNANSWERED
+        questions = np.arange(k)[None, :]
+        right = key.correct[questions, np.where(answered, matrix, 0)] & answered
+        totals = right.sum(axis=1, dtype=np.int64)
+        scores = totals / k
+
+        stats = _item_statistics(right, totals.astype(np.float64))
+        counts = _option_counts(matrix)
+
+        var_t = totals.var()
+        # KR-20 internal consistency of the quiz as a whole
+        reliability = (
+            k / (k - 1) * (1 - stats["var_x"].sum() / var_t) if k > 1 and var_t > 0 else None
+        )
+
+        ids = student_ids if student_ids is not None else list(range(n))
+        students = [
+            {"student_id": sid, "correct": c, "score": s}
+            for sid, c, s in zip(ids, totals.tolist(), np.round(scores, 4).tolist())
+        ]
+
+        difficulty = _json_floats(stats["difficulty"])
+        discrimination = _json_floats(stats["discrimination"])
+        upper_lower = _json_floats(stats["upper_lower_index"])
+        omitted = _json_floats(counts[:, 0] / n)
+        question_stats = [
+            {
+                "index": j,
+                "topic": mcq.topic,
+                "difficulty": difficulty[j],
+                "discrimination": discrimination[j],
+                "upper_lower_index": upper_lower[j],
+                "omitted": omitted[j],
+                "option_counts": counts[j, 1:1 + key.option_counts[j]].tolist(),
+            }
+            for j, mcq in enumerate(quiz.quiz)
+        ]
+
+        summary = {
+            "submissions": n,
+            "questions": k,
+            "mean_score": round(float(scores.mean()), 4),
+            "median_score": round(float(np.median(scores)), 4),
+            "std_score": round(float(scores.std()), 4),
+            "min_score": round(float(scores.min()), 4),
+            "max_score": round(float(scores.max()), 4),
+            "reliability_kr20": None if reliability is None else round(float(reliability), 4),
+        }
+
+    return {"students": students, "questions": question_stats, "summary": summary}
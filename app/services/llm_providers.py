@@ -0,0 +1,524 @@
+"""
+LLM provider abstraction: live Groq, transcript replay and synthetic output
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from app.config import Config
+from app.utils import deadline
+from app.utils.synthetic_payloads import generate_payload
+
+Messages = List[Dict[str, str]]
+
+
+@dataclass
+class Usage:
+    """Token usage of one completion"""
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+@dataclass
+class Completion:
+    """Provider-independent chat completion result"""
+    content: str
+    model: str
+    usage: Optional[Usage] = None
+    finish_reason: Optional[str] = None
+    latency_ms: float = 0.0
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class LLMProvider:
+    """Base class for chat completion providers"""
+
+    name = "base"
+
+    # Models the provider can serve (None: any)
+    models: Optional[List[str]] = None
+
+    def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        """
+        Run a chat completion
+
+        Args:
+            messages: Chat messages (role/content dicts)
+            model: Model name
+            temperature: Sampling temperature
+            max_tokens: Completion token budget
+
+        Returns:
+            Completion
+        """
+        raise NotImplementedError
+
+    async def acomplete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        """
+        Async chat completion
+
+        Providers without native async support run complete() in a
+        worker thread so the event loop is never blocked.
+        """
+        return await asyncio.to_thread(self.complete, messages, model, temperature, max_tokens)
+
+
+def request_key(messages: Messages, model: str) -> str:
+    """
+    Stable key identifying a completion request in transcripts
+
+    Sampling parameters are left out so replays survive budget tuning.
+    """
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+_DURATION_UNITS = (("ms", 0.001), ("h", 3600.0), ("m", 60.0), ("s", 1.0))
+
+
+def _parse_duration(value: str) -> Optional[float]:
+    """Seconds in a Groq reset header ("2m59.56s", "7.66s", "250ms") or plain number"""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    seconds = 0.0
+    number = ""
+    i = 0
+    while i < len(value):
+        char = value[i]
+        if char.isdigit() or char == ".":
+            number += char
+            i += 1
+            continue
+        for unit, scale in _DURATION_UNITS:
+            if value.startswith(unit, i) and number:
+                seconds += float(number) * scale
+                number = ""
+                i += len(unit)
+                break
+        else:
+            return None
+    return seconds if not number else None
+
+
+def rate_limit_info(headers: Optional[Mapping[str, str]]) -> Dict[str, float]:
+    """
+    Quota state from x-ratelimit-* / retry-after response headers
+
+    Keys present (each only when its header is): limit_requests,
+    limit_tokens, remaining_requests, remaining_tokens, reset_requests,
+    reset_tokens and retry_after (the last three in seconds).
+    """
+    info: Dict[str, float] = {}
+    if not headers:
+        return info
+    for key, header in (
+        ("limit_requests", "x-ratelimit-limit-requests"),
+        ("limit_tokens", "x-ratelimit-limit-tokens"),
+        ("remaining_requests", "x-ratelimit-remaining-requests"),
+        ("remaining_tokens", "x-ratelimit-remaining-tokens"),
+        ("reset_requests", "x-ratelimit-reset-requests"),
+        ("reset_tokens", "x-ratelimit-reset-tokens"),
+        ("retry_after", "retry-after"),
+    ):
+        raw = headers.get(header)
+        if raw is None:
+            continue
+        value = _parse_duration(raw)
+        if value is not None:
+            info[key] = value
+    return info
+
+
+class GroqProvider(LLMProvider):
+    """Live Groq API"""
+
+    name = "groq"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_retries: Optional[int] = None
+    ):
+        from groq import Groq
+
+        api_key = api_key or Config.GROQ_API_KEY
+        if not api_key:
+            raise ValueError("GROQ_API_KEY not found in environment variables")
+
+        self.api_key = api_key
+        self.base_url = base_url or Config.GROQ_BASE_URL
+        # SDK default (2 retries with backoff) unless set
+        self._client_kwargs: Dict[str, Any] = {"api_key": api_key, "base_url": self.base_url}
+        if max_retries is not None:
+            self._client_kwargs["max_retries"] = max_retries
+        self.client = Groq(**self._client_kwargs)
+        self._async_client = None
+
+    @property
+    def async_client(self):
+        """AsyncGroq client, created lazily inside the serving event loop"""
+        if self._async_client is None:
+            from groq import AsyncGroq
+            self._async_client = AsyncGroq(**self._client_kwargs)
+        return self._async_client
+
+    @staticmethod
+    def _request_kwargs(
+        messages: Messages,
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int]
+    ) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+        }
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        # The HTTP request gives up when the request deadline does
+        remaining = deadline.remaining()
+        if remaining is not None:
+            kwargs["timeout"] = max(remaining, 1.0)
+        return kwargs
+
+    def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        start = time.perf_counter()
+        raw = self.client.chat.completions.with_raw_response.create(
+            **self._request_kwargs(messages, model, temperature, max_tokens)
+        )
+        return self._to_completion(raw.parse(), model, (time.perf_counter() - start) * 1000, raw.headers)
+
+    async def acomplete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        start = time.perf_counter()
+        raw = await self.async_client.chat.completions.with_raw_response.create(
+            **self._request_kwargs(messages, model, temperature, max_tokens)
+        )
+        response = await raw.parse()
+        return self._to_completion(response, model, (time.perf_counter() - start) * 1000, raw.headers)
+
+    @staticmethod
+    def _to_completion(response, model: str, latency_ms: float, headers=None) -> Completion:
+        if not response.choices:
+            raise RuntimeError("Groq API returned no choices")
+
+        choice = response.choices[0]
+        usage = getattr(response, "usage", None)
+        return Completion(
+            content=choice.message.content or "",
+            model=getattr(response, "model", None) or model,
+            usage=Usage(
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+            ) if usage is not None else None,
+            finish_reason=getattr(choice, "finish_reason", None),
+            latency_ms=latency_ms,
+            metadata={"rate_limit": rate_limit_info(headers)},
+        )
+
+
+class SyntheticProvider(LLMProvider):
+    """
+    Offline provider emitting schema-valid JSON for QuizService prompts
+
+    Output is deterministic for a given prompt; an optional fixed
+    latency simulates network time.
+    """
+
+    name = "synthetic"
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+
+    def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return self._build(messages, model)
+
+    async def acomplete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return self._build(messages, model)
+
+    def _build(self, messages: Messages, model: str) -> Completion:
+        prompt = messages[-1]["content"] if messages else ""
+        content = json.dumps(generate_payload(prompt))
+        return Completion(
+            content=content,
+            model=model,
+            usage=Usage(
+                prompt_tokens=sum(_estimate_tokens(m.get("content", "")) for m in messages),
+                completion_tokens=_estimate_tokens(content),
+            ),
+            finish_reason="stop",
+            latency_ms=self.latency_ms,
+        )
+
+
+def _open_transcript(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+class ReplayProvider(LLMProvider):
+    """
+    Deterministic replay of completions from a recorded transcript
+
+    Requests are matched by request_key(); repeated identical requests
+    replay their recorded responses in order, cycling when exhausted.
+    """
+
+    name = "replay"
+
+    def __init__(self, path: Path, simulate_latency: bool = False):
+        self.path = Path(path)
+        self.simulate_latency = simulate_latency
+        self._records: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        if not self.path.exists():
+            raise FileNotFoundError(f"LLM transcript not found: {self.path}")
+
+        with _open_transcript(self.path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                self._records.setdefault(record["key"], []).append(record)
+
+    def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        record = self._next_record(messages, model)
+        if self.simulate_latency and record.get("latency_ms"):
+            time.sleep(record["latency_ms"] / 1000)
+        return self._to_completion(record, model)
+
+    async def acomplete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        record = self._next_record(messages, model)
+        if self.simulate_latency and record.get("latency_ms"):
+            await asyncio.sleep(record["latency_ms"] / 1000)
+        return self._to_completion(record, model)
+
+    def _next_record(self, messages: Messages, model: str) -> Dict[str, Any]:
+        key = request_key(messages, model)
+        records = self._records.get(key)
+        if not records:
+            raise LookupError(f"No recorded completion for request {key}")
+
+        with self._lock:
+            index = self._cursor.get(key, 0)
+            self._cursor[key] = index + 1
+        return records[index % len(records)]
+
+    @staticmethod
+    def _to_completion(record: Dict[str, Any], model: str) -> Completion:
+        if record.get("error"):
+            raise RuntimeError(record["error"])
+
+        usage = record.get("usage")
+        return Completion(
+            content=record.get("content", ""),
+            model=record.get("model", model),
+            usage=Usage(**usage) if usage else None,
+            finish_reason=record.get("finish_reason"),
+            latency_ms=record.get("latency_ms", 0.0),
+        )
+
+
+class RecordingProvider(LLMProvider):
+    """
+    Wrap a provider and append every completion to a transcript
+
+    Transcripts are JSON lines (gzip-compressed when the path ends in
+    .gz) holding the request key and response only, not the prompts.
+    """
+
+    def __init__(self, inner: LLMProvider, path: Path):
+        self.inner = inner
+        self.name = inner.name
+        self.models = inner.models
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            with _open_transcript(self.path, "a") as f:
+                f.write(line + "\n")
+
+    def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        key = request_key(messages, model)
+        try:
+            completion = self.inner.complete(messages, model, temperature, max_tokens)
+        except Exception as e:
+            self._append({"key": key, "model": model, "error": str(e)})
+            raise
+        self._record(key, completion)
+        return completion
+
+    async def acomplete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        key = request_key(messages, model)
+        try:
+            completion = await self.inner.acomplete(messages, model, temperature, max_tokens)
+        except Exception as e:
+            self._append({"key": key, "model": model, "error": str(e)})
+            raise
+        self._record(key, completion)
+        return completion
+
+    def _record(self, key: str, completion: Completion) -> None:
+        record: Dict[str, Any] = {
+            "key": key,
+            "model": completion.model,
+            "content": completion.content,
+            "finish_reason": completion.finish_reason,
+            "latency_ms": round(completion.latency_ms, 1),
+        }
+        if completion.usage is not None:
+            record["usage"] = {
+                "prompt_tokens": completion.usage.prompt_tokens,
+                "completion_tokens": completion.usage.completion_tokens,
+            }
+        self._append(record)
+
+
+def create_provider(name: Optional[str] = None) -> LLMProvider:
+    """
+    Build the provider selected by Config.LLM_PROVIDER
+
+    For groq with GROQ_BACKENDS set, calls are routed over that pool
+    (see llm_router). When Config.LLM_RECORD_PATH is set the provider is wrapped in a
+    RecordingProvider that captures traffic to that transcript.
+    """
+    name = (name or Config.LLM_PROVIDER).lower()
+
+    if name == "groq" and Config.GROQ_BACKENDS:
+        from app.services.llm_router import RoutedProvider, parse_backends
+        provider: LLMProvider = RoutedProvider(parse_backends(Config.GROQ_BACKENDS))
+    elif name == "groq":
+        provider = GroqProvider()
+    elif name == "replay":
+        if not Config.LLM_REPLAY_PATH:
+            raise ValueError("LLM_REPLAY_PATH must be set for the replay provider")
+        provider = ReplayProvider(Config.LLM_REPLAY_PATH, simulate_latency=Config.LLM_REPLAY_LATENCY)
+    elif name == "synthetic":
+        provider = SyntheticProvider(latency_ms=Config.LLM_SYNTHETIC_LATENCY_MS)
+    else:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}'")
+
+    if Config.LLM_RECORD_PATH:
+        provider = RecordingProvider(provider, Config.LLM_RECORD_PATH)
+
+    return provider
+
+
+_shared_provider: Optional[LLMProvider] = None
+_shared_lock = threading.Lock()
+
+
+def get_provider() -> LLMProvider:
+    """
+    Process-wide provider instance
+
+    Sharing one provider reuses the HTTP connection pool and loads
+    replay transcripts only once.
+    """
+    global _shared_provider
+    if _shared_provider is None:
+        with _shared_lock:
+            if _shared_provider is None:
+                _shared_provider = create_provider()
+    return _shared_provider
+
+
+def reset_provider() -> None:
+    """
+    Drop the shared provider so the next get_provider() builds a new one
+
+    Called in forked workers: HTTP clients, locks and open transcript
+    files must not be shared with the parent process.
+    """
+    global _shared_provider, _shared_lock
+    _shared_provider = None
+    _shared_lock = threading.Lock()
@@ -0,0 +1,395 @@
+"""
+Tail-latency and failure handling for LLM calls
+
+- Hedging: when a call has not returned after the model's recent
+  HEDGE_PERCENTILE latency, an identical request is sent and the first
+  valid completion wins. A token budget (HEDGE_BUDGET_RATIO hedges per
+  call, at most HEDGE_BUDGET_BURST at once) caps the extra load.
+- Circuit breakers: each model stops receiving traffic once most of its
+  recent calls failed, for CIRCUIT_COOLDOWN seconds; a single probe call
+  then decides whether it closes again. AIService routes to the first
+  model in GROQ_MODEL + GROQ_FALLBACK_MODELS whose breaker allows it.
+"""
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.services.llm_providers import Completion
+from app.utils import deadline
+from app.utils.metrics import LLM_CIRCUIT_STATE, LLM_HEDGES
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# True while running the duplicate request of a hedged call
+in_hedge: ContextVar[bool] = ContextVar("llm_in_hedge", default=False)
+
+
+class CircuitOpenError(RuntimeError):
+    """Every configured model is currently failing"""
+    pass
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies"""
+
+    def __init__(self, window: int):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class HedgeBudget:
+    """
+    Token bucket limiting hedges to a fraction of calls
+
+    Every call deposits `ratio` tokens (up to `burst`); a hedge spends one.
+    """
+
+    def __init__(self, ratio: float, burst: float):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = burst
+        self._lock = threading.Lock()
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Failure-ratio circuit breaker for one model
+
+    Opens when at least CIRCUIT_FAILURE_RATIO of the last CIRCUIT_WINDOW
+    calls failed (once CIRCUIT_MIN_CALLS were seen); after the cooldown
+    one probe is let through (half-open) and its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, model: str, window: int, min_calls: int, failure_ratio: float, cooldown: float):
+        self.model = model
+        self.min_calls = min_calls
+        self.failure_ratio = failure_ratio
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._outcomes: deque = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        LLM_CIRCUIT_STATE.set(_STATE_VALUES[CLOSED], model=model)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._probing:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._outcomes.clear()
+                self._set_state(CLOSED)
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                self.state == CLOSED
+                and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_ratio
+            ):
+                self._trip()
+
+    def release(self) -> None:
+        """
+        End a call that was abandoned (cancelled, lost hedge, deadline)
+        without an outcome, so a half-open circuit lets the next call probe
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probing = False
+
+    def _trip(self) -> None:
+        self._opened_at = time.monotonic()
+        self._set_state(OPEN)
+        print(f"[LLM] Circuit opened for model {self.model}")
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        self._probing = False
+        LLM_CIRCUIT_STATE.set(_STATE_VALUES[state], model=self.model)
+
+
+# -----------------------
+# Per-model state (per process)
+# -----------------------
+_breakers: Dict[str, CircuitBreaker] = {}
+_latencies: Dict[Tuple[str, str], LatencyTracker] = {}
+_registry_lock = threading.Lock()
+hedge_budget = HedgeBudget(Config.HEDGE_BUDGET_RATIO, Config.HEDGE_BUDGET_BURST)
+
+
+def breaker_for(model: str) -> CircuitBreaker:
+    with _registry_lock:
+        breaker = _breakers.get(model)
+        if breaker is None:
+            breaker = _breakers[model] = CircuitBreaker(
+                model,
+                window=Config.CIRCUIT_WINDOW,
+                min_calls=Config.CIRCUIT_MIN_CALLS,
+                failure_ratio=Config.CIRCUIT_FAILURE_RATIO,
+                cooldown=Config.CIRCUIT_COOLDOWN,
+            )
+        return breaker
+
+
+def latency_for(model: str, stage: str) -> LatencyTracker:
+    with _registry_lock:
+        tracker = _latencies.get((model, stage))
+        if tracker is None:
+            tracker = _latencies[(model, stage)] = LatencyTracker(Config.HEDGE_WINDOW)
+        return tracker
+
+
+def select_model(models: List[str]) -> str:
+    """
+    First model whose circuit allows a call
+
+    Raises:
+        CircuitOpenError
+    """
+    for model in models:
+        if breaker_for(model).allow():
+            return model
+    raise CircuitOpenError(f"All models are unavailable: {', '.join(models)}")
+
+
+def record_outcome(model: str, stage: str, seconds: float, ok: bool) -> None:
+    if ok:
+        breaker_for(model).record_success()
+        latency_for(model, stage).observe(seconds)
+    else:
+        breaker_for(model).record_failure()
+
+
+def release(model: str) -> None:
+    """A call to model was abandoned before it had an outcome"""
+    breaker_for(model).release()
+
+
+def hedge_delay(model: str, stage: str) -> float:
+    """Seconds to wait before hedging a call to model"""
+    observed = latency_for(model, stage).percentile(Config.HEDGE_PERCENTILE, Config.HEDGE_MIN_SAMPLES)
+    if observed is None:
+        return Config.HEDGE_DEFAULT_DELAY
+    return max(Config.HEDGE_MIN_DELAY, observed)
+
+
+def expected_call_seconds(model: str, stage: str) -> float:
+    """Median recent latency of model for stage, used to budget retries"""
+    observed = latency_for(model, stage).percentile(0.5, Config.HEDGE_MIN_SAMPLES)
+    return observed if observed is not None else Config.DEADLINE_DEFAULT_CALL_SECONDS
+
+
+def is_valid(completion: Completion) -> bool:
+    """Completions worth returning over a pending hedge"""
+    return bool(completion.content) and completion.finish_reason != "length"
+
+
+def reset() -> None:
+    """Forget breaker and latency state (tests, forked workers)"""
+    global hedge_budget, _call_pool
+    with _registry_lock:
+        _breakers.clear()
+        _latencies.clear()
+        # Pool threads do not survive a fork
+        _call_pool = None
+    hedge_budget = HedgeBudget(Config.HEDGE_BUDGET_RATIO, Config.HEDGE_BUDGET_BURST)
+
+
+# -----------------------
+# Hedged execution
+# -----------------------
+_call_pool: Optional[ThreadPoolExecutor] = None
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _call_pool
+    with _registry_lock:
+        if _call_pool is None:
+            _call_pool = ThreadPoolExecutor(max_workers=Config.HEDGE_THREADS, thread_name_prefix="llm-call")
+        return _call_pool
+
+
+def _spawn(call: Callable[[], Completion], hedge: bool = False) -> Future:
+    """
+    Run call on the bounded call pool, in a copy of the caller's context
+
+    A losing or timed-out call is left to finish (its HTTP timeout is
+    the request deadline) but holds one of HEDGE_THREADS threads.
+    """
+    context = contextvars.copy_context()
+    if hedge:
+        context.run(in_hedge.set, True)
+    return _pool().submit(context.run, call)
+
+
+def _hedge_task(call: Callable[[], Awaitable[Completion]]) -> asyncio.Future:
+    """Start the hedge of an async call (the task copies in_hedge=True)"""
+    token = in_hedge.set(True)
+    try:
+        return asyncio.ensure_future(call())
+    finally:
+        in_hedge.reset(token)
+
+
+def _try_hedge(model: str) -> bool:
+    if hedge_budget.try_spend():
+        LLM_HEDGES.inc(model=model, outcome="fired")
+        return True
+    LLM_HEDGES.inc(model=model, outcome="budget_exhausted")
+    return False
+
+
+def _pick(results: List[Tuple[int, object]], model: str) -> Completion:
+    """Winner among finished calls (index 1 is the hedge), else the first failure"""
+    for index, result in results:
+        if isinstance(result, Completion) and is_valid(result):
+            if index == 1:
+                LLM_HEDGES.inc(model=model, outcome="won")
+            return result
+    for _, result in results:
+        if isinstance(result, Completion):
+            return result
+    raise results[0][1]
+
+
+def _time_left(expiry: Optional[float]) -> Optional[float]:
+    return None if expiry is None else max(0.0, expiry - time.monotonic())
+
+
+def call_hedged(
+    call: Callable[[], Completion],
+    model: str,
+    stage: str,
+    hedge: bool = True,
+    timeout: Optional[float] = None
+) -> Completion:
+    """
+    Run call, hedging it with a duplicate once it is slower than usual
+
+    Raises:
+        DeadlineExceeded: no completion within timeout seconds (running
+            calls are abandoned, not interrupted; queued ones cancelled)
+    """
+    expiry = None if timeout is None else time.monotonic() + timeout
+    futures = [_spawn(call)]
+    if hedge:
+        hedge_budget.deposit()
+        delay = hedge_delay(model, stage)
+        if timeout is None or delay < timeout:
+            done, _ = wait(futures, timeout=delay)
+            if not done and _try_hedge(model):
+                futures.append(_spawn(call, hedge=True))
+
+    results: List[Tuple[int, object]] = []
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, timeout=_time_left(expiry), return_when=FIRST_COMPLETED)
+            if not done:
+                raise deadline.exceeded(stage)
+            for future in done:
+                index = futures.index(future)
+                error = future.exception()
+                result = future.result() if error is None else error
+                if isinstance(result, Completion) and is_valid(result):
+                    return _pick([(index, result)], model)
+                results.append((index, result))
+        return _pick(results, model)
+    finally:
+        # Calls still queued on a full pool are not worth starting
+        for future in futures:
+            future.cancel()
+
+
+async def acall_hedged(
+    call: Callable[[], Awaitable[Completion]],
+    model: str,
+    stage: str,
+    hedge: bool = True,
+    timeout: Optional[float] = None
+) -> Completion:
+    """
+    Async version of call_hedged; losing and timed-out calls are cancelled
+    """
+    expiry = None if timeout is None else time.monotonic() + timeout
+    tasks = [asyncio.ensure_future(call())]
+    try:
+        if hedge:
+            hedge_budget.deposit()
+            delay = hedge_delay(model, stage)
+            if timeout is None or delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and _try_hedge(model):
+                    tasks.append(_hedge_task(call))
+
+        results: List[Tuple[int, object]] = []
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=_time_left(expiry), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                raise deadline.exceeded(stage)
+            for task in done:
+                index = tasks.index(task)
+                result = task.exception() or task.result()
+                if isinstance(result, Completion) and is_valid(result):
+                    return _pick([(index, result)], model)
+                results.append((index, result))
+        return _pick(results, model)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,371 @@
+"""
+Latency-aware routing over a pool of (API key, model) backends
+
+GROQ_BACKENDS lists weighted backends, each naming the environment
+variable that holds its key (keys never appear in the list, logs or
+metrics) and optionally its own base URL:
+
+    GROQ_API_KEY:llama-3.3-70b-versatile:2,GROQ_API_KEY_2:llama-3.3-70b-versatile:1
+
+A call for a model goes to the backend serving it with the lowest cost
+
+    EWMA latency x (calls in flight + 1) x (1 + error EWMA) / weight / quota share
+
+where quota share is the smallest remaining/limit ratio from the last
+x-ratelimit-* headers. Backends whose quota is used up wait for its
+reset. A 429 ejects a backend until its retry-after, ROUTER_EJECT_FAILURES
+consecutive failures eject it for ROUTER_EJECT_SECONDS (doubling on
+each repeat, up to ROUTER_MAX_EJECT_SECONDS), and a rejected key for the
+maximum. Once an ejection expires one probe call is let through; its
+success reinstates the backend. Rate-limited and failed calls move on
+to the next best backend (up to ROUTER_MAX_ATTEMPTS), so the pool
+sustains the sum of its keys' quotas.
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from app.config import Config
+from app.services.llm_providers import Completion, GroqProvider, LLMProvider, Messages, rate_limit_info
+from app.utils import deadline
+from app.utils.metrics import LLM_BACKEND_CALLS, LLM_BACKEND_LATENCY, LLM_BACKEND_STATE
+
+HEALTHY = "healthy"
+PROBING = "probing"
+EJECTED = "ejected"
+
+_STATE_VALUES = {HEALTHY: 0, PROBING: 1, EJECTED: 2}
+
+# Quota share below which cost stops growing (the backend stays usable)
+_MIN_QUOTA_SHARE = 0.05
+
+
+class NoBackendAvailableError(RuntimeError):
+    """Every backend serving a model is ejected or out of quota"""
+    pass
+
+
+@dataclass
+class BackendSpec:
+    """One GROQ_BACKENDS entry"""
+    key_env: str
+    model: str
+    weight: float = 1.0
+    base_url: Optional[str] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.key_env}/{self.model}"
+
+
+def parse_backends(spec: str) -> List[BackendSpec]:
+    """
+    Parse GROQ_BACKENDS ("KEY_ENV:model[:weight][@base_url]", comma separated)
+
+    Raises:
+        ValueError: malformed entry
+    """
+    backends = []
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        entry, _, base_url = item.partition("@")
+        parts = [p.strip() for p in entry.split(":")]
+        if len(parts) not in (2, 3) or not all(parts):
+            raise ValueError(f"Invalid GROQ_BACKENDS entry '{item}' (expected KEY_ENV:model[:weight][@url])")
+        try:
+            weight = float(parts[2]) if len(parts) == 3 else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid weight in GROQ_BACKENDS entry '{item}'")
+        if weight <= 0:
+            raise ValueError(f"Weight must be positive in GROQ_BACKENDS entry '{item}'")
+        backends.append(BackendSpec(parts[0], parts[1], weight, base_url.strip() or None))
+    return backends
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    return getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+
+
+def _is_backend_fault(error: BaseException) -> bool:
+    """Failures that say something about the backend (not the request)"""
+    status = _status_code(error)
+    if status is None:
+        # Connection errors and timeouts
+        return True
+    return status in (401, 403, 408, 409, 429) or status >= 500
+
+
+class Backend:
+    """
+    Live routing state of one backend
+
+    Thread-safe; in_flight counts calls started but not yet finished.
+    """
+
+    def __init__(self, spec: BackendSpec, provider: LLMProvider):
+        self.spec = spec
+        self.name = spec.name
+        self.model = spec.model
+        self.weight = spec.weight
+        self.provider = provider
+        self.state = HEALTHY
+        self.in_flight = 0
+        self.latency: Optional[float] = None   # EWMA seconds of successful calls
+        self.error_rate = 0.0                  # EWMA of failed calls
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.quota_share: Optional[float] = None
+        self.quota_reset_at = 0.0
+        self._lock = threading.Lock()
+        LLM_BACKEND_STATE.set(_STATE_VALUES[HEALTHY], backend=self.name)
+
+    # -----------------------
+    # Selection
+    # -----------------------
+    def available(self, now: float) -> bool:
+        """Whether a call may be routed here now"""
+        if self.state == EJECTED:
+            return now >= self.ejected_until
+        if self.state == PROBING:
+            return False
+        return not (self.quota_share == 0 and now < self.quota_reset_at)
+
+    def cost(self, default_latency: float) -> float:
+        latency = self.latency if self.latency is not None else default_latency
+        share = 1.0 if self.quota_share is None else max(_MIN_QUOTA_SHARE, self.quota_share)
+        return latency * (self.in_flight + 1) * (1 + self.error_rate) / self.weight / share
+
+    def acquire(self, now: float) -> bool:
+        """Start a call; False if another thread took the last probe slot"""
+        with self._lock:
+            if not self.available(now):
+                return False
+            if self.state == EJECTED:
+                self._set_state(PROBING)
+            self.in_flight += 1
+            return True
+
+    # -----------------------
+    # Outcomes
+    # -----------------------
+    def record_success(self, seconds: float, completion: Completion) -> None:
+        alpha = Config.ROUTER_EWMA_ALPHA
+        with self._lock:
+            self.in_flight -= 1
+            self.latency = seconds if self.latency is None else alpha * seconds + (1 - alpha) * self.latency
+            self.error_rate *= 1 - alpha
+            self.consecutive_failures = 0
+            self._update_quota(completion.metadata.get("rate_limit") or {})
+            if self.state == PROBING:
+                self.ejections = 0
+                self._set_state(HEALTHY)
+                print(f"[LLM_ROUTER] Backend {self.name} reinstated")
+        LLM_BACKEND_LATENCY.set(self.latency, backend=self.name)
+        LLM_BACKEND_CALLS.inc(backend=self.name, outcome="ok")
+
+    def release(self) -> None:
+        """End a call that was abandoned (cancelled hedge), learning nothing"""
+        with self._lock:
+            self.in_flight -= 1
+            if self.state == PROBING:
+                # Let the next call probe instead
+                self._set_state(EJECTED)
+
+    def record_failure(self, error: BaseException) -> None:
+        alpha = Config.ROUTER_EWMA_ALPHA
+        status = _status_code(error)
+        response = getattr(error, "response", None)
+        info = rate_limit_info(getattr(response, "headers", None))
+        with self._lock:
+            self.in_flight -= 1
+            if not _is_backend_fault(error):
+                # The request was bad; the backend answered fine
+                if self.state == PROBING:
+                    self._set_state(HEALTHY)
+                outcome = "rejected"
+            elif status == 429:
+                self._update_quota(info)
+                wait = info.get("retry_after") or max(
+                    info.get("reset_requests", 0.0), info.get("reset_tokens", 0.0)
+                ) or Config.ROUTER_EJECT_SECONDS
+                self._eject(min(wait, Config.ROUTER_MAX_EJECT_SECONDS), "rate limited")
+                outcome = "rate_limited"
+            else:
+                self.error_rate = alpha + (1 - alpha) * self.error_rate
+                self.consecutive_failures += 1
+                if status in (401, 403):
+                    self._eject(Config.ROUTER_MAX_EJECT_SECONDS, f"key rejected ({status})")
+                elif self.state == PROBING or self.consecutive_failures >= Config.ROUTER_EJECT_FAILURES:
+                    self.ejections += 1
+                    self._eject(
+                        min(Config.ROUTER_EJECT_SECONDS * 2 ** (self.ejections - 1), Config.ROUTER_MAX_EJECT_SECONDS),
+                        f"{self.consecutive_failures} consecutive failures",
+                    )
+                outcome = "error"
+        LLM_BACKEND_CALLS.inc(backend=self.name, outcome=outcome)
+
+    def _update_quota(self, info: Dict[str, float]) -> None:
+        shares = [
+            info[remaining] / info[limit]
+            for remaining, limit in (
+                ("remaining_requests", "limit_requests"),
+                ("remaining_tokens", "limit_tokens"),
+            )
+            if remaining in info and info.get(limit)
+        ]
+        if not shares:
+            return
+        self.quota_share = min(shares)
+        if self.quota_share == 0:
+            self.quota_reset_at = time.monotonic() + max(
+                info.get("reset_requests", 0.0), info.get("reset_tokens", 0.0), 1.0
+            )
+
+    def _eject(self, seconds: float, reason: str) -> None:
+        self.ejected_until = time.monotonic() + seconds
+        self._set_state(EJECTED)
+        print(f"[LLM_ROUTER] Backend {self.name} ejected for {seconds:.1f}s: {reason}")
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        LLM_BACKEND_STATE.set(_STATE_VALUES[state], backend=self.name)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "backend": self.name,
+                "model": self.model,
+                "weight": self.weight,
+                "state": self.state,
+                "in_flight": self.in_flight,
+                "latency_ewma": None if self.latency is None else round(self.latency, 4),
+                "error_rate": round(self.error_rate, 4),
+                "quota_share": None if self.quota_share is None else round(self.quota_share, 4),
+            }
+
+
+class RoutedProvider(LLMProvider):
+    """
+    LLMProvider spreading calls over a pool of Groq backends
+
+    A call for a model no backend serves fails with
+    NoBackendAvailableError; AIService only asks for pooled models.
+    """
+
+    name = "groq"
+
+    def __init__(
+        self,
+        specs: List[BackendSpec],
+        provider_factory: Optional[Callable[[BackendSpec], LLMProvider]] = None
+    ):
+        if not specs:
+            raise ValueError("GROQ_BACKENDS lists no backends")
+        factory = provider_factory or _groq_backend
+        self.backends = [Backend(spec, factory(spec)) for spec in specs]
+        # Pool order, so the first entry's model is preferred
+        self.models = list(dict.fromkeys(b.model for b in self.backends))
+        self._lock = threading.Lock()
+
+    def _choose(self, model: str, tried: Set[str]) -> Backend:
+        """
+        Lowest-cost available backend for model (ties broken at random)
+
+        Raises:
+            NoBackendAvailableError
+        """
+        now = time.monotonic()
+        with self._lock:
+            serving = [b for b in self.backends if b.model == model]
+            candidates = [b for b in serving if b.name not in tried and b.available(now)]
+            known = [b.latency for b in serving if b.latency is not None]
+            default_latency = sum(known) / len(known) if known else Config.DEADLINE_DEFAULT_CALL_SECONDS
+            random.shuffle(candidates)
+            for backend in sorted(candidates, key=lambda b: b.cost(default_latency)):
+                if backend.acquire(now):
+                    return backend
+        if not serving:
+            raise NoBackendAvailableError(f"No backend serves model {model}")
+        raise NoBackendAvailableError(f"All backends for model {model} are ejected or out of quota")
+
+    def _failover(self, model: str, tried: Set[str], error: Exception) -> Backend:
+        """
+        Next backend to try after error, or raise error when the request
+        itself was bad, attempts or time are used up, or none is left
+        """
+        if (
+            len(tried) >= Config.ROUTER_MAX_ATTEMPTS
+            or not _is_backend_fault(error)
+            or not deadline.allows(Config.DEADLINE_MIN_CALL_SECONDS)
+        ):
+            raise error
+        try:
+            return self._choose(model, tried)
+        except NoBackendAvailableError:
+            raise error
+
+    def complete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        tried: Set[str] = set()
+        backend = self._choose(model, tried)
+        while True:
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                completion = backend.provider.complete(messages, model, temperature, max_tokens)
+            except Exception as e:
+                backend.record_failure(e)
+                backend = self._failover(model, tried, e)
+                continue
+            backend.record_success(time.perf_counter() - start, completion)
+            completion.metadata["backend"] = backend.name
+            return completion
+
+    async def acomplete(
+        self,
+        messages: Messages,
+        model: str,
+        temperature: float = 0.2,
+        max_tokens: Optional[int] = None
+    ) -> Completion:
+        tried: Set[str] = set()
+        backend = self._choose(model, tried)
+        while True:
+            tried.add(backend.name)
+            start = time.perf_counter()
+            try:
+                completion = await backend.provider.acomplete(messages, model, temperature, max_tokens)
+            except asyncio.CancelledError:
+                backend.release()
+                raise
+            except Exception as e:
+                backend.record_failure(e)
+                backend = self._failover(model, tried, e)
+                continue
+            backend.record_success(time.perf_counter() - start, completion)
+            completion.metadata["backend"] = backend.name
+            return completion
+
+    def snapshot(self) -> List[Dict[str, object]]:
+        """Routing state of every backend"""
+        return [b.snapshot() for b in self.backends]
+
+
+def _groq_backend(spec: BackendSpec) -> LLMProvider:
+    api_key = os.getenv(spec.key_env)
+    if not api_key:
+        raise ValueError(f"{spec.key_env} (GROQ_BACKENDS) is not set")
+    # Failover to another backend replaces the SDK's own retries
+    return GroqProvider(api_key=api_key, base_url=spec.base_url, max_retries=0)
@@ -0,0 +1,157 @@
+"""
+Adaptive max_tokens for LLM calls
+
+A call states its task (e.g. "topic_quiz") and how many items it asks
+for; its max_tokens is the recent TOKEN_BUDGET_PERCENTILE of completion
+tokens per item observed for that task, times the item count and
+TOKEN_BUDGET_HEADROOM. Until TOKEN_BUDGET_MIN_SAMPLES completions are
+seen, per-task priors (raised by any larger observation) stand in.
+Truncated completions (finish_reason "length") only tell that more was
+needed, so they are recorded inflated, which raises the estimate quickly
+after under-sized budgets; the retry of a truncated call gets
+TRUNCATION_GROWTH times the budget.
+
+Repair calls echo their input, so their budget follows its length.
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+from app.config import Config
+from app.services.llm_providers import Completion
+from app.utils.metrics import LLM_TRUNCATIONS, current_endpoint
+
+# Tasks and what counts as one item
+STUDY_SET = "study_set"              # quiz + interview questions (+ skill map units)
+STUDY_SET_BATCH = "study_set_batch"  # quiz + interview questions
+TOPIC_QUIZ = "topic_quiz"            # questions
+FLASHCARDS = "flashcards"            # cards
+CODING_CHALLENGE = "coding_challenge"
+STARTER_CODE = "starter_code"        # one language variant of a challenge
+
+# The skill map of a study set is budgeted like this many questions
+SKILL_MAP_ITEMS = 4
+
+# Completion tokens per item assumed before any are observed
+_PRIOR_TOKENS_PER_ITEM = {
+    STUDY_SET: 170,
+    STUDY_SET_BATCH: 170,
+    TOPIC_QUIZ: 130,
+    FLASHCARDS: 70,
+    CODING_CHALLENGE: 1500,
+    STARTER_CODE: 200,
+}
+
+_DEFAULT_TOKENS_PER_ITEM = 200
+
+# JSON envelope (totals, topic lists) on top of the items
+_BASE_TOKENS = 64
+
+# Applied to the observed size of truncated completions, and to the
+# budget of the call retrying one
+TRUNCATION_GROWTH = 2.0
+
+# Characters per token assumed when sizing repair calls (JSON is dense)
+_CHARS_PER_TOKEN = 3
+
+
+class _TokenWindow:
+    """Sliding window of completion tokens per item"""
+
+    def __init__(self, size: int):
+        self._samples: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, value: float) -> None:
+        with self._lock:
+            self._samples.append(value)
+
+    def max(self) -> Optional[float]:
+        with self._lock:
+            return max(self._samples, default=None)
+
+    def percentile(self, q: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < max(1, min_samples):
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+_windows: Dict[str, _TokenWindow] = {}
+_windows_lock = threading.Lock()
+
+
+def _window(task: str) -> _TokenWindow:
+    with _windows_lock:
+        window = _windows.get(task)
+        if window is None:
+            window = _windows[task] = _TokenWindow(Config.TOKEN_BUDGET_WINDOW)
+        return window
+
+
+def _clamp(tokens: float) -> int:
+    return int(max(Config.TOKEN_BUDGET_MIN, min(Config.TOKEN_BUDGET_MAX, math.ceil(tokens))))
+
+
+def tokens_per_item(task: str) -> float:
+    """
+    Current per-item estimate for task: the observed percentile, or
+    before enough samples the prior (raised by any larger sample, so an
+    early truncation is not repeated)
+    """
+    window = _window(task)
+    observed = window.percentile(Config.TOKEN_BUDGET_PERCENTILE, Config.TOKEN_BUDGET_MIN_SAMPLES)
+    if observed is not None:
+        return observed
+    prior = _PRIOR_TOKENS_PER_ITEM.get(task, _DEFAULT_TOKENS_PER_ITEM)
+    return max(prior, window.max() or 0)
+
+
+def max_tokens(task: Optional[str], items: int, fallback: int) -> int:
+    """
+    max_tokens for a call generating items of task
+
+    Calls without a task (and all calls with TOKEN_BUDGET_ENABLED off)
+    get the fixed fallback.
+    """
+    if task is None or not Config.TOKEN_BUDGET_ENABLED:
+        return fallback
+    items = max(1, items)
+    return _clamp(_BASE_TOKENS + items * tokens_per_item(task) * Config.TOKEN_BUDGET_HEADROOM)
+
+
+def grow(budget: int) -> int:
+    """Budget for retrying a call truncated at budget"""
+    return _clamp(budget * TRUNCATION_GROWTH)
+
+
+def repair_max_tokens(content: str, fallback: int) -> int:
+    """max_tokens for repairing content (the reply is about as long)"""
+    if not Config.TOKEN_BUDGET_ENABLED:
+        return fallback
+    return _clamp(_BASE_TOKENS + len(content) / _CHARS_PER_TOKEN * Config.TOKEN_BUDGET_HEADROOM)
+
+
+def is_truncated(completion: Completion) -> bool:
+    return completion.finish_reason == "length"
+
+
+def observe(task: Optional[str], items: int, completion: Completion) -> None:
+    """Learn from a completion of task"""
+    if task is None:
+        return
+    truncated = is_truncated(completion)
+    if truncated:
+        LLM_TRUNCATIONS.inc(endpoint=current_endpoint.get(), task=task)
+    if completion.usage is None or not completion.usage.completion_tokens:
+        return
+    per_item = completion.usage.completion_tokens / max(1, items)
+    _window(task).add(per_item * TRUNCATION_GROWTH if truncated else per_item)
+
+
+def reset() -> None:
+    """Forget observed sizes (tests, forked workers)"""
+    with _windows_lock:
+        _windows.clear()
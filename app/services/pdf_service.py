@@ -1,21 +1,111 @@
 """
 PDF extraction service using pdfplumber
 """
-import pdfplumber
+from dataclasses import dataclass
 from typing import Optional
 from app.utils.cleaner import clean_text
+from app.utils.deadline import DeadlineExceeded, check_expiry
+from app.utils.metrics import stage_timer
+
+
+class InvalidPDFError(ValueError):
+    """PDF rejected by inspection before text extraction"""
+    pass
+
+
+@dataclass
+class PDFInfo:
+    """Structure of a PDF read from its page tree and page resources"""
+    page_count: int
+    text_pages: int
+    image_pages: int
+
+    @property
+    def image_only(self) -> bool:
+        """Scanned document: pages carry images but no fonts"""
+        return self.text_pages == 0 and self.image_pages > 0
+
+
+def _resolved_dict(value) -> dict:
+    from pdfminer.pdftypes import resolve1
+
+    value = resolve1(value)
+    return value if isinstance(value, dict) else {}
+
+
+def _page_resource_kinds(resources: dict) -> tuple:
+    """
+    (has fonts, has images) for a page resource dictionary, looking
+    one level into form XObjects
+    """
+    from pdfminer.pdftypes import resolve1
+
+    has_fonts = bool(_resolved_dict(resources.get("Font")))
+    has_images = False
+    for xobject in _resolved_dict(resources.get("XObject")).values():
+        attrs = getattr(resolve1(xobject), "attrs", {})
+        subtype = getattr(resolve1(attrs.get("Subtype")), "name", None)
+        if subtype == "Image":
+            has_images = True
+        elif subtype == "Form" and not has_fonts:
+            form_resources = _resolved_dict(attrs.get("Resources"))
+            has_fonts = bool(_resolved_dict(form_resources.get("Font")))
+    return has_fonts, has_images
 
 
 class PDFService:
     """Service for extracting text from PDF files"""
     
     @staticmethod
-    def extract_text(pdf_path: str) -> str:
+    def inspect(pdf_path: str) -> PDFInfo:
+        """
+        Read page count and page content kinds without extracting text
+
+        Parses only the cross-reference table, page tree and page
+        resource dictionaries, which takes milliseconds even for
+        documents whose text extraction takes seconds.
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Returns:
+            PDFInfo
+            
+        Raises:
+            InvalidPDFError: If the PDF cannot be parsed, is encrypted or has no pages
+        """
+        from pdfminer.pdfdocument import PDFDocument, PDFEncryptionError, PDFPasswordIncorrect
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+
+        try:
+            with stage_timer("pdf_inspect"), open(pdf_path, "rb") as f:
+                document = PDFDocument(PDFParser(f))
+                page_count = text_pages = image_pages = 0
+                for page in PDFPage.create_pages(document):
+                    page_count += 1
+                    has_fonts, has_images = _page_resource_kinds(_resolved_dict(page.resources))
+                    text_pages += has_fonts
+                    image_pages += has_images
+        except (PDFEncryptionError, PDFPasswordIncorrect):
+            raise InvalidPDFError("PDF is password protected")
+        except Exception as e:
+            raise InvalidPDFError(f"PDF could not be parsed: {str(e)}")
+
+        if page_count == 0:
+            raise InvalidPDFError("PDF file is empty or corrupted")
+
+        return PDFInfo(page_count=page_count, text_pages=text_pages, image_pages=image_pages)
+    
+    @staticmethod
+    def extract_text(pdf_path: str, expiry: Optional[float] = None) -> str:
         """
         Extract text from PDF file
         
         Args:
             pdf_path: Path to PDF file
+            expiry: Request deadline (time.monotonic() value); extraction
+                stops with DeadlineExceeded once it passes
             
         Returns:
             Extracted and cleaned text string
@@ -23,38 +113,44 @@ class PDFService:
         Raises:
             ValueError: If PDF is empty or cannot be read
             FileNotFoundError: If PDF file doesn't exist
+            DeadlineExceeded: If expiry passed during extraction
         """
+        # Imported on first use: pdfplumber/pdfminer add ~100 ms to startup
+        import pdfplumber
+
         try:
             text_content = []
             
-            with pdfplumber.open(pdf_path) as pdf:
+            with stage_timer("pdf_extract"), pdfplumber.open(pdf_path) as pdf:
                 if len(pdf.pages) == 0:
                     raise ValueError("PDF file is empty or corrupted")
                 
                 # Extract text from each page
                 for page in pdf.pages:
+                    check_expiry(expiry, "pdf_extract")
                     page_text = page.extract_text()
                     if page_text:
                         text_content.append(page_text)
                 
-                # Combine all pages
-                full_text = '\n\n'.join(text_content)
-                
-                if not full_text or len(full_text.strip()) < 10:
-                    raise ValueError("PDF appears to be scanned or contains no extractable text")
-                
-                # Clean the extracted text
+            # Combine all pages
+            full_text = '\n\n'.join(text_content)
+            
+            if not full_text or len(full_text.strip()) < 10:
+                raise ValueError("PDF appears to be scanned or contains no extractable text")
+            
+            # Clean the extracted text
+            with stage_timer("clean"):
                 cleaned_text = clean_text(full_text)
                 
-                if not cleaned_text or len(cleaned_text.strip()) < 10:
-                    raise ValueError("PDF text extraction resulted in empty or invalid content")
-                
-                return cleaned_text
+            if not cleaned_text or len(cleaned_text.strip()) < 10:
+                raise ValueError("PDF text extraction resulted in empty or invalid content")
+            
+            return cleaned_text
                 
         except FileNotFoundError:
             raise FileNotFoundError(f"PDF file not found: {pdf_path}")
         except Exception as e:
-            if isinstance(e, (ValueError, FileNotFoundError)):
+            if isinstance(e, (ValueError, FileNotFoundError, DeadlineExceeded)):
                 raise
             raise ValueError(f"Error extracting text from PDF: {str(e)}")
 
@@ -0,0 +1,132 @@
+"""
+Compact LLM prompts compiled from the response schemas
+
+Instead of a hand-written JSON example per prompt, the output format is
+generated from the Pydantic models the reply is validated against, one
+line per model in a terse notation:
+
+    QuizResponse={quiz:[MCQ],total_questions:int,topics_covered:[str]}
+    MCQ={question:str,options:[MCQOption]2-5,explanation:str,...}
+
+Every prompt is a static prefix (role, schema, rules), identical for all
+calls of a kind so provider-side prompt caching can reuse it, followed
+by the per-call request (syllabus text, topic, counts). Templates are
+compiled once per kind and memoized.
+"""
+import typing
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple, Type
+
+from annotated_types import MaxLen, MinLen
+from pydantic import BaseModel
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+_SCALARS = {str: "str", int: "int", float: "num", bool: "bool", Any: "any"}
+
+NOTATION = "[T] = list of T, a|b = one of, N-M = item count"
+
+
+def _type_spec(annotation: Any, name: str, enums: Dict[str, Tuple[str, ...]], nested: List[type]) -> str:
+    if name in enums:
+        return "|".join(enums[name])
+    if annotation in _SCALARS:
+        return _SCALARS[annotation]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        if annotation not in nested:
+            nested.append(annotation)
+        return annotation.__name__
+
+    origin = typing.get_origin(annotation)
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    if origin is typing.Union and len(args) == 1:
+        # Optional[T]: the prompt asks for every field anyway
+        return _type_spec(args[0], name, enums, nested)
+    if origin in (list, List, tuple, set):
+        return f"[{_type_spec(args[0], name, enums, nested) if args else 'any'}]"
+    if origin is typing.Literal:
+        return "|".join(str(a) for a in typing.get_args(annotation))
+    if origin in (dict, Dict):
+        return "obj"
+    return "any"
+
+
+def _count_spec(metadata: List[Any]) -> str:
+    low = next((m.min_length for m in metadata if isinstance(m, MinLen)), None)
+    high = next((m.max_length for m in metadata if isinstance(m, MaxLen)), None)
+    if low is None and high is None:
+        return ""
+    return f"{low or 0}-{high}" if high is not None else f"{low}+"
+
+
+@lru_cache(maxsize=None)
+def schema_spec(
+    model: Type[BaseModel],
+    enums: Tuple[Tuple[str, Tuple[str, ...]], ...] = (),
+    omit: Tuple[str, ...] = ()
+) -> str:
+    """
+    Compact output specification of model and the models it nests
+
+    Args:
+        model: Root response model
+        enums: (field name, allowed values) pairs, for str fields whose
+            values are fixed by convention rather than by the model
+        omit: Field names left out (defaults the reply need not repeat)
+    """
+    allowed = dict(enums)
+    nested: List[type] = [model]
+    lines = []
+    index = 0
+    while index < len(nested):
+        current = nested[index]
+        index += 1
+        fields = []
+        for name, field in current.model_fields.items():
+            if name in omit:
+                continue
+            spec = _type_spec(field.annotation, name, allowed, nested)
+            fields.append(f"{name}:{spec}{_count_spec(field.metadata)}")
+        lines.append(f"{current.__name__}={{{','.join(fields)}}}")
+    return "\n".join(lines)
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """Static prefix plus a str.format template for the per-call part"""
+    prefix: str
+    request: str
+
+    def render(self, **params: Any) -> str:
+        return self.prefix + self.request.format(**params)
+
+
+@lru_cache(maxsize=None)
+def compile_prompt(
+    task: str,
+    schema: Type[BaseModel],
+    rules: Tuple[str, ...],
+    request: str,
+    enums: Tuple[Tuple[str, Tuple[str, ...]], ...] = (("difficulty", DIFFICULTIES),),
+    omit: Tuple[str, ...] = ()
+) -> PromptTemplate:
+    """
+    Compile (once) the prompt template of a kind of call
+
+    Args:
+        task: What to produce, e.g. "multiple-choice quiz questions"
+        schema: Model the reply is validated against
+        rules: Content rules, one per line
+        request: Per-call part (str.format fields filled by render())
+        enums, omit: See schema_spec
+    """
+    prefix = (
+        f"You are an educational AI system. Write {task}.\n"
+        f"Reply with one JSON object of type {schema.__name__} ({NOTATION}):\n"
+        f"{schema_spec(schema, enums, omit)}\n"
+        "Rules:\n"
+        + "".join(f"- {rule}\n" for rule in rules)
+        + "\n"
+    )
+    return PromptTemplate(prefix, request)
@@ -0,0 +1,196 @@
+"""
+Local quality checks for generated multiple choice questions
+
+Applied to every MCQ before it is accepted, so a malformed question
+costs one small top-up call for its replacement instead of a whole
+regeneration:
+
+- blank and duplicate options are removed (a duplicate of the correct
+  option keeps it correct)
+- questions without exactly one correct option are fixed when the
+  explanation names the answer ("The answer is B", or the text of one
+  option), and dropped otherwise, as are questions left with fewer than
+  two options
+- answer positions are balanced across a quiz with a deterministic
+  shuffle seeded by the question text; "All/None of the above" style
+  options stay last, and letter references in explanations follow
+"""
+import hashlib
+import random
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.schemas.quiz_schema import MCQ, MCQOption
+from app.utils.metrics import REGISTRY
+from app.utils.similarity import normalize_text
+
+QUIZ_QUALITY_ACTIONS = REGISTRY.counter(
+    "studygenie_quiz_quality_actions_total",
+    "Generated MCQs fixed or dropped by local quality checks",
+    ("action", "reason"),
+)
+
+_LETTERS = "ABCDE"
+
+# "answer is B", "Option (C)", "correct answer: D" (capital letters only,
+# so "the answer is a ..." is not read as option A)
+_ANSWER_LETTER_RE = re.compile(
+    r"(?i:answer|option|choice)\s*(?:is\s*|:\s*)?\(?([A-E])\)?(?![A-Za-z0-9])"
+)
+
+# Options whose meaning depends on their position
+_PINNED_RE = re.compile(
+    r"^(?:all|none|both|neither)\s+of\s+(?:the\s+)?(?:above|these|the options)\b", re.IGNORECASE
+)
+
+
+def _record(action: str, reason: str) -> None:
+    QUIZ_QUALITY_ACTIONS.inc(action=action, reason=reason)
+
+
+def _answer_from_explanation(
+    original: List[MCQOption],
+    by_text: Dict[str, MCQOption],
+    candidates: List[MCQOption],
+    explanation: Optional[str]
+) -> Optional[MCQOption]:
+    """
+    The single candidate the explanation identifies as the answer, if any
+
+    Letters refer to the options as generated (before duplicates were
+    removed).
+    """
+    if not explanation:
+        return None
+
+    def candidate(option: Optional[MCQOption]) -> Optional[MCQOption]:
+        return option if any(option is c for c in candidates) else None
+
+    letters = {m.group(1) for m in _ANSWER_LETTER_RE.finditer(explanation)}
+    if len(letters) == 1:
+        index = _LETTERS.index(letters.pop())
+        if index < len(original):
+            answer = candidate(by_text.get(normalize_text(original[index].text)))
+            if answer is not None:
+                return answer
+
+    text = f" {normalize_text(explanation)} "
+    named = [o for o in candidates if f" {normalize_text(o.text)} " in text]
+    return named[0] if len(named) == 1 else None
+
+
+def repair_mcq(mcq: MCQ) -> Optional[MCQ]:
+    """
+    Fix a generated MCQ in place where possible
+
+    Returns:
+        The question, or None if it has to be dropped
+    """
+    if not mcq.question or not mcq.question.strip():
+        _record("dropped", "empty_question")
+        return None
+
+    options: List[MCQOption] = []
+    by_text: Dict[str, MCQOption] = {}
+    for option in mcq.options:
+        key = normalize_text(option.text)
+        if not key:
+            _record("fixed", "empty_option")
+            continue
+        if key in by_text:
+            by_text[key].is_correct = by_text[key].is_correct or option.is_correct
+            _record("fixed", "duplicate_option")
+            continue
+        by_text[key] = option
+        options.append(option)
+
+    correct = [o for o in options if o.is_correct]
+    if len(correct) != 1:
+        reason = "no_correct_option" if not correct else "multiple_correct_options"
+        answer = _answer_from_explanation(
+            mcq.options, by_text, correct or options, mcq.explanation
+        )
+        if answer is None:
+            _record("dropped", reason)
+            return None
+        for option in options:
+            option.is_correct = option is answer
+        _record("fixed", reason)
+
+    if len(options) < 2:
+        _record("dropped", "too_few_options")
+        return None
+
+    if mcq.explanation and len(options) != len(mcq.options):
+        # Letters refer to the options as generated; map them onto the
+        # surviving ones (a removed duplicate to the option it duplicated)
+        before = [by_text.get(normalize_text(o.text)) for o in mcq.options]
+        mcq.explanation = _relabel(mcq.explanation, before, options)
+    mcq.options = options
+    return mcq
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def balance_answers(questions: List[MCQ]) -> List[MCQ]:
+    """
+    Reorder options in place so correct answers are spread evenly over
+    positions A, B, C, ...
+
+    Each question's correct option goes to the least used position so
+    far (ties broken by a hash of the question), distractors are
+    shuffled with the same seed. The result is the same for the same
+    questions in the same order.
+    """
+    counts: Counter = Counter()
+    for mcq in questions:
+        rng = random.Random(_seed(mcq.question))
+        pinned = [o for o in mcq.options if _PINNED_RE.match(o.text.strip())]
+        movable = [o for o in mcq.options if not _PINNED_RE.match(o.text.strip())]
+        distractors = [o for o in movable if not o.is_correct]
+        answer = [o for o in movable if o.is_correct]
+        rng.shuffle(distractors)
+
+        if len(answer) == 1:
+            least = min(counts[p] for p in range(len(movable)))
+            slots = [p for p in range(len(movable)) if counts[p] == least]
+            position = slots[rng.randrange(len(slots))]
+            counts[position] += 1
+            distractors.insert(position, answer[0])
+        else:
+            # Correct option is pinned (e.g. "All of the above")
+            distractors.extend(answer)
+
+        reordered = distractors + pinned
+        if mcq.explanation:
+            mcq.explanation = _relabel(mcq.explanation, mcq.options, reordered)
+        mcq.options = reordered
+    return questions
+
+
+def _relabel(
+    explanation: str, before: List[Optional[MCQOption]], after: List[MCQOption]
+) -> str:
+    """
+    Point "answer is B" style references at the options' new positions
+
+    before[i] is the option letter i currently refers to (None if that
+    option is gone); after is the new order.
+    """
+    position = {id(option): index for index, option in enumerate(after)}
+    moved = {
+        _LETTERS[index]: _LETTERS[position[id(option)]]
+        for index, option in enumerate(before)
+        if option is not None and id(option) in position
+    }
+
+    def replace(match: re.Match) -> str:
+        start = match.start(1) - match.start(0)
+        end = match.end(1) - match.start(0)
+        text = match.group(0)
+        return text[:start] + moved.get(match.group(1), match.group(1)) + text[end:]
+
+    return _ANSWER_LETTER_RE.sub(replace, explanation)
@@ -1,205 +1,1085 @@
 """
-Quiz, Skill Map, and Interview generation using a SINGLE AI call
+Quiz, Skill Map, and Interview generation using a SINGLE AI call,
+with concurrent batches for requests larger than one call can hold
 """
-from typing import Dict, Any
+import asyncio
+import json
+import math
+from typing import Dict, Any, List, Optional, Callable, Tuple
+from pydantic import BaseModel
 from app.services.ai_service import AIService
 from app.config import Config
+from app.schemas.challenge_schema import CodingChallengeResponse, FunctionSignature, StarterCodeResponse
+from app.schemas.flashcard_schema import FlashcardResponse
+from app.schemas.quiz_schema import MCQ, QuizResponse, SkillMapItem, SkillMapResponse
+from app.schemas.interview_schema import InterviewResponse
+from app.schemas.study_set_schema import StudySetResponse, StudySetBatchResponse
+from app.services import llm_resilience
+from app.services import output_budget
+from app.services.prompt_compiler import PromptTemplate, compile_prompt
+from app.services.quiz_quality import balance_answers, repair_mcq
+from app.services.starter_code import render_starter
+from app.utils import deadline
+from app.utils.challenge_library import challenge_library
+from app.utils.concurrency import map_concurrently, gather_concurrently
+from app.utils.deadline import DeadlineExceeded
+from app.utils.metrics import stage_timer
+from app.utils.similarity import NearDuplicateFilter, normalize_text, topic_similarity
+
+# Aspects used to steer concurrent topic batches away from each other
+TOPIC_FOCUS_AREAS = [
+    "core concepts and definitions",
+    "practical applications and examples",
+    "common mistakes and misconceptions",
+    "comparisons and trade-offs",
+    "advanced details and edge cases",
+    "problem solving and analysis",
+]
+
+# Max number of previously generated questions listed in a batch prompt
+MAX_AVOID_QUESTIONS = 30
+
+# Rounds of batches; later rounds top up items lost to failures or dedup
+MAX_BATCH_ROUNDS = 2
+
+
+# -----------------------
+# Prompt templates (static prefix compiled from the schemas, then the
+# per-call request; see prompt_compiler)
+# -----------------------
+MCQ_RULES = (
+    "Each MCQ has 4 options, exactly one with is_correct true",
+    "explanation says why the correct option is correct",
+)
+
+TOPIC_RULES = (
+    "difficulty and topic of every item: the requested ones",
+    "Cover different aspects of the topic",
+)
+
+
+def _study_set_template() -> PromptTemplate:
+    return compile_prompt(
+        "a skill map, multiple-choice quiz and interview Q&A for a syllabus",
+        StudySetResponse,
+        MCQ_RULES + (
+            "Interview answers are realistic and interview-level",
+            "Cover as many syllabus topics as possible",
+            "total_questions and total_topics count the items returned",
+        ),
+        "SYLLABUS:\n{syllabus}\n\nGenerate {quiz} quiz questions and {interview} interview questions.\n",
+        omit=("status", "topics_covered"),
+    )
+
+
+def _study_set_batch_template() -> PromptTemplate:
+    return compile_prompt(
+        "additional multiple-choice quiz and interview questions for a syllabus",
+        StudySetBatchResponse,
+        MCQ_RULES + (
+            "Prefer the focus subtopics",
+            "Do not repeat or paraphrase an already generated question",
+        ),
+        "SYLLABUS:\n{syllabus}\n\nFOCUS SUBTOPICS:\n{focus}\n\n"
+        "ALREADY GENERATED:\n{avoid}\n\n"
+        "Generate {quiz} quiz questions and {interview} interview questions.\n",
+    )
+
+
+def _topic_quiz_template() -> PromptTemplate:
+    return compile_prompt(
+        "multiple-choice quiz questions on a topic",
+        QuizResponse,
+        MCQ_RULES + TOPIC_RULES + ("topics_covered: [the topic]",),
+        'Generate {count} multiple-choice questions about the topic: "{topic}"\n'
+        "Difficulty: {difficulty}\n{focus}",
+    )
+
+
+def _flashcards_template() -> PromptTemplate:
+    return compile_prompt(
+        "flashcards on a topic",
+        FlashcardResponse,
+        (
+            "front: a clear question or concept; back: a comprehensive answer",
+        ) + TOPIC_RULES,
+        'Generate {count} flashcards about the topic: "{topic}"\n{focus}',
+    )
+
+
+def _coding_challenge_template() -> PromptTemplate:
+    return compile_prompt(
+        "a coding challenge on a topic",
+        CodingChallengeResponse,
+        (
+            "difficulty and topic: the requested ones",
+            "signature: the function to implement; types from int|float|bool|str|list[T]|dict[K,V]|none",
+            "starter_code in the requested language",
+            "At least 3 test cases and 3-5 progressive hints",
+        ),
+        'Generate a coding challenge about the topic: "{topic}"\n'
+        "Difficulty: {difficulty}\nLanguage: {language}\n",
+    )
+
+
+def _starter_code_template() -> PromptTemplate:
+    return compile_prompt(
+        "starter code for an existing coding challenge in another language",
+        StarterCodeResponse,
+        ("starter_code: only the skeleton of the function, typed, with an empty body",),
+        "Challenge: {title}\nFunction: {signature}\nLanguage: {language}\n",
+    )
+
+
+def _challenge_core(challenge: Dict[str, Any]) -> Dict[str, Any]:
+    """Language-independent part of a challenge (stored in the library)"""
+    return {k: v for k, v in challenge.items() if k != "starter_code"}
+
+
+def _local_starter(core: Dict[str, Any], language: str) -> Optional[str]:
+    """Starter code rendered from the stored signature, if possible"""
+    try:
+        signature = FunctionSignature.model_validate(core["signature"])
+    except Exception:
+        return None
+    return render_starter(signature, language)
+
+
+def _split_even(total: int, count: int) -> List[int]:
+    """Split total into exactly count near-equal parts"""
+    if count <= 0:
+        return []
+    base, extra = divmod(total, count)
+    return [base + (1 if i < extra else 0) for i in range(count)]
+
+
+def _split_batches(total: int, batch_size: int) -> List[int]:
+    """
+    Split total into the fewest batches of at most batch_size,
+    with sizes as even as possible
+    """
+    if total <= 0:
+        return []
+    return _split_even(total, math.ceil(total / max(1, batch_size)))
+
+
+def _focus_area(index: int) -> str:
+    return TOPIC_FOCUS_AREAS[index % len(TOPIC_FOCUS_AREAS)]
+
+
+def _topic_focus(job: Tuple[int, int], num_questions: int) -> Optional[str]:
+    """
+    Focus area of a topic batch; a request that fits one batch is asked
+    without one, top-ups for it get the next area
+    """
+    index = job[1]
+    if index == 0 and num_questions <= Config.TOPIC_BATCH_SIZE:
+        return None
+    return _focus_area(index)
+
+
+def _study_set_items(quiz_questions: int, interview_questions: int) -> int:
+    """Output budget items of a _syllabus_prompt call (it caps both counts)"""
+    return (
+        min(quiz_questions, Config.QUIZ_BATCH_SIZE)
+        + min(interview_questions, Config.INTERVIEW_BATCH_SIZE)
+        + output_budget.SKILL_MAP_ITEMS
+    )
+
+
+def _syllabus_batch_sizes(missing_quiz: int, missing_interview: int) -> List[Tuple[int, int]]:
+    """(quiz_count, interview_count) per batch for the missing items"""
+    count = max(
+        len(_split_batches(missing_quiz, Config.QUIZ_BATCH_SIZE)),
+        len(_split_batches(missing_interview, Config.INTERVIEW_BATCH_SIZE))
+    )
+    return list(zip(_split_even(missing_quiz, count), _split_even(missing_interview, count)))
+
+
+def _early_syllabus_jobs(
+    quiz_questions: int,
+    interview_questions: int
+) -> List[Tuple[int, int, List[str], List[str]]]:
+    """
+    Batches for the items beyond the first syllabus call, sent alongside
+    it; the skill map is not known yet, so each gets a focus area
+    """
+    sizes = _syllabus_batch_sizes(
+        max(0, quiz_questions - Config.QUIZ_BATCH_SIZE),
+        max(0, interview_questions - Config.INTERVIEW_BATCH_SIZE)
+    )
+    return [(quiz, interview, [_focus_area(i)], []) for i, (quiz, interview) in enumerate(sizes)]
+
+
+def _skill_map_seeds(skill_map: SkillMapResponse) -> List[str]:
+    """
+    Flatten a skill map into "Topic: Subtopic" seed strings
+    """
+    seeds = []
+    for item in skill_map.skill_map:
+        if item.subtopics:
+            seeds.extend(f"{item.topic}: {sub}" for sub in item.subtopics if sub)
+        elif item.topic:
+            seeds.append(item.topic)
+    return seeds
+
+
+def _merge_skill_maps(skill_maps: List[SkillMapResponse]) -> SkillMapResponse:
+    """
+    Merge the skill maps of several documents into one
+
+    Topics whose names are similar (Config.COURSE_TOPIC_SIMILARITY)
+    are combined: subtopics are unioned and the first non-empty
+    description is kept. Topic order follows first appearance.
+    """
+    merged: List[SkillMapItem] = []
+    seen_subtopics: List[set] = []
+    for skill_map in skill_maps:
+        for item in skill_map.skill_map:
+            target = None
+            for index, existing in enumerate(merged):
+                if topic_similarity(existing.topic, item.topic) >= Config.COURSE_TOPIC_SIMILARITY:
+                    target = index
+                    break
+            if target is None:
+                merged.append(SkillMapItem(
+                    topic=item.topic, subtopics=[], description=item.description
+                ))
+                seen_subtopics.append(set())
+                target = len(merged) - 1
+            elif not merged[target].description:
+                merged[target].description = item.description
+
+            for sub in item.subtopics:
+                key = normalize_text(sub)
+                if key and key not in seen_subtopics[target]:
+                    seen_subtopics[target].add(key)
+                    merged[target].subtopics.append(sub)
+    return SkillMapResponse(skill_map=merged, total_topics=len(merged))
+
+
+def _course_text(documents: List[Tuple[str, str]]) -> str:
+    """
+    Combined text of a course for top-up batches, with every document
+    given an equal share of Config.MAX_SYLLABUS_CHARS
+    """
+    budget = Config.MAX_SYLLABUS_CHARS // max(1, len(documents))
+    return "\n\n".join(f"### {name}\n{text[:budget]}" for name, text in documents)
+
+
+def _topics_of(items: List[BaseModel]) -> List[str]:
+    """Ordered unique topic names of generated items"""
+    seen = []
+    for item in items:
+        topic = item.topic
+        if topic and topic not in seen:
+            seen.append(topic)
+    return seen
+
+
+def _require(response: Dict[str, Any], *keys: str) -> Dict[str, Any]:
+    """Minimal structural validation of an AI response"""
+    for key in keys:
+        if key not in response:
+            raise ValueError(f"Missing {key} in AI response")
+    return response
+
+
+def _round_fits_deadline(model: str) -> bool:
+    """
+    Whether a top-up round of batches on model can finish before the
+    request deadline; if not, the items generated so far are returned
+    """
+    expected = llm_resilience.expected_call_seconds(model, "groq_call")
+    if deadline.allows(expected):
+        return True
+    deadline.skip("batch_round")
+    return False
+
+
+class _BatchCollector:
+    """
+    Accumulates unique items (schema models or raw dicts) from rounds
+    of concurrent batches
+    """
+
+    def __init__(
+        self,
+        target: int,
+        batch_size: int,
+        text_of: Callable[[Any], str],
+        accepted: Optional[List[Any]] = None,
+        clean: Optional[Callable[[Any], Any]] = None
+    ):
+        self.target = target
+        self.batch_size = batch_size
+        self.text_of = text_of
+        # Fixes an item in place, or returns None to drop it
+        self.clean = clean
+        self.dedup = NearDuplicateFilter(threshold=Config.DUPLICATE_SIMILARITY_THRESHOLD)
+        self.items = []
+        self._accept(accepted or [])
+        self.errors: List[Exception] = []
+        self._batch_index = 0
+
+    def next_jobs(self) -> List[Tuple[int, int]]:
+        """(size, batch_index) pairs for the items still missing"""
+        jobs = []
+        for size in _split_batches(self.target - len(self.items), self.batch_size):
+            jobs.append((size, self._batch_index))
+            self._batch_index += 1
+        return jobs
+
+    def merge(self, results: List[Any]) -> None:
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[Batch generation warning] {result}")
+                self.errors.append(result)
+                continue
+            self._accept(item for item in result or [] if isinstance(item, (dict, BaseModel)))
+
+    def _accept(self, items) -> None:
+        for item in items:
+            if self.clean is not None:
+                item = self.clean(item)
+                if item is None:
+                    continue
+            if self.dedup.add(self.text_of(item)):
+                self.items.append(item)
+
+    def result(self) -> List[Any]:
+        if not self.items and self.errors:
+            raise self.errors[0]
+        return self.items[:self.target]
+
+
+class _SyllabusExtender:
+    """
+    Grows the quiz and interview sections of a process_syllabus result
+
+    Each batch is seeded with a different slice of the skill map's
+    subtopics and told which questions already exist.
+    """
+
+    def __init__(self, result: StudySetResponse, quiz_questions: int, interview_questions: int):
+        self.result = result
+        self.quiz_questions = quiz_questions
+        self.interview_questions = interview_questions
+        threshold = Config.DUPLICATE_SIMILARITY_THRESHOLD
+        self.quiz_dedup = NearDuplicateFilter(threshold=threshold)
+        self.interview_dedup = NearDuplicateFilter(threshold=threshold)
+
+        self.quiz_items = [
+            q for q in map(repair_mcq, result.quiz.quiz)
+            if q is not None and self.quiz_dedup.add(q.question)
+        ]
+        self.interview_items = [
+            q for q in result.interview_qa.interview_qa if self.interview_dedup.add(q.question)
+        ]
+        self.seeds = _skill_map_seeds(result.skill_map)
+        self._batch_offset = 0
+
+    def needs_more(self) -> bool:
+        return (
+            len(self.quiz_items) < self.quiz_questions
+            or len(self.interview_items) < self.interview_questions
+        )
+
+    def next_jobs(self) -> List[Tuple[int, int, List[str], List[str]]]:
+        """(quiz_count, interview_count, focus_subtopics, avoid_questions) per batch"""
+        sizes = _syllabus_batch_sizes(
+            max(0, self.quiz_questions - len(self.quiz_items)),
+            max(0, self.interview_questions - len(self.interview_items))
+        )
+        if not sizes:
+            return []
+        count = len(sizes)
+
+        avoid = [q.question for q in self.quiz_items + self.interview_items]
+        avoid = avoid[:MAX_AVOID_QUESTIONS]
+
+        # Rotate seeds between rounds so top-up batches see new subtopics
+        shift = self._batch_offset % len(self.seeds) if self.seeds else 0
+        rotated = self.seeds[shift:] + self.seeds[:shift]
+        self._batch_offset += count
+
+        return [
+            (quiz, interview, rotated[i::count], avoid)
+            for i, (quiz, interview) in enumerate(sizes)
+        ]
+
+    def merge(self, results: List[Any]) -> None:
+        for batch in results:
+            if isinstance(batch, Exception):
+                print(f"[Batch generation warning] {batch}")
+                continue
+            for q in map(repair_mcq, batch.quiz):
+                if q is not None and self.quiz_dedup.add(q.question):
+                    self.quiz_items.append(q)
+            for q in batch.interview_qa:
+                if self.interview_dedup.add(q.question):
+                    self.interview_items.append(q)
+
+    def apply(self) -> StudySetResponse:
+        """Write merged sections back into the result"""
+        quiz_items = balance_answers(self.quiz_items[:self.quiz_questions])
+        interview_items = self.interview_items[:self.interview_questions]
+
+        quiz = self.result.quiz
+        quiz.quiz = quiz_items
+        quiz.total_questions = len(quiz_items)
+        quiz.topics_covered = _topics_of(quiz_items)
+
+        interview = self.result.interview_qa
+        interview.interview_qa = interview_items
+        interview.total_questions = len(interview_items)
+        interview.topics_covered = _topics_of(interview_items)
+        return self.result
 
 
 class QuizService:
     """
     Service for generating skill map, quiz, and interview Q&A
     using ONE LLM call (Groq)
+
+    Replies with a schema are validated straight from the LLM text into
+    pydantic models, which the API layer serializes without converting
+    back to dicts.
+
+    Each public method has an async twin (prefixed with "a") for the
+    ASGI serving mode; both share prompts, batching and validation.
     """
 
     def __init__(self):
         self.ai_service = AIService()
+        # Starter code variants of library challenges use a smaller model
+        self.variant_ai_service = AIService(model=Config.CHALLENGE_VARIANT_MODEL)
 
+    # -----------------------
+    # Syllabus
+    # -----------------------
     def process_syllabus(
         self,
         syllabus_text: str,
         quiz_questions: int = 10,
         interview_questions: int = 10
-    ) -> Dict[str, Any]:
+    ) -> StudySetResponse:
         """
         Process syllabus and generate:
         - skill_map
         - quiz
         - interview_qa
 
-        Returns a single structured JSON
+        Items beyond the first call's batch sizes are requested in batches
+        sent at the same time as it, so the study set takes about one
+        call's latency; near-duplicates are dropped when they are merged.
+
+        Returns a single validated StudySetResponse
         """
+        try:
+            syllabus_text, prompt = self._syllabus_prompt(
+                syllabus_text, quiz_questions, interview_questions
+            )
+            early_jobs = _early_syllabus_jobs(quiz_questions, interview_questions)
 
-        # 🔒 Safety: cap syllabus size
-        syllabus_text = syllabus_text[:Config.MAX_SYLLABUS_CHARS]
-        
-        # 🥇 FIX 1: Reduce JSON size to improve parsing reliability
-        # Cap questions to reduce JSON size by ~40% and improve correctness
-        quiz_questions = min(quiz_questions, 6)
-        interview_questions = min(interview_questions, 5)
-
-        prompt = f"""
-You are an educational AI system.
-
-Analyze the following syllabus and generate ALL of the following
-in ONE JSON response:
-
-1. Skill Map
-2. Quiz (MCQs)
-3. Interview Q&A
-
-====================
-SYLLABUS
-====================
-{syllabus_text}
-
-====================
-OUTPUT JSON FORMAT (STRICT)
-====================
-{{
-  "skill_map": {{
-    "skill_map": [
-      {{
-        "topic": "Topic Name",
-        "subtopics": ["Subtopic 1", "Subtopic 2"],
-        "description": "Brief description"
-      }}
-    ],
-    "total_topics": <number>
-  }},
-  "quiz": {{
-    "quiz": [
-      {{
-        "question": "Question text?",
-        "options": [
-          {{"text": "Option A", "is_correct": true}},
-          {{"text": "Option B", "is_correct": false}},
-          {{"text": "Option C", "is_correct": false}},
-          {{"text": "Option D", "is_correct": false}}
-        ],
-        "explanation": "Why the correct answer is correct",
-        "difficulty": "easy | medium | hard",
-        "topic": "Topic name"
-      }}
-    ],
-    "total_questions": {quiz_questions}
-  }},
-  "interview_qa": {{
-    "interview_qa": [
-      {{
-        "question": "Interview question?",
-        "answer": "Detailed answer",
-        "topic": "Topic name",
-        "difficulty": "easy | medium | hard",
-        "follow_up_questions": [
-          "Follow-up question 1",
-          "Follow-up question 2"
-        ]
-      }}
-    ],
-    "total_questions": {interview_questions}
-  }}
-}}
-
-====================
-RULES (MANDATORY)
-====================
-- Return ONLY valid JSON
-- No markdown
-- No explanations outside JSON
-- Every MCQ must have EXACTLY one correct option
-- Use realistic interview-level answers
-- Cover as many syllabus topics as possible
-"""
+            def run(job):
+                if job is None:
+                    return self.ai_service.generate_json_response(
+                        prompt=prompt,
+                        max_retries=1,
+                        schema=StudySetResponse,
+                        task=output_budget.STUDY_SET,
+                        items=_study_set_items(quiz_questions, interview_questions)
+                    )
+                return self._request_syllabus_batch(syllabus_text, *job)
+
+            result, *batches = map_concurrently(
+                run, [None, *early_jobs], max_workers=Config.MAX_PARALLEL_BATCHES
+            )
+            if isinstance(result, Exception):
+                raise result
+
+            extender = _SyllabusExtender(result, quiz_questions, interview_questions)
+            extender.merge(batches)
+            if extender.needs_more():
+                self._run_batches(
+                    extender,
+                    lambda job: self._request_syllabus_batch(syllabus_text, *job),
+                    rounds_done=1 if early_jobs else 0
+                )
+            extender.apply()
+
+            return result
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error processing syllabus: {str(e)}")
 
+    async def aprocess_syllabus(
+        self,
+        syllabus_text: str,
+        quiz_questions: int = 10,
+        interview_questions: int = 10
+    ) -> StudySetResponse:
+        """
+        Async version of process_syllabus
+        """
         try:
-            response = self.ai_service.generate_json_response(
-                prompt=prompt,
-                max_retries=1
+            syllabus_text, prompt = self._syllabus_prompt(
+                syllabus_text, quiz_questions, interview_questions
             )
+            early_jobs = _early_syllabus_jobs(quiz_questions, interview_questions)
+
+            async def run(job):
+                if job is None:
+                    return await self.ai_service.agenerate_json_response(
+                        prompt=prompt,
+                        max_retries=1,
+                        schema=StudySetResponse,
+                        task=output_budget.STUDY_SET,
+                        items=_study_set_items(quiz_questions, interview_questions)
+                    )
+                return await self._arequest_syllabus_batch(syllabus_text, *job)
+
+            result, *batches = await gather_concurrently(
+                run, [None, *early_jobs], max_concurrency=Config.MAX_PARALLEL_BATCHES
+            )
+            if isinstance(result, Exception):
+                raise result
+
+            extender = _SyllabusExtender(result, quiz_questions, interview_questions)
+            extender.merge(batches)
+            if extender.needs_more():
+                await self._arun_batches(
+                    extender,
+                    lambda job: self._arequest_syllabus_batch(syllabus_text, *job),
+                    rounds_done=1 if early_jobs else 0
+                )
+            extender.apply()
 
-            # 🔎 Minimal structural validation
-            if "skill_map" not in response:
-                raise ValueError("Missing skill_map in AI response")
-            if "quiz" not in response:
-                raise ValueError("Missing quiz in AI response")
-            if "interview_qa" not in response:
-                raise ValueError("Missing interview_qa in AI response")
-
-            return {
-                "skill_map": response["skill_map"],
-                "quiz": response["quiz"],
-                "interview_qa": response["interview_qa"],
-                "status": "success"
-            }
+            return result
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error processing syllabus: {str(e)}")
 
+    # -----------------------
+    # Revised syllabus (incremental)
+    # -----------------------
+    def process_revision(
+        self,
+        kept: StudySetResponse,
+        changed_text: str,
+        syllabus_text: str,
+        quiz_questions: int = 10,
+        interview_questions: int = 10
+    ) -> StudySetResponse:
+        """
+        Update a study set for a revised syllabus
+
+        Only the changed text is sent to the LLM, for a share of the
+        questions proportional to its size (at least the ones that
+        could not be reused); the rest come from kept.
+
+        Args:
+            kept: Skill map topics and questions reused from the
+                previous version
+            changed_text: Text of the sections that changed
+            syllabus_text: Full revised text, used for top-ups only
+                when nothing was added
+        """
+        try:
+            quiz_share, interview_share = self._revision_shares(
+                kept, changed_text, syllabus_text, quiz_questions, interview_questions
+            )
+            fresh = None
+            if changed_text:
+                _, prompt = self._syllabus_prompt(changed_text, quiz_share, interview_share)
+                fresh = self.ai_service.generate_json_response(
+                    prompt=prompt, max_retries=1, schema=StudySetResponse,
+                    task=output_budget.STUDY_SET,
+                    items=_study_set_items(quiz_share, interview_share)
+                )
+
+            result, top_up_text = self._revision_result(
+                kept, fresh, changed_text, syllabus_text, quiz_questions - quiz_share,
+                interview_questions - interview_share
+            )
+            extender = _SyllabusExtender(result, quiz_questions, interview_questions)
+            if extender.needs_more():
+                self._run_batches(
+                    extender,
+                    lambda job: self._request_syllabus_batch(top_up_text, *job)
+                )
+            extender.apply()
+            return result
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error processing syllabus revision: {str(e)}")
+
+    async def aprocess_revision(
+        self,
+        kept: StudySetResponse,
+        changed_text: str,
+        syllabus_text: str,
+        quiz_questions: int = 10,
+        interview_questions: int = 10
+    ) -> StudySetResponse:
+        """
+        Async version of process_revision
+        """
+        try:
+            quiz_share, interview_share = self._revision_shares(
+                kept, changed_text, syllabus_text, quiz_questions, interview_questions
+            )
+            fresh = None
+            if changed_text:
+                _, prompt = self._syllabus_prompt(changed_text, quiz_share, interview_share)
+                fresh = await self.ai_service.agenerate_json_response(
+                    prompt=prompt, max_retries=1, schema=StudySetResponse,
+                    task=output_budget.STUDY_SET,
+                    items=_study_set_items(quiz_share, interview_share)
+                )
+
+            result, top_up_text = self._revision_result(
+                kept, fresh, changed_text, syllabus_text, quiz_questions - quiz_share,
+                interview_questions - interview_share
+            )
+            extender = _SyllabusExtender(result, quiz_questions, interview_questions)
+            if extender.needs_more():
+                await self._arun_batches(
+                    extender,
+                    lambda job: self._arequest_syllabus_batch(top_up_text, *job)
+                )
+            extender.apply()
+            return result
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error processing syllabus revision: {str(e)}")
+
+    @staticmethod
+    def _revision_shares(
+        kept: StudySetResponse,
+        changed_text: str,
+        syllabus_text: str,
+        quiz_questions: int,
+        interview_questions: int
+    ) -> Tuple[int, int]:
+        """Questions to generate from the changed text: (quiz, interview)"""
+        if not changed_text:
+            return 0, 0
+        ratio = min(1.0, len(changed_text) / max(1, len(syllabus_text[:Config.MAX_SYLLABUS_CHARS])))
+        quiz = max(quiz_questions - len(kept.quiz.quiz), math.ceil(quiz_questions * ratio))
+        interview = max(
+            interview_questions - len(kept.interview_qa.interview_qa),
+            math.ceil(interview_questions * ratio)
+        )
+        return min(quiz, quiz_questions), min(interview, interview_questions)
+
+    @staticmethod
+    def _revision_result(
+        kept: StudySetResponse,
+        fresh: Optional[StudySetResponse],
+        changed_text: str,
+        syllabus_text: str,
+        kept_quiz: int,
+        kept_interview: int
+    ) -> Tuple[StudySetResponse, str]:
+        """
+        Kept and freshly generated sections combined
+
+        Returns:
+            (result, text for top-up batches)
+        """
+        quiz = kept.quiz.quiz[:kept_quiz]
+        interview = kept.interview_qa.interview_qa[:kept_interview]
+        skill_map = kept.skill_map
+        if fresh is not None:
+            skill_map = _merge_skill_maps([kept.skill_map, fresh.skill_map])
+            quiz = quiz + fresh.quiz.quiz
+            interview = interview + fresh.interview_qa.interview_qa
+
+        result = StudySetResponse(
+            skill_map=skill_map,
+            quiz=QuizResponse(quiz=quiz, total_questions=len(quiz)),
+            interview_qa=InterviewResponse(interview_qa=interview, total_questions=len(interview)),
+        )
+        top_up_text = changed_text or syllabus_text[:Config.MAX_SYLLABUS_CHARS]
+        return result, top_up_text
+
+    # -----------------------
+    # Course (several documents)
+    # -----------------------
+    def process_course(
+        self,
+        documents: List[Tuple[str, str]],
+        quiz_questions: int = 10,
+        interview_questions: int = 10
+    ) -> StudySetResponse:
+        """
+        Generate one study set for several documents
+
+        Every document gets its own first syllabus call, run
+        concurrently, so latency tracks the slowest document rather
+        than the sum. The skill maps are merged by topic similarity and
+        the questions deduplicated; any shortfall is topped up from the
+        combined text.
+
+        Args:
+            documents: (name, extracted text) per document
+
+        Returns a single validated StudySetResponse
+        """
+        try:
+            if len(documents) == 1:
+                return self.process_syllabus(documents[0][1], quiz_questions, interview_questions)
+
+            jobs = self._course_jobs(documents, quiz_questions, interview_questions)
+            results = map_concurrently(
+                lambda job: self._request_course_document(*job),
+                jobs,
+                max_workers=Config.MAX_PARALLEL_BATCHES
+            )
+            result = self._merge_course_results(results)
+
+            extender = _SyllabusExtender(result, quiz_questions, interview_questions)
+            course_text = _course_text(documents)
+            if extender.needs_more():
+                self._run_batches(
+                    extender,
+                    lambda job: self._request_syllabus_batch(course_text, *job)
+                )
+            extender.apply()
+            return result
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error processing course: {str(e)}")
+
+    async def aprocess_course(
+        self,
+        documents: List[Tuple[str, str]],
+        quiz_questions: int = 10,
+        interview_questions: int = 10
+    ) -> StudySetResponse:
+        """
+        Async version of process_course
+        """
+        try:
+            if len(documents) == 1:
+                return await self.aprocess_syllabus(
+                    documents[0][1], quiz_questions, interview_questions
+                )
+
+            jobs = self._course_jobs(documents, quiz_questions, interview_questions)
+            results = await gather_concurrently(
+                lambda job: self._arequest_course_document(*job),
+                jobs,
+                max_concurrency=Config.MAX_PARALLEL_BATCHES
+            )
+            result = self._merge_course_results(results)
+
+            extender = _SyllabusExtender(result, quiz_questions, interview_questions)
+            course_text = _course_text(documents)
+            if extender.needs_more():
+                await self._arun_batches(
+                    extender,
+                    lambda job: self._arequest_syllabus_batch(course_text, *job)
+                )
+            extender.apply()
+            return result
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error processing course: {str(e)}")
+
+    @staticmethod
+    def _course_jobs(
+        documents: List[Tuple[str, str]],
+        quiz_questions: int,
+        interview_questions: int
+    ) -> List[Tuple[str, int, int]]:
+        """(text, quiz share, interview share) per document"""
+        quiz_shares = _split_even(quiz_questions, len(documents))
+        interview_shares = _split_even(interview_questions, len(documents))
+        # Every document contributes to its skill map and at least one
+        # question; the extender trims the surplus
+        return [
+            (text, max(1, quiz), max(1, interview))
+            for (_, text), quiz, interview in zip(documents, quiz_shares, interview_shares)
+        ]
+
+    def _request_course_document(
+        self,
+        text: str,
+        quiz_questions: int,
+        interview_questions: int
+    ) -> StudySetResponse:
+        _, prompt = self._syllabus_prompt(text, quiz_questions, interview_questions)
+        return self.ai_service.generate_json_response(
+            prompt=prompt, max_retries=1, schema=StudySetResponse,
+            task=output_budget.STUDY_SET,
+            items=_study_set_items(quiz_questions, interview_questions)
+        )
+
+    async def _arequest_course_document(
+        self,
+        text: str,
+        quiz_questions: int,
+        interview_questions: int
+    ) -> StudySetResponse:
+        _, prompt = self._syllabus_prompt(text, quiz_questions, interview_questions)
+        return await self.ai_service.agenerate_json_response(
+            prompt=prompt, max_retries=1, schema=StudySetResponse,
+            task=output_budget.STUDY_SET,
+            items=_study_set_items(quiz_questions, interview_questions)
+        )
+
+    @staticmethod
+    def _merge_course_results(results: List[Any]) -> StudySetResponse:
+        """
+        Combine per-document study sets (failed documents are skipped)
+        """
+        succeeded = []
+        for result in results:
+            if isinstance(result, Exception):
+                print(f"[Course document warning] {result}")
+            else:
+                succeeded.append(result)
+        if not succeeded:
+            raise results[0]
+
+        quiz = [q for r in succeeded for q in r.quiz.quiz]
+        interview = [q for r in succeeded for q in r.interview_qa.interview_qa]
+        return StudySetResponse(
+            skill_map=_merge_skill_maps([r.skill_map for r in succeeded]),
+            quiz=QuizResponse(quiz=quiz, total_questions=len(quiz)),
+            interview_qa=InterviewResponse(interview_qa=interview, total_questions=len(interview)),
+        )
+
+    @staticmethod
+    def _syllabus_prompt(
+        syllabus_text: str,
+        quiz_questions: int,
+        interview_questions: int
+    ) -> Tuple[str, str]:
+        """
+        Build the main syllabus prompt
+
+        Returns:
+            (capped syllabus text, prompt)
+        """
+        # 🔒 Safety: cap syllabus size
+        syllabus_text = syllabus_text[:Config.MAX_SYLLABUS_CHARS]
+
+        # 🥇 FIX 1: Reduce JSON size to improve parsing reliability
+        # The first call stays small; anything beyond the batch size is
+        # generated in batches sent alongside it (see _early_syllabus_jobs)
+        first_quiz = min(quiz_questions, Config.QUIZ_BATCH_SIZE)
+        first_interview = min(interview_questions, Config.INTERVIEW_BATCH_SIZE)
+
+        with stage_timer("prompt_build"):
+            prompt = _study_set_template().render(
+                syllabus=syllabus_text, quiz=first_quiz, interview=first_interview
+            )
+        return syllabus_text, prompt
+
+    @staticmethod
+    def _syllabus_batch_prompt(
+        syllabus_text: str,
+        quiz_questions: int,
+        interview_questions: int,
+        focus_subtopics: List[str],
+        avoid_questions: List[str]
+    ) -> str:
+        focus = "\n".join(f"- {s}" for s in focus_subtopics) or "- Any syllabus topic"
+        avoid = "\n".join(f"- {q}" for q in avoid_questions if q) or "- (none)"
+
+        with stage_timer("prompt_build"):
+            prompt = _study_set_batch_template().render(
+                syllabus=syllabus_text,
+                focus=focus,
+                avoid=avoid,
+                quiz=quiz_questions,
+                interview=interview_questions,
+            )
+        return prompt
+
+    @staticmethod
+    def _syllabus_batch_result(response: StudySetBatchResponse) -> StudySetBatchResponse:
+        if not response.model_fields_set & {"quiz", "interview_qa"}:
+            raise ValueError("Missing quiz and interview_qa in AI batch response")
+        return response
+
+    def _request_syllabus_batch(
+        self,
+        syllabus_text: str,
+        quiz_questions: int,
+        interview_questions: int,
+        focus_subtopics: List[str],
+        avoid_questions: List[str]
+    ) -> StudySetBatchResponse:
+        """
+        Run one additional quiz/interview batch for a syllabus
+        """
+        if quiz_questions <= 0 and interview_questions <= 0:
+            return StudySetBatchResponse()
+
+        prompt = self._syllabus_batch_prompt(
+            syllabus_text, quiz_questions, interview_questions, focus_subtopics, avoid_questions
+        )
+        response = self.ai_service.generate_json_response(
+            prompt=prompt, max_retries=1, schema=StudySetBatchResponse,
+            task=output_budget.STUDY_SET_BATCH, items=quiz_questions + interview_questions
+        )
+        return self._syllabus_batch_result(response)
+
+    async def _arequest_syllabus_batch(
+        self,
+        syllabus_text: str,
+        quiz_questions: int,
+        interview_questions: int,
+        focus_subtopics: List[str],
+        avoid_questions: List[str]
+    ) -> StudySetBatchResponse:
+        if quiz_questions <= 0 and interview_questions <= 0:
+            return StudySetBatchResponse()
+
+        prompt = self._syllabus_batch_prompt(
+            syllabus_text, quiz_questions, interview_questions, focus_subtopics, avoid_questions
+        )
+        response = await self.ai_service.agenerate_json_response(
+            prompt=prompt, max_retries=1, schema=StudySetBatchResponse,
+            task=output_budget.STUDY_SET_BATCH, items=quiz_questions + interview_questions
+        )
+        return self._syllabus_batch_result(response)
+
+    # -----------------------
+    # Topic quiz
+    # -----------------------
     def generate_topic_quiz(
         self,
         topic: str,
         difficulty: str = "medium",
         num_questions: int = 10
-    ) -> Dict[str, Any]:
+    ) -> QuizResponse:
         """
         Generate quiz questions for a specific topic
+
+        Requests larger than Config.TOPIC_BATCH_SIZE are split into
+        concurrent batches, each steered towards a different aspect
+        of the topic, and merged with near-duplicate elimination.
+        Questions failing the local quality checks (quiz_quality) are
+        replaced by one small top-up batch.
         """
-        num_questions = min(num_questions, 15)  # Cap at 15 for reliability
-        
-        prompt = f"""
-You are an educational AI system.
-
-Generate {num_questions} multiple-choice quiz questions about the topic: "{topic}"
-
-Difficulty level: {difficulty}
-
-====================
-OUTPUT JSON FORMAT (STRICT)
-====================
-{{
-  "quiz": [
-    {{
-      "question": "Question text?",
-      "options": [
-        {{"text": "Option A", "is_correct": true}},
-        {{"text": "Option B", "is_correct": false}},
-        {{"text": "Option C", "is_correct": false}},
-        {{"text": "Option D", "is_correct": false}}
-      ],
-      "explanation": "Why the correct answer is correct",
-      "difficulty": "{difficulty}",
-      "topic": "{topic}"
-    }}
-  ],
-  "total_questions": {num_questions},
-  "topics_covered": ["{topic}"]
-}}
-
-====================
-RULES (MANDATORY)
-====================
-- Return ONLY valid JSON
-- No markdown, no explanations outside JSON
-- Every MCQ must have EXACTLY one correct option
-- Questions should be appropriate for {difficulty} difficulty
-- Cover different aspects of {topic}
-"""
+        try:
+            collector = _BatchCollector(
+                num_questions, Config.TOPIC_BATCH_SIZE, lambda q: q.question, clean=repair_mcq
+            )
+            self._run_batches(
+                collector,
+                lambda job: self._request_topic_quiz(
+                    topic, difficulty, job[0], focus=_topic_focus(job, num_questions)
+                ).quiz
+            )
+            return self._topic_quiz_result(topic, collector.result())
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error generating quiz: {str(e)}")
 
+    async def agenerate_topic_quiz(
+        self,
+        topic: str,
+        difficulty: str = "medium",
+        num_questions: int = 10
+    ) -> QuizResponse:
+        """
+        Async version of generate_topic_quiz
+        """
         try:
-            response = self.ai_service.generate_json_response(
-                prompt=prompt,
-                max_retries=1
+            collector = _BatchCollector(
+                num_questions, Config.TOPIC_BATCH_SIZE, lambda q: q.question, clean=repair_mcq
             )
-            
-            if "quiz" not in response:
-                raise ValueError("Missing quiz in AI response")
-            
-            return response
-            
+
+            async def make_batch(job):
+                response = await self._arequest_topic_quiz(
+                    topic, difficulty, job[0], focus=_topic_focus(job, num_questions)
+                )
+                return response.quiz
+
+            await self._arun_batches(collector, make_batch)
+            return self._topic_quiz_result(topic, collector.result())
+
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error generating quiz: {str(e)}")
 
+    @staticmethod
+    def _topic_quiz_result(topic: str, questions: List[MCQ]) -> QuizResponse:
+        return QuizResponse(
+            quiz=balance_answers(questions),
+            total_questions=len(questions),
+            topics_covered=[topic]
+        )
+
+    @staticmethod
+    def _topic_quiz_prompt(
+        topic: str,
+        difficulty: str,
+        num_questions: int,
+        focus: Optional[str] = None
+    ) -> str:
+        focus_line = f"Focus especially on: {focus}\n" if focus else ""
+
+        with stage_timer("prompt_build"):
+            prompt = _topic_quiz_template().render(
+                count=num_questions, topic=topic, difficulty=difficulty, focus=focus_line
+            )
+        return prompt
+
+    def _request_topic_quiz(
+        self,
+        topic: str,
+        difficulty: str,
+        num_questions: int,
+        focus: Optional[str] = None
+    ) -> QuizResponse:
+        """
+        Run a single topic quiz LLM call
+        """
+        prompt = self._topic_quiz_prompt(topic, difficulty, num_questions, focus)
+        return self.ai_service.generate_json_response(
+            prompt=prompt, max_retries=1, schema=QuizResponse,
+            task=output_budget.TOPIC_QUIZ, items=num_questions
+        )
+
+    async def _arequest_topic_quiz(
+        self,
+        topic: str,
+        difficulty: str,
+        num_questions: int,
+        focus: Optional[str] = None
+    ) -> QuizResponse:
+        prompt = self._topic_quiz_prompt(topic, difficulty, num_questions, focus)
+        return await self.ai_service.agenerate_json_response(
+            prompt=prompt, max_retries=1, schema=QuizResponse,
+            task=output_budget.TOPIC_QUIZ, items=num_questions
+        )
+
+    # -----------------------
+    # Flashcards
+    # -----------------------
     def generate_topic_flashcards(
         self,
         topic: str,
@@ -207,58 +1087,109 @@ RULES (MANDATORY)
     ) -> Dict[str, Any]:
         """
         Generate flashcards for a specific topic
+
+        Large requests are batched the same way as generate_topic_quiz.
         """
-        num_cards = min(num_cards, 15)  # Cap at 15 for reliability
-        
-        prompt = f"""
-You are an educational AI system.
-
-Generate {num_cards} flashcards about the topic: "{topic}"
-
-Each flashcard should have:
-- Front: A question or concept
-- Back: The answer or explanation
-
-====================
-OUTPUT JSON FORMAT (STRICT)
-====================
-{{
-  "flashcards": [
-    {{
-      "front": "Question or concept",
-      "back": "Answer or explanation",
-      "difficulty": "easy | medium | hard",
-      "topic": "{topic}"
-    }}
-  ],
-  "total_cards": {num_cards},
-  "topic": "{topic}"
-}}
-
-====================
-RULES (MANDATORY)
-====================
-- Return ONLY valid JSON
-- No markdown, no explanations outside JSON
-- Front should be a clear question or concept
-- Back should be a comprehensive answer
-- Cover different aspects of {topic}
-"""
+        try:
+            if num_cards <= Config.TOPIC_BATCH_SIZE:
+                return self._request_topic_flashcards(topic, num_cards)
+
+            collector = _BatchCollector(
+                num_cards, Config.TOPIC_BATCH_SIZE, lambda c: c.get("front", "")
+            )
+            self._run_batches(
+                collector,
+                lambda job: self._request_topic_flashcards(
+                    topic, job[0], focus=_focus_area(job[1])
+                )["flashcards"]
+            )
+            return self._flashcards_result(topic, collector.result())
 
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error generating flashcards: {str(e)}")
+
+    async def agenerate_topic_flashcards(
+        self,
+        topic: str,
+        num_cards: int = 10
+    ) -> Dict[str, Any]:
+        """
+        Async version of generate_topic_flashcards
+        """
         try:
-            response = self.ai_service.generate_json_response(
-                prompt=prompt,
-                max_retries=1
+            if num_cards <= Config.TOPIC_BATCH_SIZE:
+                return await self._arequest_topic_flashcards(topic, num_cards)
+
+            collector = _BatchCollector(
+                num_cards, Config.TOPIC_BATCH_SIZE, lambda c: c.get("front", "")
             )
-            
-            if "flashcards" not in response:
-                raise ValueError("Missing flashcards in AI response")
-            
-            return response
-            
+
+            async def make_batch(job):
+                response = await self._arequest_topic_flashcards(
+                    topic, job[0], focus=_focus_area(job[1])
+                )
+                return response["flashcards"]
+
+            await self._arun_batches(collector, make_batch)
+            return self._flashcards_result(topic, collector.result())
+
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error generating flashcards: {str(e)}")
 
+    @staticmethod
+    def _flashcards_result(topic: str, cards: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "flashcards": cards,
+            "total_cards": len(cards),
+            "topic": topic
+        }
+
+    @staticmethod
+    def _flashcards_prompt(
+        topic: str,
+        num_cards: int,
+        focus: Optional[str] = None
+    ) -> str:
+        focus_line = f"Focus especially on: {focus}\n" if focus else ""
+
+        with stage_timer("prompt_build"):
+            prompt = _flashcards_template().render(count=num_cards, topic=topic, focus=focus_line)
+        return prompt
+
+    def _request_topic_flashcards(
+        self,
+        topic: str,
+        num_cards: int,
+        focus: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a single flashcard LLM call
+        """
+        prompt = self._flashcards_prompt(topic, num_cards, focus)
+        response = self.ai_service.generate_json_response(
+            prompt=prompt, max_retries=1, task=output_budget.FLASHCARDS, items=num_cards
+        )
+        return _require(response, "flashcards")
+
+    async def _arequest_topic_flashcards(
+        self,
+        topic: str,
+        num_cards: int,
+        focus: Optional[str] = None
+    ) -> Dict[str, Any]:
+        prompt = self._flashcards_prompt(topic, num_cards, focus)
+        response = await self.ai_service.agenerate_json_response(
+            prompt=prompt, max_retries=1, task=output_budget.FLASHCARDS, items=num_cards
+        )
+        return _require(response, "flashcards")
+
+    # -----------------------
+    # Coding challenge
+    # -----------------------
     def generate_coding_challenge(
         self,
         topic: str,
@@ -267,65 +1198,168 @@ RULES (MANDATORY)
     ) -> Dict[str, Any]:
         """
         Generate a coding challenge for a specific topic
+
+        A challenge already in the library for the topic and difficulty
+        is reused; only its starter code is produced for a new language.
         """
-        prompt = f"""
-You are an educational AI system.
-
-Generate a coding challenge about the topic: "{topic}"
-
-Difficulty: {difficulty}
-Language: {language}
-
-====================
-OUTPUT JSON FORMAT (STRICT)
-====================
-{{
-  "challenge": {{
-    "title": "Challenge Title",
-    "description": "Detailed problem description",
-    "difficulty": "{difficulty}",
-    "topic": "{topic}",
-    "starter_code": "// Starter code in {language}",
-    "test_cases": [
-      {{
-        "input": "input example",
-        "output": "expected output",
-        "explanation": "What this test case checks"
-      }}
-    ],
-    "hints": [
-      "Hint 1",
-      "Hint 2",
-      "Hint 3"
-    ],
-    "time_complexity": "O(n) or similar",
-    "space_complexity": "O(1) or similar",
-    "xp_reward": 50
-  }}
-}}
-
-====================
-RULES (MANDATORY)
-====================
-- Return ONLY valid JSON
-- No markdown, no explanations outside JSON
-- Challenge should be appropriate for {difficulty} difficulty
-- Include at least 3 test cases
-- Provide starter code in {language}
-- Include 3-5 progressive hints
-"""
+        try:
+            core, starter_code = self._library_get(topic, difficulty, language)
+            if core is None:
+                prompt = self._coding_challenge_prompt(topic, difficulty, language)
+                response = _require(self.ai_service.generate_json_response(
+                    prompt=prompt,
+                    max_retries=1,
+                    task=output_budget.CODING_CHALLENGE
+                ), "challenge")
+                self._library_put(topic, difficulty, language, response["challenge"])
+                return {**response, "source": "generated"}
+
+            if starter_code is not None:
+                return {"challenge": {**core, "starter_code": starter_code}, "source": "library"}
+
+            starter_code, origin = _local_starter(core, language), "template"
+            if starter_code is None:
+                prompt = self._starter_code_prompt(core, language)
+                response = _require(self.variant_ai_service.generate_json_response(
+                    prompt=prompt,
+                    max_retries=1,
+                    task=output_budget.STARTER_CODE
+                ), "starter_code")
+                starter_code, origin = response["starter_code"], "llm"
+            self._library_put_variant(topic, difficulty, language, starter_code, origin)
+            return {"challenge": {**core, "starter_code": starter_code}, "source": "variant"}
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise RuntimeError(f"Error generating coding challenge: {str(e)}")
 
+    async def agenerate_coding_challenge(
+        self,
+        topic: str,
+        difficulty: str = "medium",
+        language: str = "python"
+    ) -> Dict[str, Any]:
+        """
+        Async version of generate_coding_challenge
+        """
         try:
-            response = self.ai_service.generate_json_response(
-                prompt=prompt,
-                max_retries=1
+            core, starter_code = await asyncio.to_thread(self._library_get, topic, difficulty, language)
+            if core is None:
+                prompt = self._coding_challenge_prompt(topic, difficulty, language)
+                response = _require(await self.ai_service.agenerate_json_response(
+                    prompt=prompt,
+                    max_retries=1,
+                    task=output_budget.CODING_CHALLENGE
+                ), "challenge")
+                await asyncio.to_thread(self._library_put, topic, difficulty, language, response["challenge"])
+                return {**response, "source": "generated"}
+
+            if starter_code is not None:
+                return {"challenge": {**core, "starter_code": starter_code}, "source": "library"}
+
+            starter_code, origin = _local_starter(core, language), "template"
+            if starter_code is None:
+                prompt = self._starter_code_prompt(core, language)
+                response = _require(await self.variant_ai_service.agenerate_json_response(
+                    prompt=prompt,
+                    max_retries=1,
+                    task=output_budget.STARTER_CODE
+                ), "starter_code")
+                starter_code, origin = response["starter_code"], "llm"
+            await asyncio.to_thread(
+                self._library_put_variant, topic, difficulty, language, starter_code, origin
             )
-            
-            if "challenge" not in response:
-                raise ValueError("Missing challenge in AI response")
-            
-            return response
-            
+            return {"challenge": {**core, "starter_code": starter_code}, "source": "variant"}
+
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise RuntimeError(f"Error generating coding challenge: {str(e)}")
 
+    @staticmethod
+    def _library_get(topic: str, difficulty: str, language: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        if not challenge_library.enabled:
+            return None, None
+        try:
+            with stage_timer("challenge_library"):
+                return challenge_library.get(topic, difficulty, language)
+        except Exception as e:
+            print(f"[CHALLENGE_LIBRARY_WARNING] Lookup failed: {e}")
+            return None, None
+
+    @staticmethod
+    def _library_put(topic: str, difficulty: str, language: str, challenge: Any) -> None:
+        if not challenge_library.enabled or not isinstance(challenge, dict):
+            return
+        try:
+            with stage_timer("challenge_library"):
+                challenge_library.put(
+                    topic, difficulty, _challenge_core(challenge), language, challenge.get("starter_code")
+                )
+        except Exception as e:
+            print(f"[CHALLENGE_LIBRARY_WARNING] Store failed: {e}")
+
+    @staticmethod
+    def _library_put_variant(topic: str, difficulty: str, language: str, starter_code: str, origin: str) -> None:
+        try:
+            with stage_timer("challenge_library"):
+                challenge_library.put_variant(topic, difficulty, language, starter_code, origin)
+        except Exception as e:
+            print(f"[CHALLENGE_LIBRARY_WARNING] Store failed: {e}")
+
+    @staticmethod
+    def _starter_code_prompt(core: Dict[str, Any], language: str) -> str:
+        with stage_timer("prompt_build"):
+            prompt = _starter_code_template().render(
+                title=core.get("title", ""),
+                # Without a signature the skeleton is inferred from the statement
+                signature=(
+                    json.dumps(core["signature"], separators=(",", ":"))
+                    if core.get("signature") else core.get("description", "")[:600]
+                ),
+                language=language,
+            )
+        return prompt
+
+    @staticmethod
+    def _coding_challenge_prompt(topic: str, difficulty: str, language: str) -> str:
+        with stage_timer("prompt_build"):
+            prompt = _coding_challenge_template().render(
+                topic=topic, difficulty=difficulty, language=language
+            )
+        return prompt
+
+    # -----------------------
+    # Batch drivers
+    # -----------------------
+    def _run_batches(self, collector, make_batch: Callable[[Any], Any], rounds_done: int = 0) -> None:
+        """
+        Run rounds of batches in a thread pool until the collector
+        has nothing left to ask for (after rounds_done earlier rounds)
+        """
+        for round_index in range(rounds_done, MAX_BATCH_ROUNDS):
+            jobs = collector.next_jobs()
+            if not jobs:
+                break
+            if round_index and not _round_fits_deadline(self.ai_service.active_model):
+                break
+            collector.merge(
+                map_concurrently(make_batch, jobs, max_workers=Config.MAX_PARALLEL_BATCHES)
+            )
+
+    async def _arun_batches(self, collector, make_batch: Callable[[Any], Any], rounds_done: int = 0) -> None:
+        """
+        Async counterpart of _run_batches (batches share the event loop)
+        """
+        for round_index in range(rounds_done, MAX_BATCH_ROUNDS):
+            jobs = collector.next_jobs()
+            if not jobs:
+                break
+            if round_index and not _round_fits_deadline(self.ai_service.active_model):
+                break
+            collector.merge(
+                await gather_concurrently(
+                    make_batch, jobs, max_concurrency=Config.MAX_PARALLEL_BATCHES
+                )
+            )
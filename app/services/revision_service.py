@@ -0,0 +1,382 @@
+"""
+Incremental reprocessing of revised documents
+
+The latest version of every uploaded document is kept as its stable
+chunk hashes (ChunkService.stable_chunks) plus the generated study set,
+with each skill map topic and question attributed to the chunks it was
+drawn from. A re-upload is diffed against that version: topics and
+questions whose chunks are unchanged are reused, and only the changed
+chunks are sent to the LLM.
+"""
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.config import Config
+from app.schemas.quiz_schema import QuizResponse, SkillMapResponse
+from app.schemas.interview_schema import InterviewResponse
+from app.schemas.study_set_schema import StudySetResponse
+from app.services.chunk_service import ChunkService
+from app.services.quiz_service import QuizService
+from app.utils.similarity import topic_similarity, topic_tokens, topic_tokens_list
+
+Chunk = Tuple[str, str]  # (digest, text)
+
+
+@dataclass
+class DocumentVersion:
+    """Latest processed version of a document"""
+    document_id: str
+    chunk_hashes: List[str]
+    result: StudySetResponse
+    # Chunk digests each topic / question was attributed to (empty:
+    # not attributable, reused as long as the document is)
+    topic_chunks: List[Set[str]] = field(default_factory=list)
+    quiz_chunks: List[Set[str]] = field(default_factory=list)
+    interview_chunks: List[Set[str]] = field(default_factory=list)
+
+
+@dataclass
+class RevisionPlan:
+    """What a re-upload can reuse from the previous version"""
+    kept: StudySetResponse
+    changed_text: str
+    changed_chunks: int
+    total_chunks: int
+    change_ratio: float
+
+
+@dataclass
+class Revision:
+    """How a study set was produced, reported in the X-Revision header"""
+    document_id: str
+    mode: str  # new | full | incremental | unchanged
+    changed_chunks: int = 0
+    total_chunks: int = 0
+    reused_questions: int = 0
+
+    def header(self) -> str:
+        if self.mode in ("new", "full"):
+            return self.mode
+        return (
+            f"{self.mode}; changed={self.changed_chunks}/{self.total_chunks}; "
+            f"reused={self.reused_questions}"
+        )
+
+
+class DocumentVersionStore:
+    """
+    Thread-safe LRU of document versions with a chunk index, so a
+    re-upload without a document id is matched to the stored version
+    sharing most of its chunks
+    """
+
+    def __init__(self, max_documents: int, ttl: float = 0):
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self._versions: "OrderedDict[str, Tuple[float, DocumentVersion]]" = OrderedDict()
+        self._chunk_index: Dict[str, Set[str]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_documents > 0
+
+    def get(self, document_id: str) -> Optional[DocumentVersion]:
+        with self._lock:
+            return self._get(document_id)
+
+    def find(self, chunk_hashes: List[str], min_shared: float) -> Optional[DocumentVersion]:
+        """
+        Stored version sharing the most chunks with chunk_hashes, if it
+        shares at least min_shared of them (so common boilerplate alone
+        does not match another client's document)
+        """
+        digests = set(chunk_hashes)
+        with self._lock:
+            shared: Dict[str, int] = defaultdict(int)
+            for digest in digests:
+                for document_id in self._chunk_index.get(digest, ()):
+                    shared[document_id] += 1
+            for document_id in sorted(shared, key=shared.get, reverse=True):
+                if shared[document_id] < min_shared * len(digests):
+                    break
+                version = self._get(document_id)
+                if version is not None:
+                    return version
+            return None
+
+    def put(self, version: DocumentVersion) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._remove(version.document_id)
+            self._versions[version.document_id] = (time.monotonic(), version)
+            for digest in version.chunk_hashes:
+                self._chunk_index[digest].add(version.document_id)
+            while len(self._versions) > self.max_documents:
+                self._remove(next(iter(self._versions)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._versions.clear()
+            self._chunk_index.clear()
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def _get(self, document_id: str) -> Optional[DocumentVersion]:
+        entry = self._versions.get(document_id)
+        if entry is None:
+            return None
+        stored_at, version = entry
+        if self.ttl and time.monotonic() - stored_at > self.ttl:
+            self._remove(document_id)
+            return None
+        self._versions.move_to_end(document_id)
+        return version
+
+    def _remove(self, document_id: str) -> None:
+        entry = self._versions.pop(document_id, None)
+        if entry is None:
+            return
+        for digest in entry[1].chunk_hashes:
+            ids = self._chunk_index.get(digest)
+            if ids is not None:
+                ids.discard(document_id)
+                if not ids:
+                    del self._chunk_index[digest]
+
+
+document_versions = DocumentVersionStore(
+    Config.REVISION_STORE_MAX_DOCUMENTS, Config.REVISION_STORE_TTL
+)
+
+
+# -----------------------
+# Attribution of generated items to chunks
+# -----------------------
+def _chunk_words(text: str) -> Counter:
+    """Occurrences of each significant word of a chunk"""
+    return Counter(topic_tokens_list(text))
+
+
+def _attribute(tokens: Set[str], chunk_words: Dict[str, Counter]) -> Set[str]:
+    """
+    Chunks where tokens occur most often (empty if they occur nowhere);
+    a topic mentioned in passing elsewhere stays with the section that
+    covers it
+    """
+    if not tokens:
+        return set()
+    scores = {
+        digest: sum(words[token] for token in tokens)
+        for digest, words in chunk_words.items()
+    }
+    best = max(scores.values(), default=0)
+    if not best:
+        return set()
+    return {digest for digest, score in scores.items() if score == best}
+
+
+def _item_chunks(
+    topic: Optional[str],
+    question: str,
+    skill_map: SkillMapResponse,
+    topic_chunks: List[Set[str]],
+    chunk_words: Dict[str, Counter]
+) -> Set[str]:
+    """A question belongs to its skill map topic, else to the chunks its text matches"""
+    if topic:
+        for item, chunks in zip(skill_map.skill_map, topic_chunks):
+            if topic_similarity(item.topic, topic) >= Config.COURSE_TOPIC_SIMILARITY:
+                return chunks
+    return _attribute(topic_tokens(f"{topic or ''} {question}"), chunk_words)
+
+
+def build_version(document_id: str, chunks: List[Chunk], result: StudySetResponse) -> DocumentVersion:
+    chunk_words = {digest: _chunk_words(text) for digest, text in chunks}
+    skill_map = result.skill_map
+    topic_chunks = [
+        _attribute(topic_tokens(" ".join([item.topic, *item.subtopics])), chunk_words)
+        for item in skill_map.skill_map
+    ]
+    return DocumentVersion(
+        document_id=document_id,
+        chunk_hashes=[digest for digest, _ in chunks],
+        result=result,
+        topic_chunks=topic_chunks,
+        quiz_chunks=[
+            _item_chunks(q.topic, q.question, skill_map, topic_chunks, chunk_words)
+            for q in result.quiz.quiz
+        ],
+        interview_chunks=[
+            _item_chunks(q.topic, q.question, skill_map, topic_chunks, chunk_words)
+            for q in result.interview_qa.interview_qa
+        ],
+    )
+
+
+def plan_revision(previous: DocumentVersion, chunks: List[Chunk]) -> RevisionPlan:
+    """
+    Diff a new version's chunks against the previous version
+
+    Topics and questions are kept when every chunk they were attributed
+    to is still present; text of the added chunks is what changed.
+    """
+    current = {digest for digest, _ in chunks}
+    old = set(previous.chunk_hashes)
+    added = [(digest, text) for digest, text in chunks if digest not in old]
+
+    def unchanged(item_chunks: Set[str]) -> bool:
+        return item_chunks <= current
+
+    result = previous.result
+    topics = [
+        item for item, item_chunks in zip(result.skill_map.skill_map, previous.topic_chunks)
+        if unchanged(item_chunks)
+    ]
+    quiz = [
+        q for q, item_chunks in zip(result.quiz.quiz, previous.quiz_chunks)
+        if unchanged(item_chunks)
+    ]
+    interview = [
+        q for q, item_chunks in zip(result.interview_qa.interview_qa, previous.interview_chunks)
+        if unchanged(item_chunks)
+    ]
+
+    total_chars = sum(len(text) for _, text in chunks) or 1
+    changed_text = " ".join(text for _, text in added)
+    # Removed chunks count as changes too, even if nothing replaced them
+    removed = len(old - current)
+    return RevisionPlan(
+        kept=StudySetResponse(
+            skill_map=SkillMapResponse(skill_map=topics, total_topics=len(topics)),
+            quiz=QuizResponse(quiz=quiz, total_questions=len(quiz)),
+            interview_qa=InterviewResponse(interview_qa=interview, total_questions=len(interview)),
+        ),
+        changed_text=changed_text,
+        changed_chunks=max(len(added), removed),
+        total_chunks=len(chunks),
+        change_ratio=max(len(changed_text) / total_chars, removed / max(len(old), 1)),
+    )
+
+
+class RevisionService:
+    """
+    Processes an upload as a new version of a known document when one
+    matches, falling back to full generation otherwise
+    """
+
+    def __init__(self, store: DocumentVersionStore = document_versions):
+        self.store = store
+        self.quiz_service = QuizService()
+        self.chunker = ChunkService(chunk_size=Config.CHUNK_SIZE)
+
+    def process(
+        self,
+        syllabus_text: str,
+        quiz_questions: int = 10,
+        interview_questions: int = 10,
+        document_id: Optional[str] = None
+    ) -> Tuple[StudySetResponse, Revision]:
+        chunks, previous, plan = self._prepare(syllabus_text, document_id)
+        if plan is None:
+            result = self.quiz_service.process_syllabus(
+                syllabus_text, quiz_questions, interview_questions
+            )
+        else:
+            result = self.quiz_service.process_revision(
+                plan.kept, plan.changed_text, syllabus_text, quiz_questions, interview_questions
+            )
+        return result, self._finish(chunks, previous, plan, result, document_id)
+
+    async def aprocess(
+        self,
+        syllabus_text: str,
+        quiz_questions: int = 10,
+        interview_questions: int = 10,
+        document_id: Optional[str] = None
+    ) -> Tuple[StudySetResponse, Revision]:
+        """
+        Async version of process
+        """
+        chunks, previous, plan = self._prepare(syllabus_text, document_id)
+        if plan is None:
+            result = await self.quiz_service.aprocess_syllabus(
+                syllabus_text, quiz_questions, interview_questions
+            )
+        else:
+            result = await self.quiz_service.aprocess_revision(
+                plan.kept, plan.changed_text, syllabus_text, quiz_questions, interview_questions
+            )
+        return result, self._finish(chunks, previous, plan, result, document_id)
+
+    def _prepare(
+        self,
+        syllabus_text: str,
+        document_id: Optional[str]
+    ) -> Tuple[List[Chunk], Optional[DocumentVersion], Optional[RevisionPlan]]:
+        chunks = self._visible_chunks(syllabus_text)
+        if not self.store.enabled:
+            return chunks, None, None
+
+        if document_id:
+            previous = self.store.get(document_id)
+        else:
+            previous = self.store.find(
+                [digest for digest, _ in chunks], 1 - Config.REVISION_MAX_CHANGE_RATIO
+            )
+        if previous is None:
+            return chunks, None, None
+
+        plan = plan_revision(previous, chunks)
+        if plan.change_ratio > Config.REVISION_MAX_CHANGE_RATIO:
+            # A matched (not named) document that changed this much is a
+            # new document: it gets its own id rather than replacing that one
+            return chunks, (previous if document_id else None), None
+        return chunks, previous, plan
+
+    def _visible_chunks(self, syllabus_text: str) -> List[Chunk]:
+        """
+        Chunks starting within the text the LLM sees (MAX_SYLLABUS_CHARS)
+
+        The whole text is chunked before the cut, so growth of earlier
+        sections does not change the last chunk's boundary.
+        """
+        chunks = []
+        offset = 0
+        for digest, text in self.chunker.stable_chunks(syllabus_text):
+            if offset >= Config.MAX_SYLLABUS_CHARS:
+                break
+            chunks.append((digest, text))
+            offset += len(text) + 1
+        return chunks
+
+    def _finish(
+        self,
+        chunks: List[Chunk],
+        previous: Optional[DocumentVersion],
+        plan: Optional[RevisionPlan],
+        result: StudySetResponse,
+        document_id: Optional[str]
+    ) -> Revision:
+        document_id = (previous.document_id if previous else document_id) or uuid.uuid4().hex
+        self.store.put(build_version(document_id, chunks, result))
+
+        if plan is None:
+            return Revision(document_id, "full" if previous else "new")
+
+        reused = {id(q) for q in plan.kept.quiz.quiz + plan.kept.interview_qa.interview_qa}
+        return Revision(
+            document_id,
+            "incremental" if plan.changed_chunks else "unchanged",
+            changed_chunks=plan.changed_chunks,
+            total_chunks=plan.total_chunks,
+            reused_questions=sum(
+                1 for q in result.quiz.quiz + result.interview_qa.interview_qa if id(q) in reused
+            ),
+        )
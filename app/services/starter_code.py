@@ -0,0 +1,264 @@
+"""
+Starter code rendered from a challenge's language-neutral signature
+
+A coding challenge stores its function as a FunctionSignature with
+types from a small neutral vocabulary (int, float, bool, str, list[T],
+dict[K,V], none). For the languages below the skeleton is rendered
+locally; other languages, or types outside the vocabulary, return None
+and are left to a small LLM call.
+"""
+import re
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from app.schemas.challenge_schema import FunctionSignature
+
+# Accepted spellings -> canonical language name
+LANGUAGE_ALIASES = {
+    "py": "python", "python3": "python",
+    "js": "javascript", "node": "javascript", "nodejs": "javascript",
+    "ts": "typescript",
+    "c++": "cpp", "cplusplus": "cpp",
+    "c#": "csharp", "cs": "csharp",
+    "golang": "go",
+    "rs": "rust",
+}
+
+# Parsed neutral type: scalar name, or (container, [argument types])
+NeutralType = Union[str, Tuple[str, List["NeutralType"]]]
+
+_SCALARS = {"int", "float", "bool", "str", "none"}
+_SCALAR_ALIASES = {
+    "integer": "int", "long": "int", "double": "float", "number": "float",
+    "boolean": "bool", "string": "str", "void": "none", "null": "none",
+    "array": "list", "map": "dict",
+}
+
+
+def normalize_language(language: str) -> str:
+    key = re.sub(r"\s+", "", (language or "").lower())
+    return LANGUAGE_ALIASES.get(key, key)
+
+
+class _UnsupportedType(ValueError):
+    pass
+
+
+def parse_type(text: str) -> NeutralType:
+    """
+    Parse a neutral type ("list[list[int]]", "dict[str, int]")
+
+    Raises:
+        _UnsupportedType
+    """
+    parsed, rest = _parse(re.sub(r"\s+", "", text.lower()))
+    if rest:
+        raise _UnsupportedType(text)
+    return parsed
+
+
+def _parse(text: str) -> Tuple[NeutralType, str]:
+    match = re.match(r"[a-z]+", text)
+    if not match:
+        raise _UnsupportedType(text)
+    name = _SCALAR_ALIASES.get(match.group(0), match.group(0))
+    rest = text[match.end():]
+    if name in ("list", "dict"):
+        if not rest.startswith("["):
+            raise _UnsupportedType(text)
+        args = []
+        rest = rest[1:]
+        while True:
+            arg, rest = _parse(rest)
+            args.append(arg)
+            if rest.startswith(","):
+                rest = rest[1:]
+                continue
+            break
+        if not rest.startswith("]") or len(args) != (1 if name == "list" else 2):
+            raise _UnsupportedType(text)
+        return (name, args), rest[1:]
+    if name not in _SCALARS:
+        raise _UnsupportedType(text)
+    return name, rest
+
+
+# -----------------------
+# Names
+# -----------------------
+def _words(name: str) -> List[str]:
+    spaced = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", name)
+    return [w.lower() for w in re.split(r"[^A-Za-z0-9]+", spaced) if w] or ["solve"]
+
+
+def _snake(name: str) -> str:
+    return "_".join(_words(name))
+
+
+def _camel(name: str) -> str:
+    words = _words(name)
+    return words[0] + "".join(w.title() for w in words[1:])
+
+
+def _pascal(name: str) -> str:
+    return "".join(w.title() for w in _words(name))
+
+
+# -----------------------
+# Types per language
+# -----------------------
+def _python_type(t: NeutralType) -> str:
+    if isinstance(t, str):
+        return {"none": "None"}.get(t, t)
+    container, args = t
+    return f"{container}[{', '.join(_python_type(a) for a in args)}]"
+
+
+def _ts_type(t: NeutralType) -> str:
+    if isinstance(t, str):
+        return {"int": "number", "float": "number", "bool": "boolean", "str": "string", "none": "void"}[t]
+    container, args = t
+    if container == "list":
+        return f"{_ts_type(args[0])}[]"
+    return f"Record<{_ts_type(args[0])}, {_ts_type(args[1])}>"
+
+
+def _java_type(t: NeutralType, boxed: bool = False) -> str:
+    if isinstance(t, str):
+        if boxed:
+            return {"int": "Integer", "float": "Double", "bool": "Boolean", "str": "String", "none": "Void"}[t]
+        return {"int": "int", "float": "double", "bool": "boolean", "str": "String", "none": "void"}[t]
+    container, args = t
+    if container == "list":
+        return f"List<{_java_type(args[0], True)}>" if boxed else f"{_java_type(args[0])}[]"
+    return f"Map<{_java_type(args[0], True)}, {_java_type(args[1], True)}>"
+
+
+def _cpp_type(t: NeutralType) -> str:
+    if isinstance(t, str):
+        return {"int": "int", "float": "double", "bool": "bool", "str": "string", "none": "void"}[t]
+    container, args = t
+    if container == "list":
+        return f"vector<{_cpp_type(args[0])}>"
+    return f"unordered_map<{_cpp_type(args[0])}, {_cpp_type(args[1])}>"
+
+
+def _csharp_type(t: NeutralType) -> str:
+    if isinstance(t, str):
+        return {"int": "int", "float": "double", "bool": "bool", "str": "string", "none": "void"}[t]
+    container, args = t
+    if container == "list":
+        return f"{_csharp_type(args[0])}[]"
+    return f"Dictionary<{_csharp_type(args[0])}, {_csharp_type(args[1])}>"
+
+
+def _go_type(t: NeutralType) -> str:
+    if isinstance(t, str):
+        return {"int": "int", "float": "float64", "bool": "bool", "str": "string", "none": ""}[t]
+    container, args = t
+    if container == "list":
+        return f"[]{_go_type(args[0])}"
+    return f"map[{_go_type(args[0])}]{_go_type(args[1])}"
+
+
+def _rust_type(t: NeutralType) -> str:
+    if isinstance(t, str):
+        return {"int": "i64", "float": "f64", "bool": "bool", "str": "String", "none": "()"}[t]
+    container, args = t
+    if container == "list":
+        return f"Vec<{_rust_type(args[0])}>"
+    return f"HashMap<{_rust_type(args[0])}, {_rust_type(args[1])}>"
+
+
+# -----------------------
+# Skeletons per language
+# -----------------------
+Params = List[Tuple[str, NeutralType]]
+
+
+def _python(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_snake(p)}: {_python_type(t)}" for p, t in params)
+    return f"def {_snake(name)}({args}) -> {_python_type(returns)}:\n    # TODO: implement\n    pass\n"
+
+
+def _javascript(name: str, params: Params, returns: NeutralType) -> str:
+    doc = [f" * @param {{{_ts_type(t)}}} {_camel(p)}" for p, t in params]
+    if returns != "none":
+        doc.append(f" * @return {{{_ts_type(returns)}}}")
+    args = ", ".join(_camel(p) for p, _ in params)
+    return (
+        "/**\n" + "\n".join(doc) + "\n */\n"
+        f"function {_camel(name)}({args}) {{\n  // TODO: implement\n}}\n"
+    )
+
+
+def _typescript(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_camel(p)}: {_ts_type(t)}" for p, t in params)
+    return f"function {_camel(name)}({args}): {_ts_type(returns)} {{\n  // TODO: implement\n}}\n"
+
+
+def _java(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_java_type(t)} {_camel(p)}" for p, t in params)
+    return (
+        "class Solution {\n"
+        f"    public {_java_type(returns)} {_camel(name)}({args}) {{\n"
+        "        // TODO: implement\n    }\n}\n"
+    )
+
+
+def _cpp(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_cpp_type(t)} {_camel(p)}" for p, t in params)
+    return (
+        "class Solution {\npublic:\n"
+        f"    {_cpp_type(returns)} {_camel(name)}({args}) {{\n"
+        "        // TODO: implement\n    }\n};\n"
+    )
+
+
+def _csharp(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_csharp_type(t)} {_camel(p)}" for p, t in params)
+    return (
+        "public class Solution {\n"
+        f"    public {_csharp_type(returns)} {_pascal(name)}({args}) {{\n"
+        "        // TODO: implement\n    }\n}\n"
+    )
+
+
+def _go(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_camel(p)} {_go_type(t)}" for p, t in params)
+    result = _go_type(returns)
+    return f"func {_camel(name)}({args}){' ' + result if result else ''} {{\n\t// TODO: implement\n}}\n"
+
+
+def _rust(name: str, params: Params, returns: NeutralType) -> str:
+    args = ", ".join(f"{_snake(p)}: {_rust_type(t)}" for p, t in params)
+    result = "" if returns == "none" else f" -> {_rust_type(returns)}"
+    return f"pub fn {_snake(name)}({args}){result} {{\n    todo!()\n}}\n"
+
+
+_RENDERERS: Dict[str, Callable[[str, Params, NeutralType], str]] = {
+    "python": _python,
+    "javascript": _javascript,
+    "typescript": _typescript,
+    "java": _java,
+    "cpp": _cpp,
+    "csharp": _csharp,
+    "go": _go,
+    "rust": _rust,
+}
+
+
+def render_starter(signature: Optional[FunctionSignature], language: str) -> Optional[str]:
+    """
+    Starter code for signature in language, or None when it can't be
+    rendered locally (no signature, unknown language or type)
+    """
+    renderer = _RENDERERS.get(normalize_language(language))
+    if signature is None or renderer is None:
+        return None
+    try:
+        params = [(p.name, parse_type(p.type)) for p in signature.params]
+        returns = parse_type(signature.returns or "none")
+        return renderer(signature.name, params, returns)
+    except (_UnsupportedType, KeyError):
+        # KeyError: "none" used as a parameter or element type
+        return None
@@ -0,0 +1,336 @@
+"""
+Admission control for the LLM-bound routes
+
+Each process admits at most ADMISSION_MAX_IN_FLIGHT requests at a time
+(ADMISSION_MAX_PER_CLIENT per client). Requests beyond that wait in a
+bounded queue ordered by priority class (interactive topic calls before
+bulk syllabus processing), and bulk requests never take more than
+ADMISSION_BULK_SHARE of the slots, so interactive calls always find
+room. When the queue is full, the client is over its limit or the wait
+exceeds ADMISSION_QUEUE_TIMEOUT, the request is answered at once with
+429 and a Retry-After estimate instead of timing out later.
+
+The same controller serves the Flask hooks (blocking waits) and the
+ASGI dispatcher (awaitable waits).
+"""
+import asyncio
+import bisect
+import itertools
+import math
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from app.config import Config
+from app.utils.metrics import REGISTRY
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Lower rank is served first
+PRIORITY_RANK = {INTERACTIVE: 0, BULK: 1}
+
+# Endpoints under admission control and their priority class
+ENDPOINT_CLASSES = {
+    "api.generate_quiz": INTERACTIVE,
+    "api.generate_flashcards": INTERACTIVE,
+    "api.generate_coding_challenge": INTERACTIVE,
+    "api.upload_pdf": BULK,
+    "api.upload_course": BULK,
+}
+
+# Service time assumed per class before any request has finished
+_INITIAL_SERVICE_SECONDS = {INTERACTIVE: 5.0, BULK: 20.0}
+_EWMA_ALPHA = 0.2
+
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    "studygenie_admission_queue_depth",
+    "Requests waiting for admission",
+    ("priority",),
+)
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    "studygenie_admission_in_flight",
+    "Admitted requests currently running",
+    ("priority",),
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "studygenie_admission_rejections_total",
+    "Requests rejected with 429 by admission control",
+    ("priority", "reason"),
+)
+ADMISSION_WAIT = REGISTRY.histogram(
+    "studygenie_admission_wait_seconds",
+    "Time admitted requests spent queued",
+    ("priority",),
+)
+
+
+class AdmissionRejected(Exception):
+    """Request refused by admission control (rendered as 429)"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def to_dict(self) -> Dict[str, str]:
+        messages = {
+            "client_limit": "Too many concurrent requests from this client",
+            "queue_full": "Server is busy; request queue is full",
+            "queue_timeout": "Server is busy; request waited too long for a slot",
+        }
+        return {
+            "error": "Too many requests",
+            "message": f"{messages.get(self.reason, 'Server is busy')}, retry in {self.retry_after}s",
+        }
+
+
+@dataclass
+class Ticket:
+    """An admitted request; hand back to release() when done"""
+    client: str
+    priority: str
+    admitted_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class _Waiter:
+    rank: int
+    seq: int
+    client: str
+    priority: str
+    wake: Callable[[], None]
+    enqueued_at: float = field(default_factory=time.monotonic)
+    ticket: Optional[Ticket] = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.rank, self.seq) < (other.rank, other.seq)
+
+
+class AdmissionController:
+    """
+    Per-process in-flight limits with a bounded priority queue
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_per_client: int,
+        queue_size: int,
+        queue_timeout: float,
+        bulk_share: float
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_per_client = max_per_client
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.bulk_limit = max(1, math.floor(max_in_flight * bulk_share))
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._in_flight: Counter = Counter()   # by priority
+        self._clients: Counter = Counter()     # admitted + queued, by client
+        self._service_seconds = dict(_INITIAL_SERVICE_SECONDS)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    # -----------------------
+    # Acquire / release
+    # -----------------------
+    def acquire(self, client: str, priority: str) -> Ticket:
+        """
+        Admit a request, blocking while it is queued
+
+        Raises:
+            AdmissionRejected
+        """
+        event = threading.Event()
+        ticket, waiter = self._arrive(client, priority, event.set)
+        if ticket is not None:
+            return ticket
+        event.wait(self.queue_timeout)
+        return self._finish_wait(waiter)
+
+    async def aacquire(self, client: str, priority: str) -> Ticket:
+        """
+        Async version of acquire
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        ticket, waiter = self._arrive(client, priority, wake)
+        if ticket is not None:
+            return ticket
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Client went away while queued
+            self._abandon(waiter)
+            raise
+        return self._finish_wait(waiter)
+
+    def release(self, ticket: Ticket) -> None:
+        elapsed = time.monotonic() - ticket.admitted_at
+        with self._lock:
+            self._in_flight[ticket.priority] -= 1
+            self._release_client(ticket.client)
+            previous = self._service_seconds[ticket.priority]
+            self._service_seconds[ticket.priority] = (
+                (1 - _EWMA_ALPHA) * previous + _EWMA_ALPHA * elapsed
+            )
+            ADMISSION_IN_FLIGHT.dec(priority=ticket.priority)
+            self._dispatch()
+
+    def retry_after(self, priority: str) -> int:
+        """Seconds until a slot is likely free, from queue depth and service time"""
+        with self._lock:
+            return self._retry_after(priority)
+
+    # -----------------------
+    # Internals (called with self._lock held unless noted)
+    # -----------------------
+    def _arrive(self, client: str, priority: str, wake: Callable[[], None]):
+        with self._lock:
+            if self._clients[client] >= self.max_per_client:
+                self._reject(priority, "client_limit")
+
+            rank = PRIORITY_RANK[priority]
+            ahead = any(w.rank <= rank for w in self._queue)
+            if not ahead and self._has_capacity(priority):
+                self._clients[client] += 1
+                return self._admit(client, priority), None
+
+            if len(self._queue) >= self.queue_size:
+                self._reject(priority, "queue_full")
+
+            waiter = _Waiter(rank, next(self._seq), client, priority, wake)
+            bisect.insort(self._queue, waiter)
+            self._clients[client] += 1
+            ADMISSION_QUEUE_DEPTH.inc(priority=priority)
+            return None, waiter
+
+    def _finish_wait(self, waiter: _Waiter) -> Ticket:
+        # Not holding the lock
+        with self._lock:
+            if waiter.ticket is None:
+                self._remove_waiter(waiter)
+                self._release_client(waiter.client)
+                self._reject(waiter.priority, "queue_timeout")
+        ADMISSION_WAIT.observe(time.monotonic() - waiter.enqueued_at, priority=waiter.priority)
+        return waiter.ticket
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        # Not holding the lock
+        with self._lock:
+            if waiter.ticket is None:
+                self._remove_waiter(waiter)
+                self._release_client(waiter.client)
+                return
+        # Granted just before cancellation: give the slot back
+        self.release(waiter.ticket)
+
+    def _has_capacity(self, priority: str) -> bool:
+        if sum(self._in_flight.values()) >= self.max_in_flight:
+            return False
+        return priority != BULK or self._in_flight[BULK] < self.bulk_limit
+
+    def _admit(self, client: str, priority: str) -> Ticket:
+        self._in_flight[priority] += 1
+        ADMISSION_IN_FLIGHT.inc(priority=priority)
+        return Ticket(client, priority)
+
+    def _dispatch(self) -> None:
+        """Grant free slots to queued requests in priority order"""
+        for waiter in list(self._queue):
+            if sum(self._in_flight.values()) >= self.max_in_flight:
+                break
+            if not self._has_capacity(waiter.priority):
+                continue
+            self._remove_waiter(waiter)
+            waiter.ticket = self._admit(waiter.client, waiter.priority)
+            waiter.wake()
+
+    def _remove_waiter(self, waiter: _Waiter) -> None:
+        self._queue.remove(waiter)
+        ADMISSION_QUEUE_DEPTH.dec(priority=waiter.priority)
+
+    def _release_client(self, client: str) -> None:
+        self._clients[client] -= 1
+        if self._clients[client] <= 0:
+            del self._clients[client]
+
+    def _retry_after(self, priority: str) -> int:
+        waiting = sum(1 for w in self._queue if w.rank <= PRIORITY_RANK[priority])
+        estimate = (waiting + 1) * self._service_seconds[priority] / max(1, self.max_in_flight)
+        return max(1, min(Config.ADMISSION_MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    def _reject(self, priority: str, reason: str) -> None:
+        ADMISSION_REJECTIONS.inc(priority=priority, reason=reason)
+        raise AdmissionRejected(reason, self._retry_after(priority))
+
+
+def client_id(remote_addr: Optional[str], forwarded_for: Optional[str]) -> str:
+    """
+    Client identity for per-client limits
+
+    Behind proxies (Render, Heroku) that append the peer they saw to
+    X-Forwarded-For, the client is the entry ADMISSION_FORWARDED_HOPS
+    from the end; earlier entries come from the client and are ignored.
+    The header is only read when ADMISSION_TRUST_FORWARDED is set.
+    """
+    if Config.ADMISSION_TRUST_FORWARDED and forwarded_for:
+        entries = [entry.strip() for entry in forwarded_for.split(",")]
+        hops = max(1, Config.ADMISSION_FORWARDED_HOPS)
+        if len(entries) >= hops and entries[-hops]:
+            return entries[-hops]
+    return remote_addr or "unknown"
+
+
+admission = AdmissionController(
+    max_in_flight=Config.ADMISSION_MAX_IN_FLIGHT if Config.ADMISSION_ENABLED else 0,
+    max_per_client=Config.ADMISSION_MAX_PER_CLIENT,
+    queue_size=Config.ADMISSION_QUEUE_SIZE,
+    queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+    bulk_share=Config.ADMISSION_BULK_SHARE,
+)
+
+
+def init_app(app) -> None:
+    """
+    Register the admission hooks
+
+    Register after the metrics hooks so rejected requests are counted.
+    """
+    if not admission.enabled:
+        return
+    from flask import g, jsonify, request
+
+    @app.before_request
+    def _admit_request():
+        priority = ENDPOINT_CLASSES.get(request.endpoint)
+        if priority is None:
+            return None
+        client = client_id(request.remote_addr, request.headers.get("X-Forwarded-For"))
+        try:
+            g._admission_ticket = admission.acquire(client, priority)
+        except AdmissionRejected as e:
+            response = jsonify(e.to_dict())
+            response.status_code = 429
+            response.headers["Retry-After"] = str(e.retry_after)
+            return response
+        return None
+
+    @app.teardown_request
+    def _release_request(exc):
+        ticket = g.pop("_admission_ticket", None)
+        if ticket is not None:
+            admission.release(ticket)
@@ -0,0 +1,178 @@
+"""
+Local library of generated coding challenges (SQLite)
+
+A challenge's problem statement, test cases, hints, complexity and
+function signature do not depend on the programming language, so they
+are stored once per (normalized topic, difficulty) as its core; the
+starter code is stored per language as a variant. A request for a new
+language of a known challenge then only needs its starter code.
+
+The least recently used challenges (with their variants) are evicted
+beyond CHALLENGE_LIBRARY_MAX_CHALLENGES. WAL mode lets several gunicorn
+workers share the file.
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import Config
+from app.services.starter_code import normalize_language
+from app.utils.similarity import normalize_text
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS challenges (
+    key TEXT PRIMARY KEY,
+    core TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS challenges_accessed ON challenges (accessed_at);
+CREATE TABLE IF NOT EXISTS challenge_variants (
+    key TEXT NOT NULL,
+    language TEXT NOT NULL,
+    starter_code TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (key, language)
+);
+"""
+
+
+def challenge_key(topic: str, difficulty: str) -> str:
+    return f"{normalize_text(topic)}|{(difficulty or '').strip().lower()}"
+
+
+class ChallengeLibrary:
+    """
+    SQLite-backed, count-bounded LRU library of challenge cores and
+    per-language starter code
+
+    One connection per thread; connections are opened lazily.
+    """
+
+    def __init__(self, path: Path, max_challenges: int):
+        self.path = Path(path)
+        self.max_challenges = max_challenges
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_challenges > 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def reset(self) -> None:
+        """Drop connections inherited across fork"""
+        self._local = threading.local()
+
+    # -----------------------
+    # Public API
+    # -----------------------
+    def get(self, topic: str, difficulty: str, language: str) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        (core, starter code in language) of the stored challenge; either
+        is None when missing
+        """
+        key = challenge_key(topic, difficulty)
+        conn = self._connection()
+        row = conn.execute("SELECT core FROM challenges WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, None
+        conn.execute("UPDATE challenges SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        variant = conn.execute(
+            "SELECT starter_code FROM challenge_variants WHERE key = ? AND language = ?",
+            (key, normalize_language(language))
+        ).fetchone()
+        return json.loads(row[0]), (variant[0] if variant else None)
+
+    def put(
+        self,
+        topic: str,
+        difficulty: str,
+        core: Dict[str, Any],
+        language: str,
+        starter_code: Optional[str],
+        source: str = "llm"
+    ) -> None:
+        """Store a challenge core (kept if one exists) and its starter code"""
+        key = challenge_key(topic, difficulty)
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO challenges (key, core, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(core), now, now)
+            )
+            if starter_code:
+                self._put_variant(conn, key, language, starter_code, source, now)
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def put_variant(self, topic: str, difficulty: str, language: str, starter_code: str, source: str) -> None:
+        """Store the starter code of a known challenge in another language"""
+        self._put_variant(
+            self._connection(), challenge_key(topic, difficulty), language, starter_code, source, time.time()
+        )
+
+    def stats(self) -> Dict[str, int]:
+        conn = self._connection()
+        challenges = conn.execute("SELECT COUNT(*) FROM challenges").fetchone()[0]
+        variants = conn.execute("SELECT COUNT(*) FROM challenge_variants").fetchone()[0]
+        return {"challenges": challenges, "variants": variants}
+
+    def clear(self) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM challenge_variants")
+        conn.execute("DELETE FROM challenges")
+
+    @staticmethod
+    def _put_variant(
+        conn: sqlite3.Connection,
+        key: str,
+        language: str,
+        starter_code: str,
+        source: str,
+        now: float
+    ) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO challenge_variants (key, language, starter_code, source, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, normalize_language(language), starter_code, source, now)
+        )
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used challenges beyond max_challenges"""
+        excess = conn.execute("SELECT COUNT(*) FROM challenges").fetchone()[0] - self.max_challenges
+        if excess <= 0:
+            return
+        keys = [
+            (key,) for (key,) in conn.execute(
+                "SELECT key FROM challenges ORDER BY accessed_at LIMIT ?", (excess,)
+            ).fetchall()
+        ]
+        conn.executemany("DELETE FROM challenge_variants WHERE key = ?", keys)
+        conn.executemany("DELETE FROM challenges WHERE key = ?", keys)
+
+
+challenge_library = ChallengeLibrary(Config.CHALLENGE_LIBRARY_PATH, Config.CHALLENGE_LIBRARY_MAX_CHALLENGES)
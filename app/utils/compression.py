@@ -0,0 +1,232 @@
+"""
+Response compression and content-hash ETags
+
+Large JSON bodies are compressed with the best encoding both sides
+support (brotli / zstd when installed, gzip always). Every compressible
+200 response carries a strong ETag derived from a hash of its
+uncompressed body, so conditional GETs are answered with 304.
+
+Results that are served repeatedly should be kept as EncodedPayload:
+it holds the serialized body, its ETag and the compressed variants, so
+a repeat fetch neither re-serializes nor re-compresses, and a matching
+If-None-Match returns 304 before the body is touched.
+"""
+import gzip
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from werkzeug.http import parse_accept_header, parse_etags
+
+from app.config import Config
+from app.utils.metrics import stage_timer
+from app.utils.serialization import dumps
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional encoding
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/plain", "text/html", "text/csv"}
+
+# Short suffix appended to the ETag of each encoded representation
+_ETAG_SUFFIX = {"br": "br", "zstd": "zst", "gzip": "gz"}
+
+
+def available_encodings() -> List[str]:
+    """Configured encodings this process can actually produce, in preference order"""
+    usable = {"gzip"}
+    if brotli is not None:
+        usable.add("br")
+    if zstandard is not None:
+        usable.add("zstd")
+    return [e for e in Config.COMPRESSION_ENCODINGS if e in usable]
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content coding for an Accept-Encoding header
+
+    Client q-values decide; ties go to the server preference order.
+    Returns None for identity.
+    """
+    if not accept_encoding:
+        return None
+    return parse_accept_header(accept_encoding).best_match(available_encodings())
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    with stage_timer("compress"):
+        if encoding == "gzip":
+            return gzip.compress(body, compresslevel=Config.GZIP_LEVEL, mtime=0)
+        if encoding == "br":
+            return brotli.compress(body, quality=Config.BROTLI_QUALITY)
+        if encoding == "zstd":
+            return zstandard.ZstdCompressor(level=Config.ZSTD_LEVEL).compress(body)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+
+def content_hash(body: bytes) -> str:
+    """Hex digest identifying a response body"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def representation_etag(body_hash: str, encoding: Optional[str]) -> str:
+    """
+    Unquoted strong ETag of one representation
+
+    Encoded variants get their own tag, as strong validators must
+    differ between byte-different representations.
+    """
+    return f"{body_hash}-{_ETAG_SUFFIX[encoding]}" if encoding else body_hash
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return parse_etags(if_none_match).contains_weak(etag)
+
+
+class EncodedPayload:
+    """
+    A serialized response body with its ETag and compressed variants
+
+    Variants are produced on first request for each encoding and kept,
+    so an EncodedPayload stored in a result cache serves every later
+    fetch from memory.
+    """
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.hash = content_hash(body)
+        self._variants: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_object(cls, obj: Any) -> "EncodedPayload":
+        """Serialize a model or JSON-compatible object once"""
+        return cls(dumps(obj))
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        variant = self._variants.get(encoding)
+        if variant is None:
+            variant = compress(self.body, encoding)
+            with self._lock:
+                self._variants.setdefault(encoding, variant)
+        return variant
+
+    @property
+    def size(self) -> int:
+        """Bytes held, including cached variants"""
+        return len(self.body) + sum(len(v) for v in self._variants.values())
+
+
+def should_compress(body_size: int, mimetype: Optional[str]) -> bool:
+    return (
+        Config.COMPRESSION_ENABLED
+        and body_size >= Config.COMPRESSION_MIN_SIZE
+        and mimetype in COMPRESSIBLE_MIMETYPES
+    )
+
+
+def encode_body(
+    body: bytes,
+    accept_encoding: Optional[str],
+    mimetype: str = "application/json",
+    payload: Optional[EncodedPayload] = None
+) -> Tuple[bytes, Optional[str], str]:
+    """
+    Choose the representation of a body for a client
+
+    Args:
+        body: Uncompressed body
+        accept_encoding: Client Accept-Encoding header
+        mimetype: Response mimetype
+        payload: Cached EncodedPayload for body, if any
+
+    Returns:
+        (bytes to send, content encoding or None, unquoted ETag)
+    """
+    payload = payload or EncodedPayload(body)
+    encoding = None
+    if should_compress(len(payload.body), mimetype):
+        encoding = negotiate_encoding(accept_encoding)
+    return payload.encoded(encoding), encoding, representation_etag(payload.hash, encoding)
+
+
+def payload_response(payload: EncodedPayload, status: int = 200):
+    """
+    Flask response for a cached EncodedPayload
+
+    The after-request hook answers conditional requests and picks the
+    compressed variant from the payload instead of the response body.
+    """
+    from flask import current_app
+
+    response = current_app.response_class(payload.body, status=status, mimetype="application/json")
+    response.encoded_payload = payload
+    return response
+
+
+def replace_body(response, data: bytes) -> None:
+    """
+    Rewrite the body of a response in an after-request hook
+
+    Drops the response's EncodedPayload, so the compression hook takes
+    the ETag and compressed variant from the new body.
+    """
+    response.set_data(data)
+    response.encoded_payload = None
+
+
+def init_app(app) -> None:
+    """
+    Register the compression/ETag hook
+
+    Register before other after-request hooks that rewrite the body
+    (Flask runs them in reverse order, so this one runs last).
+    """
+    from flask import request
+
+    @app.after_request
+    def _compress_response(response):
+        if (
+            response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or "Content-Encoding" in response.headers
+        ):
+            return response
+
+        payload = getattr(response, "encoded_payload", None)
+        if payload is None:
+            if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+                return response
+            payload = EncodedPayload(response.get_data())
+
+        encoding = None
+        if should_compress(len(payload.body), response.mimetype):
+            encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+            response.vary.add("Accept-Encoding")
+
+        etag = representation_etag(payload.hash, encoding)
+        response.set_etag(etag)
+
+        if request.method in ("GET", "HEAD") and etag_matches(
+            request.headers.get("If-None-Match"), etag
+        ):
+            response.status_code = 304
+            response.set_data(b"")
+            return response
+
+        if encoding is not None:
+            response.set_data(payload.encoded(encoding))
+            response.headers["Content-Encoding"] = encoding
+        return response
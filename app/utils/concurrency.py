@@ -0,0 +1,73 @@
+"""
+Concurrency helpers for fanning out blocking work (LLM calls, extraction)
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, List, Union
+
+
+def map_concurrently(
+    func: Callable[..., Any],
+    items: Iterable[Any],
+    max_workers: int = 4
+) -> List[Union[Any, Exception]]:
+    """
+    Run func over items in a thread pool, preserving order
+
+    Each task runs inside a copy of the caller's context so that
+    context variables set for the current request remain visible.
+    Exceptions are returned in place of results rather than raised,
+    so one failed task does not discard the others.
+
+    Args:
+        func: Callable applied to each item
+        items: Inputs to process
+        max_workers: Upper bound on concurrent threads
+
+    Returns:
+        List of results (or exceptions) in input order
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def _run(item):
+        try:
+            return func(item)
+        except Exception as e:
+            return e
+
+    if len(items) == 1 or max_workers <= 1:
+        return [_run(item) for item in items]
+
+    workers = min(max_workers, len(items))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _run, item)
+            for item in items
+        ]
+        return [f.result() for f in futures]
+
+
+async def gather_concurrently(
+    func: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    max_concurrency: int = 4
+) -> List[Union[Any, Exception]]:
+    """
+    Async counterpart of map_concurrently
+
+    Awaits func(item) for every item with at most max_concurrency in
+    flight, returning results (or exceptions) in input order.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def _run(item):
+        async with semaphore:
+            try:
+                return await func(item)
+            except Exception as e:
+                return e
+
+    return list(await asyncio.gather(*(_run(item) for item in items)))
@@ -0,0 +1,131 @@
+"""
+Per-request deadlines
+
+Every request gets a time budget (REQUEST_DEADLINE, overridable per
+endpoint with REQUEST_DEADLINES) set where it enters the app. The budget
+travels with the request in a context variable, so it reaches PDF
+extraction, the LLM calls and the concurrent batches they fan out to:
+
+- LLM calls time out with the remaining budget, and no call is started
+  with less than DEADLINE_MIN_CALL_SECONDS left
+- retries, JSON repairs and top-up batch rounds that would not finish
+  in time (judged by the model's recent median latency) are skipped,
+  so the request returns what it already has
+- when nothing usable is left, DeadlineExceeded is rendered as 503
+  instead of the worker being killed by gunicorn's timeout
+"""
+import time
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.config import Config
+from app.utils.metrics import REGISTRY, current_endpoint
+
+DEADLINE_SKIPS = REGISTRY.counter(
+    "studygenie_deadline_skips_total",
+    "Work skipped or aborted because the request deadline was near",
+    ("endpoint", "stage"),
+)
+
+
+class DeadlineExceeded(RuntimeError):
+    """Not enough of the request's time budget left for a stage"""
+
+    def __init__(self, stage: str):
+        # args hold only the stage so the error pickles across processes
+        super().__init__(stage)
+        self.stage = stage
+
+    def __str__(self) -> str:
+        return f"Request deadline exceeded before {self.stage} could finish"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"error": "Deadline exceeded", "message": str(self)}
+
+
+class Deadline:
+    """Absolute expiry on the monotonic clock (shared by all processes)"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def endpoint_budget(endpoint: Optional[str]) -> float:
+    """Deadline in seconds for an endpoint"""
+    return Config.REQUEST_DEADLINES.get(endpoint or "", Config.REQUEST_DEADLINE)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left for the current request (None without a deadline)"""
+    deadline = current_deadline.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def expires_at() -> Optional[float]:
+    """time.monotonic() value at which the current request expires"""
+    deadline = current_deadline.get()
+    return deadline.expires_at if deadline is not None else None
+
+
+def allows(seconds: float) -> bool:
+    """Whether work expected to take seconds can finish in time"""
+    left = remaining()
+    return left is None or left >= seconds
+
+
+def skip(stage: str) -> None:
+    """Record that stage was skipped to meet the deadline"""
+    DEADLINE_SKIPS.inc(endpoint=current_endpoint.get(), stage=stage)
+    print(f"[DEADLINE] Skipping {stage} ({remaining() or 0:.1f}s left)")
+
+
+def exceeded(stage: str) -> DeadlineExceeded:
+    """DeadlineExceeded for stage, counted in the skip metric"""
+    DEADLINE_SKIPS.inc(endpoint=current_endpoint.get(), stage=stage)
+    return DeadlineExceeded(stage)
+
+
+def check(stage: str, needed: float = 0.0) -> None:
+    """
+    Raises:
+        DeadlineExceeded: less than needed seconds are left
+    """
+    left = remaining()
+    if left is not None and left <= needed:
+        raise exceeded(stage)
+
+
+def check_expiry(expiry: Optional[float], stage: str) -> None:
+    """check() for code running outside the request context (process pools)"""
+    if expiry is not None and time.monotonic() >= expiry:
+        raise DeadlineExceeded(stage)
+
+
+def init_app(app) -> None:
+    """
+    Start each request's deadline and render DeadlineExceeded as 503
+
+    Register before admission control so queueing time counts.
+    """
+    from flask import g, jsonify, request
+
+    @app.before_request
+    def _start_deadline():
+        g._deadline_token = current_deadline.set(Deadline(endpoint_budget(request.endpoint)))
+
+    @app.teardown_request
+    def _clear_deadline(exc):
+        token = g.pop("_deadline_token", None)
+        if token is not None:
+            current_deadline.reset(token)
+
+    @app.errorhandler(DeadlineExceeded)
+    def _deadline_exceeded(error: DeadlineExceeded):
+        return jsonify(error.to_dict()), 503
@@ -0,0 +1,117 @@
+"""
+Shared executor for CPU-bound PDF extraction
+
+pdfminer is pure Python, so extracting several PDFs on threads of one
+process serializes on the GIL. With PDF_EXECUTOR=process, extraction
+runs in a per-worker process pool instead; "thread" trades parallelism
+for lower overhead.
+
+Pool processes are started by a forkserver (spawn where unavailable),
+not forked from the worker: a gthread worker has request and executor
+threads whose locks a fork would copy mid-use, and a forked child would
+also carry the worker's heap. The forkserver preloads the extraction
+module once, so each pool process starts from its small, already
+imported image; after PDF_EXECUTOR_MAX_TASKS extractions a process is
+replaced, returning the memory pdfplumber fragmented. The pool is
+created in each worker right after fork (gunicorn post_fork, ASGI
+lifespan startup), or on first use elsewhere, never in a preloading
+gunicorn master.
+"""
+import contextlib
+import contextvars
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, ContextManager, Optional
+
+from app.config import Config
+from app.utils.metrics import stage_timer
+
+_pdf_executor: Optional[Executor] = None
+_lock = threading.Lock()
+
+# Imported once by the forkserver and inherited by every pool process
+_FORKSERVER_PRELOAD = ["app.services.pdf_service"]
+
+
+def uses_process_pool() -> bool:
+    return Config.PDF_EXECUTOR == "process"
+
+
+def _process_context() -> multiprocessing.context.BaseContext:
+    """Start method for pool processes: forkserver, else spawn (never fork)"""
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(_FORKSERVER_PRELOAD)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def pdf_executor() -> Executor:
+    """The process-wide PDF executor, created on first use"""
+    global _pdf_executor
+    with _lock:
+        if _pdf_executor is None:
+            if uses_process_pool():
+                _pdf_executor = ProcessPoolExecutor(
+                    max_workers=Config.PDF_EXECUTOR_WORKERS,
+                    mp_context=_process_context(),
+                    # Replace processes bloated by pdfplumber (0 = never)
+                    max_tasks_per_child=Config.PDF_EXECUTOR_MAX_TASKS or None,
+                )
+            else:
+                _pdf_executor = ThreadPoolExecutor(
+                    max_workers=Config.PDF_EXECUTOR_WORKERS, thread_name_prefix="pdf"
+                )
+        return _pdf_executor
+
+
+def start_pdf_executor() -> None:
+    """
+    Create the PDF executor (and start the forkserver) ahead of requests,
+    while the worker has no other threads yet
+    """
+    executor = pdf_executor()
+    if isinstance(executor, ProcessPoolExecutor) and "forkserver" in multiprocessing.get_all_start_methods():
+        from multiprocessing import forkserver
+
+        forkserver.ensure_running()
+
+
+def submit_pdf_task(func: Callable[..., Any], *args) -> Future:
+    """
+    Submit func(*args) to the PDF executor
+
+    On the thread pool the task runs in a copy of the caller's context,
+    so its stage timings are attributed to the current request; process
+    pool tasks need picklable module-level callables.
+    """
+    if uses_process_pool():
+        return pdf_executor().submit(func, *args)
+    return pdf_executor().submit(contextvars.copy_context().run, func, *args)
+
+
+def pdf_offload_timer() -> ContextManager[None]:
+    """
+    Stage timer for waiting on PDF tasks
+
+    Metrics recorded in child processes are not visible to this one,
+    so process pool offloads are timed from the caller's side.
+    """
+    if uses_process_pool():
+        return stage_timer("pdf_extract")
+    return contextlib.nullcontext()
+
+
+def shutdown_pdf_executor(wait: bool = False) -> None:
+    global _pdf_executor
+    with _lock:
+        if _pdf_executor is not None:
+            _pdf_executor.shutdown(wait=wait)
+            _pdf_executor = None
+
+
+def reset_pdf_executor() -> None:
+    """Forget a pool inherited across fork (its workers belong to the parent)"""
+    global _pdf_executor
+    _pdf_executor = None
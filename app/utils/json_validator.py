@@ -3,7 +3,12 @@ JSON validation utilities for AI responses
 """
 import json
 import re
-from typing import Dict, Any, Optional
+from functools import lru_cache
+from typing import Dict, Any, Optional, Type, TypeVar
+
+from pydantic import TypeAdapter, ValidationError
+
+T = TypeVar("T")
 
 
 class JSONValidationError(Exception):
@@ -11,6 +16,11 @@ class JSONValidationError(Exception):
     pass
 
 
+class SchemaValidationError(JSONValidationError):
+    """JSON is well-formed but does not match the expected schema"""
+    pass
+
+
 def extract_json_from_text(text: str) -> str:
     """
     Extract JSON from text that may contain markdown or other formatting
@@ -24,15 +34,18 @@ def extract_json_from_text(text: str) -> str:
     Raises:
         JSONValidationError: If no valid JSON found
     """
-    # Remove markdown code blocks
-    text = re.sub(r'```json\s*', '', text)
-    text = re.sub(r'```\s*', '', text)
-    
-    # Try to find JSON object boundaries
-    json_match = re.search(r'\{.*\}', text, re.DOTALL)
-    if json_match:
-        return json_match.group(0)
-    
+    # Remove markdown code blocks (skipped for the usual bare-JSON reply)
+    if "```" in text:
+        text = re.sub(r'```json\s*', '', text)
+        text = re.sub(r'```\s*', '', text)
+
+    # Slice from the first '{' to the last '}' (same span as a greedy
+    # r'\{.*\}' search, without scanning the text with a regex)
+    start = text.find("{")
+    end = text.rfind("}")
+    if start != -1 and end > start:
+        return text[start:end + 1]
+
     # If no match, return original text
     return text.strip()
 
@@ -90,3 +103,49 @@ def validate_json_structure(data: Dict[str, Any], required_keys: list) -> bool:
         raise JSONValidationError(f"Missing required keys: {', '.join(missing_keys)}")
     return True
 
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema: Type[T]) -> TypeAdapter:
+    """
+    Cached TypeAdapter for a schema
+
+    Building an adapter compiles the pydantic-core validator and
+    serializer, so it is done once per schema rather than per request.
+    """
+    return TypeAdapter(schema)
+
+
+def parse_json_as(text: str, schema: Type[T]) -> T:
+    """
+    Parse and validate LLM text into a schema in a single pass
+
+    The JSON is validated by pydantic-core directly from the string,
+    without building an intermediate dict.
+
+    Args:
+        text: Raw LLM response (may contain markdown)
+        schema: Pydantic model (or any type) to validate against
+
+    Returns:
+        Validated instance of schema
+
+    Raises:
+        JSONValidationError: If the text is not valid JSON
+        SchemaValidationError: If the JSON does not match the schema
+    """
+    if not text:
+        raise JSONValidationError("Empty JSON string provided")
+
+    json_str = extract_json_from_text(text)
+
+    try:
+        return type_adapter(schema).validate_json(json_str)
+    except ValidationError as e:
+        errors = e.errors(include_url=False)
+        if any(error["type"] == "json_invalid" for error in errors):
+            raise JSONValidationError(f"Invalid JSON format: {errors[0]['msg']}")
+        raise SchemaValidationError(
+            f"Response does not match {getattr(schema, '__name__', schema)}: "
+            f"{e.error_count()} error(s), first: {errors[0]['loc']} {errors[0]['msg']}"
+        )
@@ -0,0 +1,270 @@
+"""
+Per-request memory accounting and worker recycling
+
+Every request records its peak RSS growth into the metrics, and the
+pipeline stages (stage_timer) of a sample of requests
+(MEMORY_STAGE_SAMPLE_RATE) their RSS growth. RSS is per process, so
+with threaded workers a request's figure includes what concurrent
+requests allocated meanwhile; the peak also uses the kernel's lifetime
+high-water mark (ru_maxrss), so short spikes between samples are seen.
+
+A sample of requests (MEMORY_TRACEMALLOC_SAMPLE_RATE) is also traced
+with tracemalloc, and the source lines that allocated the most during
+the request and each of its stages are counted per endpoint and stage.
+
+Freed memory is rarely returned to the OS (pdfplumber's in particular),
+so once a worker's RSS crosses MEMORY_HIGH_WATER_MB after a request, it
+sends itself SIGTERM: gunicorn stops accepting connections on it, lets
+its in-flight requests finish (graceful_timeout) and starts a fresh
+worker, instead of the kernel OOM-killing it mid-request. Recycling is
+only enabled in gunicorn workers (gunicorn.conf.py post_fork), where a
+master replaces the process.
+"""
+import os
+import random
+import resource
+import signal
+import sys
+import sysconfig
+import threading
+import tracemalloc
+from contextvars import ContextVar, Token
+from typing import List, Optional, Tuple
+
+from app.config import Config
+
+MB = 1024 * 1024
+
+# Frames of the allocation tracebacks; the allocating line is enough
+_TRACE_FRAMES = 1
+
+_TRACE_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    """Lifetime peak RSS of this process"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# -----------------------
+# tracemalloc sampling
+# -----------------------
+_trace_lock = threading.Lock()
+_traced_requests = 0
+
+
+def _start_tracing() -> None:
+    global _traced_requests
+    with _trace_lock:
+        if _traced_requests == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(_TRACE_FRAMES)
+        _traced_requests += 1
+
+
+def _stop_tracing() -> None:
+    global _traced_requests
+    with _trace_lock:
+        _traced_requests -= 1
+        if _traced_requests == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces(_TRACE_FILTERS)
+
+
+def _top_allocations(before: tracemalloc.Snapshot, limit: int) -> List[Tuple[str, int]]:
+    """(file:line, bytes) of the lines whose allocations grew most since before"""
+    stats = _snapshot().compare_to(before, "lineno")
+    top = []
+    for stat in stats[:limit]:
+        if stat.size_diff <= 0:
+            break
+        frame = stat.traceback[0]
+        top.append((f"{_short_path(frame.filename)}:{frame.lineno}", stat.size_diff))
+    return top
+
+
+_LABEL_ROOTS = (
+    str(Config.BASE_DIR) + os.sep,
+    "site-packages" + os.sep,
+    sysconfig.get_paths()["stdlib"] + os.sep,
+)
+
+
+def _short_path(filename: str) -> str:
+    """Path relative to the project, site-packages or stdlib, for metric labels"""
+    for root in _LABEL_ROOTS:
+        index = filename.find(root)
+        if index >= 0:
+            return filename[index + len(root):]
+    return filename
+
+
+# -----------------------
+# Request accounting
+# -----------------------
+StageMark = Tuple[int, Optional[tracemalloc.Snapshot]]
+
+
+class RequestMemory:
+    """RSS (and, when sampled, tracemalloc) accounting for one request"""
+
+    def __init__(self, traced: bool = False, stages: bool = False) -> None:
+        self.traced = traced
+        # Whether stages record their RSS growth (always when traced)
+        self.stages = stages or traced
+        self.start_rss = current_rss_bytes()
+        self.start_peak = peak_rss_bytes()
+        self.peak = self.start_rss
+        # (stage or "request", location, bytes) of traced requests
+        self.allocations: List[Tuple[str, str, int]] = []
+        self._lock = threading.Lock()
+        self._snapshot = None
+        if traced:
+            _start_tracing()
+            self._snapshot = _snapshot()
+
+    def sample(self) -> int:
+        rss = current_rss_bytes()
+        with self._lock:
+            if rss > self.peak:
+                self.peak = rss
+        return rss
+
+    def enter_stage(self) -> StageMark:
+        return self.sample(), (_snapshot() if self.traced else None)
+
+    def exit_stage(self, stage: str, mark: StageMark) -> int:
+        """RSS growth of the stage since enter_stage (bytes, >= 0)"""
+        rss_before, snapshot = mark
+        growth = max(0, self.sample() - rss_before)
+        if snapshot is not None:
+            top = _top_allocations(snapshot, Config.MEMORY_TRACEMALLOC_TOP)
+            with self._lock:
+                self.allocations.extend((stage, location, size) for location, size in top)
+        return growth
+
+    def finish(self) -> int:
+        """Peak RSS growth over the request (bytes, >= 0)"""
+        self.sample()
+        peak = peak_rss_bytes()
+        if peak > self.start_peak:
+            # A new lifetime peak was reached during the request
+            self.peak = max(self.peak, peak)
+        if self.traced:
+            try:
+                top = _top_allocations(self._snapshot, Config.MEMORY_TRACEMALLOC_TOP)
+                self.allocations.extend(("request", location, size) for location, size in top)
+            finally:
+                self._snapshot = None
+                _stop_tracing()
+        return max(0, self.peak - self.start_rss)
+
+
+# Accounting of the request being served (None when disabled)
+current_memory: ContextVar[Optional[RequestMemory]] = ContextVar("current_memory", default=None)
+
+
+def begin_request() -> Optional[Token]:
+    """Start accounting the current request"""
+    if not Config.MEMORY_ACCOUNTING_ENABLED:
+        return None
+    rate = Config.MEMORY_TRACEMALLOC_SAMPLE_RATE
+    traced = rate > 0 and random.random() < rate
+    stage_rate = Config.MEMORY_STAGE_SAMPLE_RATE
+    stages = stage_rate > 0 and random.random() < stage_rate
+    return current_memory.set(RequestMemory(traced, stages))
+
+
+def end_request(token: Optional[Token], endpoint: str) -> None:
+    """Record the current request's memory metrics and check the high-water mark"""
+    if token is None:
+        return
+    tracker = current_memory.get()
+    current_memory.reset(token)
+    if tracker is None:
+        return
+
+    from app.utils.metrics import MEMORY_ALLOCATIONS, PROCESS_RSS, REQUEST_RSS_GROWTH
+
+    REQUEST_RSS_GROWTH.observe(tracker.finish(), endpoint=endpoint)
+    for stage, location, size in tracker.allocations:
+        MEMORY_ALLOCATIONS.inc(size, endpoint=endpoint, stage=stage, location=location)
+    rss = current_rss_bytes()
+    PROCESS_RSS.set(rss)
+    check_high_water(rss)
+
+
+# -----------------------
+# Worker recycling
+# -----------------------
+_recycling_enabled = False
+_recycle_requested = False
+
+
+def enable_recycling() -> None:
+    """Allow this process to recycle itself (called in gunicorn workers)"""
+    global _recycling_enabled, _recycle_requested
+    _recycling_enabled = True
+    _recycle_requested = False
+
+
+def check_high_water(rss: Optional[int] = None) -> bool:
+    """
+    Ask for a graceful restart of this worker if its RSS is above
+    MEMORY_HIGH_WATER_MB; True once a restart has been requested
+    """
+    global _recycle_requested
+    limit = Config.MEMORY_HIGH_WATER_MB * MB
+    if _recycle_requested or not _recycling_enabled or limit <= 0:
+        return _recycle_requested
+    rss = current_rss_bytes() if rss is None else rss
+    if rss < limit:
+        return False
+
+    _recycle_requested = True
+    print(
+        f"[MEMORY] Worker {os.getpid()} RSS {rss / MB:.0f} MB is above "
+        f"{Config.MEMORY_HIGH_WATER_MB} MB; recycling after in-flight requests"
+    )
+    # Gunicorn workers (gthread and uvicorn) stop accepting and drain on SIGTERM
+    os.kill(os.getpid(), signal.SIGTERM)
+    return True
+
+
+def init_app(app) -> None:
+    """
+    Register per-request memory accounting hooks
+    """
+    if not app.config.get("MEMORY_ACCOUNTING_ENABLED", True):
+        return
+
+    from flask import g, request
+
+    @app.before_request
+    def _memory_before_request():
+        g._memory_token = begin_request()
+
+    @app.teardown_request
+    def _memory_teardown_request(exc):
+        token = g.pop("_memory_token", None)
+        if token is not None:
+            end_request(token, request.endpoint or "unknown")
@@ -0,0 +1,410 @@
+"""
+Lightweight Prometheus-style metrics for StudyGenie AI Backend
+
+Metrics live in-process, so each gunicorn worker exposes its own
+series; scrape every worker (or sum on the Prometheus side).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.utils.memory import current_memory
+from app.utils.profiling import current_trace
+
+# Endpoint of the request currently being served (used as a label)
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="none")
+
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0,
+)
+
+# RSS growth: 1 MB to 512 MB
+MEMORY_BUCKETS = tuple(float(mb << 20) for mb in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512))
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Common label handling for all metric types"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelKey:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def count(self, **labels: str) -> float:
+        row = self._values.get(self._key(labels))
+        return sum(row[:-1]) if row else 0.0
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (float("inf"),), row[:-1]):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} "
+                    f"{_format_value(cumulative)}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(row[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# -----------------------
+# Application metrics
+# -----------------------
+REQUESTS_TOTAL = REGISTRY.counter(
+    "studygenie_http_requests_total",
+    "HTTP requests served",
+    ("endpoint", "method", "status"),
+)
+REQUEST_DURATION = REGISTRY.histogram(
+    "studygenie_http_request_duration_seconds",
+    "End-to-end HTTP request latency",
+    ("endpoint",),
+)
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    "studygenie_http_requests_in_flight",
+    "Requests currently being processed",
+    ("endpoint",),
+)
+STAGE_DURATION = REGISTRY.histogram(
+    "studygenie_stage_duration_seconds",
+    "Latency of each pipeline stage",
+    ("endpoint", "stage", "model"),
+)
+LLM_RETRIES = REGISTRY.counter(
+    "studygenie_llm_retries_total",
+    "LLM generation retries after a failed attempt",
+    ("endpoint", "model"),
+)
+LLM_REPAIRS = REGISTRY.counter(
+    "studygenie_llm_json_repairs_total",
+    "JSON repair calls and their outcome",
+    ("endpoint", "model", "outcome"),
+)
+LLM_TRUNCATIONS = REGISTRY.counter(
+    "studygenie_llm_truncations_total",
+    "LLM completions cut off by max_tokens",
+    ("endpoint", "task"),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "studygenie_llm_tokens_total",
+    "LLM tokens consumed",
+    ("endpoint", "model", "type"),
+)
+LLM_HEDGES = REGISTRY.counter(
+    "studygenie_llm_hedges_total",
+    "Hedged LLM requests (fired, won, budget_exhausted)",
+    ("model", "outcome"),
+)
+LLM_FALLBACKS = REGISTRY.counter(
+    "studygenie_llm_fallbacks_total",
+    "LLM calls routed to a fallback model by an open circuit",
+    ("model",),
+)
+LLM_CIRCUIT_STATE = REGISTRY.gauge(
+    "studygenie_llm_circuit_state",
+    "Circuit breaker state per model (0 closed, 1 half-open, 2 open)",
+    ("model",),
+)
+LLM_BACKEND_CALLS = REGISTRY.counter(
+    "studygenie_llm_backend_calls_total",
+    "LLM calls per pooled backend (ok, error, rate_limited, rejected)",
+    ("backend", "outcome"),
+)
+LLM_BACKEND_STATE = REGISTRY.gauge(
+    "studygenie_llm_backend_state",
+    "Pooled backend state (0 healthy, 1 probing, 2 ejected)",
+    ("backend",),
+)
+LLM_BACKEND_LATENCY = REGISTRY.gauge(
+    "studygenie_llm_backend_latency_seconds",
+    "EWMA latency of successful calls per pooled backend",
+    ("backend",),
+)
+REQUEST_RSS_GROWTH = REGISTRY.histogram(
+    "studygenie_request_rss_growth_bytes",
+    "Peak RSS growth of the worker process during a request",
+    ("endpoint",),
+    MEMORY_BUCKETS,
+)
+STAGE_RSS_GROWTH = REGISTRY.histogram(
+    "studygenie_stage_rss_growth_bytes",
+    "RSS growth of the worker process during a pipeline stage",
+    ("endpoint", "stage"),
+    MEMORY_BUCKETS,
+)
+PROCESS_RSS = REGISTRY.gauge(
+    "studygenie_process_rss_bytes",
+    "Resident set size of the worker process after its last request",
+)
+MEMORY_ALLOCATIONS = REGISTRY.counter(
+    "studygenie_memory_allocated_bytes_total",
+    "Bytes still allocated at the end of tracemalloc-sampled requests and stages, by top source line",
+    ("endpoint", "stage", "location"),
+)
+
+
+@contextmanager
+def stage_timer(stage: str, model: Optional[str] = None) -> Iterator[None]:
+    """
+    Time a pipeline stage into the stage latency histogram
+
+    Args:
+        stage: Stage name (e.g. "pdf_extract", "groq_call")
+        model: LLM model name for LLM-backed stages
+    """
+    memory = current_memory.get()
+    if memory is not None and not memory.stages:
+        memory = None
+    mark = memory.enter_stage() if memory is not None else None
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if memory is not None:
+            STAGE_RSS_GROWTH.observe(
+                memory.exit_stage(stage, mark), endpoint=current_endpoint.get(), stage=stage
+            )
+        STAGE_DURATION.observe(
+            elapsed,
+            endpoint=current_endpoint.get(),
+            stage=stage,
+            model=model or "none",
+        )
+        trace = current_trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+
+
+def record_token_usage(model: str, usage) -> None:
+    """
+    Record token usage from an LLM completion's usage object
+    """
+    if usage is None:
+        return
+    endpoint = current_endpoint.get()
+    prompt_tokens = getattr(usage, "prompt_tokens", None) or 0
+    completion_tokens = getattr(usage, "completion_tokens", None) or 0
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, endpoint=endpoint, model=model, type="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, endpoint=endpoint, model=model, type="completion")
+
+
+def init_app(app) -> None:
+    """
+    Register request instrumentation and the /metrics endpoint
+    """
+    from flask import Response, g, request
+
+    @app.before_request
+    def _metrics_before_request():
+        endpoint = request.endpoint or "unknown"
+        g._metrics_start = time.perf_counter()
+        g._metrics_endpoint = endpoint
+        g._metrics_token = current_endpoint.set(endpoint)
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+
+    @app.after_request
+    def _metrics_after_request(response):
+        endpoint = g.get("_metrics_endpoint")
+        if endpoint is not None:
+            REQUESTS_TOTAL.inc(
+                endpoint=endpoint,
+                method=request.method,
+                status=str(response.status_code),
+            )
+        return response
+
+    @app.teardown_request
+    def _metrics_teardown_request(exc):
+        endpoint = g.pop("_metrics_endpoint", None)
+        if endpoint is None:
+            return
+        REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
+        REQUEST_DURATION.observe(
+            time.perf_counter() - g.pop("_metrics_start"),
+            endpoint=endpoint,
+        )
+        token = g.pop("_metrics_token", None)
+        if token is not None:
+            current_endpoint.reset(token)
+
+    @app.route("/metrics")
+    def metrics():
+        """Prometheus scrape endpoint"""
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE_LATEST)
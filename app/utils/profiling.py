@@ -0,0 +1,158 @@
+"""
+Opt-in per-request stage timing and cProfile capture
+
+Enabled only when Config.PROFILING_ENABLED is set; a request then opts
+in with the X-Debug-Timing header (stage breakdown + Server-Timing) and
+optionally X-Debug-Profile (cProfile dump to Config.PROFILE_DIR).
+When the flag is off no hooks are registered at all.
+"""
+import cProfile
+import re
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+TIMING_HEADER = "X-Debug-Timing"
+PROFILE_HEADER = "X-Debug-Profile"
+
+_TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+class RequestTrace:
+    """Stage timings collected for one request"""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self._stages: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        # Stages may be recorded from batch worker threads
+        with self._lock:
+            self._stages.append((stage, seconds))
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Aggregate stage timings
+
+        Stages run in parallel batches overlap, so per-stage totals
+        can exceed the wall-clock total.
+        """
+        with self._lock:
+            stages = list(self._stages)
+
+        aggregated: Dict[str, Dict[str, float]] = {}
+        for stage, seconds in stages:
+            entry = aggregated.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            ms = seconds * 1000
+            entry["count"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+
+        for entry in aggregated.values():
+            entry["total_ms"] = round(entry["total_ms"], 2)
+            entry["max_ms"] = round(entry["max_ms"], 2)
+
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 2),
+            "stages": aggregated,
+        }
+
+    def server_timing(self, summary: Optional[Dict[str, Any]] = None) -> str:
+        """Format the trace as a Server-Timing header value"""
+        summary = summary or self.summary()
+        parts = [
+            f'{stage};dur={entry["total_ms"]};desc="x{int(entry["count"])}"'
+            for stage, entry in summary["stages"].items()
+        ]
+        parts.append(f'total;dur={summary["total_ms"]}')
+        return ", ".join(parts)
+
+
+# Trace for the current request (None unless debug timing was requested)
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def _header_enabled(value: Optional[str]) -> bool:
+    return bool(value) and value.strip().lower() in _TRUE_VALUES
+
+
+def _profile_path(profile_dir: Path, endpoint: str) -> Path:
+    safe_endpoint = re.sub(r"[^A-Za-z0-9_.-]", "_", endpoint or "unknown")
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return profile_dir / f"{stamp}-{int(time.time() * 1000) % 1000:03d}-{safe_endpoint}.pstats"
+
+
+def init_app(app) -> None:
+    """
+    Register debug timing hooks when profiling is enabled in config
+    """
+    if not app.config.get("PROFILING_ENABLED"):
+        return
+
+    from flask import g, request
+
+    from app.utils.compression import replace_body
+
+    profile_dir = Path(app.config.get("PROFILE_DIR") or "profiles")
+
+    @app.before_request
+    def _profiling_before_request():
+        if not _header_enabled(request.headers.get(TIMING_HEADER)) and not _header_enabled(
+            request.headers.get(PROFILE_HEADER)
+        ):
+            return
+
+        trace = RequestTrace()
+        g._debug_trace = trace
+        g._debug_trace_token = current_trace.set(trace)
+
+        if _header_enabled(request.headers.get(PROFILE_HEADER)):
+            profiler = cProfile.Profile()
+            g._debug_profiler = profiler
+            profiler.enable()
+
+    @app.after_request
+    def _profiling_after_request(response):
+        trace = g.get("_debug_trace")
+        if trace is None:
+            return response
+
+        profiler = g.pop("_debug_profiler", None)
+        profile_file = None
+        if profiler is not None:
+            profiler.disable()
+            try:
+                profile_dir.mkdir(parents=True, exist_ok=True)
+                profile_file = _profile_path(profile_dir, request.endpoint)
+                profiler.dump_stats(str(profile_file))
+            except OSError as e:
+                print(f"[Profiling warning] Could not write profile: {e}")
+                profile_file = None
+
+        summary = trace.summary()
+        if profile_file is not None:
+            summary["profile_file"] = str(profile_file)
+
+        response.headers["Server-Timing"] = trace.server_timing(summary)
+
+        # Attach the breakdown to JSON object bodies
+        if response.is_json and not response.direct_passthrough:
+            payload = response.get_json(silent=True)
+            if isinstance(payload, dict):
+                payload["debug_timing"] = summary
+                replace_body(response, app.json.dumps(payload))
+
+        return response
+
+    @app.teardown_request
+    def _profiling_teardown_request(exc):
+        profiler = g.pop("_debug_profiler", None)
+        if profiler is not None:
+            profiler.disable()
+        token = g.pop("_debug_trace_token", None)
+        g.pop("_debug_trace", None)
+        if token is not None:
+            current_trace.reset(token)
@@ -0,0 +1,63 @@
+"""
+In-process LRU caches for results keyed by upload content hash
+
+Per worker process; entries expire after a TTL and the least recently
+used entry is evicted once the cache is full.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from app.config import Config
+
+
+class LRUCache:
+    """Thread-safe LRU cache with optional TTL"""
+
+    def __init__(self, max_entries: int, ttl: float = 0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# Cleaned PDF text by upload SHA-256 (skips pdfplumber on re-uploads)
+extracted_text_cache = LRUCache(Config.TEXT_CACHE_MAX_ENTRIES, Config.RESULT_CACHE_TTL)
+
+# Serialized study sets (EncodedPayload) by (SHA-256, quiz count, interview count)
+study_set_cache = LRUCache(Config.RESULT_CACHE_MAX_ENTRIES, Config.RESULT_CACHE_TTL)
@@ -0,0 +1,91 @@
+"""
+Fast JSON serialization for API responses
+
+Pydantic models are serialized by pydantic-core straight to bytes;
+plain dicts go through orjson when it is installed (falling back to the
+standard library). Installed as the Flask JSON provider, so jsonify()
+accepts schema models directly.
+"""
+import json
+from typing import Any, Dict, Optional
+
+from flask.json.provider import DefaultJSONProvider
+from pydantic import BaseModel
+
+from app.utils.json_validator import type_adapter
+from app.utils.metrics import stage_timer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    return DefaultJSONProvider.default(obj)
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    Serialize a response payload to UTF-8 JSON bytes
+
+    Args:
+        obj: Pydantic model, or JSON-compatible data (which may contain models)
+
+    Returns:
+        Encoded JSON
+    """
+    with stage_timer("serialize"):
+        if isinstance(obj, BaseModel):
+            return type_adapter(type(obj)).dump_json(obj)
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(obj, default=_default, ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _orjson_option(kwargs: Dict[str, Any]) -> Optional[int]:
+    """orjson option equivalent to json.dumps kwargs, or None if there is none"""
+    if orjson is None or set(kwargs) - {"sort_keys", "indent"} or kwargs.get("indent") not in (None, 2):
+        return None
+    option = orjson.OPT_NON_STR_KEYS
+    if kwargs.get("sort_keys"):
+        option |= orjson.OPT_SORT_KEYS
+    if kwargs.get("indent") == 2:
+        option |= orjson.OPT_INDENT_2
+    return option
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by pydantic-core / orjson
+
+    Keys keep their insertion order and non-ASCII text is emitted as
+    UTF-8, unless a caller passes json.dumps arguments: sort_keys and
+    indent=2 map to orjson options, anything else (or a model) goes
+    through the standard library with those arguments.
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not kwargs:
+            return dumps(obj).decode("utf-8")
+        option = _orjson_option(kwargs)
+        if option is not None and not isinstance(obj, BaseModel):
+            return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+        kwargs.setdefault("default", _default)
+        kwargs.setdefault("ensure_ascii", False)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return json.loads(s, **kwargs) if kwargs else loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj), mimetype=self.mimetype)
@@ -0,0 +1,171 @@
+"""
+Near-duplicate detection utilities (word shingles + MinHash) and
+topic name similarity
+"""
+import re
+import zlib
+from typing import Iterable, List, Set, Tuple
+
+# Large Mersenne prime for universal hashing
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+# Words that do not distinguish one topic name from another
+_TOPIC_STOPWORDS = frozenset({
+    "a", "an", "and", "the", "of", "to", "in", "on", "for", "with",
+    "intro", "introduction", "basics", "fundamentals", "overview",
+})
+
+
+def _hash_params(num_perm: int) -> List[Tuple[int, int]]:
+    """Deterministic (a, b) pairs for the MinHash permutations"""
+    params = []
+    for i in range(num_perm):
+        a = zlib.crc32(f"a{i}".encode()) | 1
+        b = zlib.crc32(f"b{i}".encode())
+        params.append((a, b))
+    return params
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """
+    Build the set of word shingles for a piece of text
+
+    Args:
+        text: Text to shingle
+        size: Number of words per shingle
+
+    Returns:
+        Set of normalized shingles
+    """
+    words = _WORD_RE.findall((text or "").lower())
+    if not words:
+        return set()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    """Compute MinHash signatures for shingle sets"""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 3):
+        """
+        Initialize MinHasher
+
+        Args:
+            num_perm: Number of hash permutations (signature length)
+            shingle_size: Number of words per shingle
+        """
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._params = _hash_params(num_perm)
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """
+        Compute the MinHash signature of a text
+
+        Args:
+            text: Text to sign
+
+        Returns:
+            Tuple of num_perm minimum hash values
+        """
+        hashed = [zlib.crc32(s.encode()) for s in shingles(text, self.shingle_size)]
+        if not hashed:
+            return tuple([_MAX_HASH] * self.num_perm)
+
+        return tuple(
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashed)
+            for a, b in self._params
+        )
+
+    @staticmethod
+    def similarity(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Estimate Jaccard similarity from two signatures"""
+        if not sig_a or len(sig_a) != len(sig_b):
+            return 0.0
+        matches = sum(1 for x, y in zip(sig_a, sig_b) if x == y)
+        return matches / len(sig_a)
+
+
+class NearDuplicateFilter:
+    """
+    Incrementally accept texts, rejecting near-duplicates of
+    anything accepted so far
+    """
+
+    def __init__(self, threshold: float = 0.6, num_perm: int = 64, shingle_size: int = 3):
+        """
+        Initialize filter
+
+        Args:
+            threshold: Estimated Jaccard similarity at or above which
+                a text counts as a duplicate
+            num_perm: MinHash signature length
+            shingle_size: Number of words per shingle
+        """
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm=num_perm, shingle_size=shingle_size)
+        self._signatures: List[Tuple[int, ...]] = []
+        self._exact: Set[str] = set()
+
+    def add(self, text: str) -> bool:
+        """
+        Try to add a text
+
+        Returns:
+            True if the text was accepted, False if it is a near-duplicate
+        """
+        key = normalize_text(text)
+        if key in self._exact:
+            return False
+
+        sig = self.hasher.signature(text)
+        for existing in self._signatures:
+            if MinHasher.similarity(sig, existing) >= self.threshold:
+                return False
+
+        self._exact.add(key)
+        self._signatures.append(sig)
+        return True
+
+    def filter(self, texts: Iterable[str]) -> List[bool]:
+        """Add many texts, returning the acceptance flag for each"""
+        return [self.add(t) for t in texts]
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text reduced to its words, for exact comparisons"""
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+def topic_tokens(topic: str) -> Set[str]:
+    """
+    Significant words of a topic name, with plural "s" stripped
+
+    "Introduction to Graphs" and "Graph" both give {"graph"}.
+    """
+    return set(topic_tokens_list(topic))
+
+
+def topic_tokens_list(text: str) -> List[str]:
+    """topic_tokens of a text in order, with repeats"""
+    tokens = []
+    for word in _WORD_RE.findall((text or "").lower()):
+        if word in _TOPIC_STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def topic_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of two topic names' significant words"""
+    tokens_a, tokens_b = topic_tokens(a), topic_tokens(b)
+    if not tokens_a or not tokens_b:
+        return 1.0 if normalize_text(a) == normalize_text(b) else 0.0
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
@@ -0,0 +1,77 @@
+"""
+Startup helpers for preloading servers (gunicorn preload_app)
+
+Heavy dependencies are imported lazily by the code that needs them, so
+a plain import of the app stays fast. When the app is preloaded in the
+gunicorn master, warm_imports() pulls them in once before forking so
+every worker shares the already-imported modules copy-on-write, and
+reset_after_fork() drops state that must not cross a fork.
+"""
+import importlib
+import time
+from typing import Dict
+
+# Modules deferred until first use by the request path
+HEAVY_MODULES = (
+    "pdfplumber",  # PDF extraction (pdfminer)
+    "groq",        # Groq SDK (httpx, anyio)
+)
+
+
+def warm_imports() -> Dict[str, float]:
+    """
+    Import heavy modules and build schema validators ahead of requests
+
+    Returns:
+        Seconds spent per step
+    """
+    timings = {}
+    for name in HEAVY_MODULES:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"[Startup warning] Could not preload {name}: {e}")
+        timings[name] = time.perf_counter() - start
+
+    # Compile pydantic-core validators/serializers for the response schemas
+    from app.schemas.quiz_schema import QuizResponse
+    from app.schemas.study_set_schema import (
+        StudySetResponse,
+        StudySetBatchResponse,
+        CourseStudySetResponse,
+    )
+    from app.utils.json_validator import type_adapter
+
+    start = time.perf_counter()
+    for schema in (StudySetResponse, StudySetBatchResponse, CourseStudySetResponse, QuizResponse):
+        type_adapter(schema)
+    timings["schemas"] = time.perf_counter() - start
+    return timings
+
+
+def reset_after_fork() -> None:
+    """
+    Re-initialize per-process state in a freshly forked worker
+    """
+    from app.services import llm_resilience
+    from app.services.llm_providers import reset_provider
+    from app.utils.challenge_library import challenge_library
+    from app.utils.executors import reset_pdf_executor
+    from app.utils.study_set_store import study_set_store
+    from app.utils.usage_ledger import usage_ledger
+
+    # The LLM client owns an HTTP connection pool and possibly open
+    # transcript files; each worker builds its own on first use
+    reset_provider()
+    llm_resilience.reset()
+
+    # As does the PDF extraction pool (its processes are the parent's)
+    reset_pdf_executor()
+
+    # SQLite connections must not be shared across processes
+    study_set_store.reset()
+    challenge_library.reset()
+
+    # Usage aggregated in the master is flushed by the master
+    usage_ledger.reset()
@@ -0,0 +1,254 @@
+"""
+Persistent store of generated study sets (SQLite)
+
+Every study set served by the upload routes is saved under an id (the
+content hash of its JSON body, which is also its ETag), so clients can
+fetch it again with GET /api/study-sets/<id> instead of re-running the
+LLM.
+
+Storage format: each top-level field of the JSON object is compressed
+separately (zstd when installed, zlib otherwise) and stored as its own
+row. A projection (?fields=quiz) decompresses only the fields asked for,
+and responses are spliced together from the decompressed field JSON
+without parsing it.
+
+Disk usage is bounded by STUDY_SET_STORE_MAX_BYTES of compressed data;
+the least recently accessed sets are evicted first and the freed pages
+are returned to the filesystem (incremental auto-vacuum). The database
+runs in WAL mode so several gunicorn workers can share it.
+"""
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import Config
+from app.utils.compression import EncodedPayload
+from app.utils.metrics import stage_timer
+from app.utils.serialization import dumps, loads
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional codec
+    zstandard = None
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS study_sets (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS study_sets_accessed ON study_sets (accessed_at);
+CREATE TABLE IF NOT EXISTS study_set_fields (
+    set_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (set_id, name)
+);
+"""
+
+
+class UnknownFieldsError(KeyError):
+    """Projection names fields the stored study set does not have"""
+
+    def __init__(self, unknown: List[str], available: List[str]):
+        super().__init__(", ".join(unknown))
+        self.unknown = unknown
+        self.available = available
+
+
+def default_codec() -> str:
+    codec = Config.STUDY_SET_STORE_CODEC
+    if codec == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    return codec
+
+
+def encode_field(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=Config.ZSTD_LEVEL).compress(data)
+    if codec == "zlib":
+        return zlib.compress(data, Config.STUDY_SET_STORE_ZLIB_LEVEL)
+    if codec == "raw":
+        return data
+    raise ValueError(f"Unsupported study set codec '{codec}'")
+
+
+def decode_field(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "raw":
+        return data
+    raise ValueError(f"Unsupported study set codec '{codec}'")
+
+
+class StudySetStore:
+    """
+    SQLite-backed, size-bounded LRU store of serialized study sets
+
+    One connection per thread; connections are opened lazily.
+    """
+
+    def __init__(self, path: Path, max_bytes: int, codec: Optional[str] = None):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.codec = codec or default_codec()
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # -----------------------
+    # Connections
+    # -----------------------
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._init_lock:
+                if not self._initialized:
+                    # auto_vacuum only takes effect before the first table exists
+                    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+            self._local.conn = conn
+        return conn
+
+    def reset(self) -> None:
+        """Drop connections inherited across fork"""
+        self._local = threading.local()
+
+    # -----------------------
+    # Public API
+    # -----------------------
+    def put(self, payload: EncodedPayload, kind: str = "study_set") -> str:
+        """
+        Save a serialized study set (a JSON object)
+
+        Returns:
+            The study set id (its content hash)
+
+        Raises:
+            ValueError: not a JSON object, or larger than max_bytes
+        """
+        set_id = payload.hash
+        now = time.time()
+        conn = self._connection()
+        with stage_timer("store_write"):
+            touched = conn.execute(
+                "UPDATE study_sets SET accessed_at = ? WHERE id = ?", (now, set_id)
+            ).rowcount
+            if touched:
+                return set_id
+
+            document = loads(payload.body)
+            if not isinstance(document, dict):
+                raise ValueError("Only JSON objects can be stored")
+            rows = []
+            for position, (name, value) in enumerate(document.items()):
+                rows.append((set_id, position, name, self.codec, encode_field(dumps(value), self.codec)))
+            size = sum(len(row[4]) for row in rows)
+            if size > self.max_bytes:
+                # Would evict everything else and then itself
+                raise ValueError(f"Study set of {size} bytes exceeds the store size limit")
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO study_sets (id, kind, created_at, accessed_at, size) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (set_id, kind, now, now, size)
+                )
+                conn.execute("DELETE FROM study_set_fields WHERE set_id = ?", (set_id,))
+                conn.executemany(
+                    "INSERT INTO study_set_fields (set_id, position, name, codec, data) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                evicted = self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            if evicted:
+                conn.execute("PRAGMA incremental_vacuum")
+        return set_id
+
+    def get(self, set_id: str, fields: Optional[List[str]] = None) -> Optional[bytes]:
+        """
+        JSON body of a stored study set, optionally projected to fields
+
+        Returns:
+            The body, or None if the id is unknown (or was evicted)
+
+        Raises:
+            UnknownFieldsError: fields names a missing top-level field
+        """
+        conn = self._connection()
+        with stage_timer("store_read"):
+            touched = conn.execute(
+                "UPDATE study_sets SET accessed_at = ? WHERE id = ?", (time.time(), set_id)
+            ).rowcount
+            if not touched:
+                return None
+
+            rows = conn.execute(
+                "SELECT name, codec, data FROM study_set_fields WHERE set_id = ? ORDER BY position",
+                (set_id,)
+            ).fetchall()
+            if fields:
+                available = [name for name, _, _ in rows]
+                unknown = [name for name in fields if name not in available]
+                if unknown:
+                    raise UnknownFieldsError(unknown, available)
+                rows = [row for row in rows if row[0] in fields]
+
+            parts = [dumps(name) + b":" + decode_field(data, codec) for name, codec, data in rows]
+        return b"{" + b",".join(parts) + b"}"
+
+    def stats(self) -> Dict[str, int]:
+        count, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM study_sets"
+        ).fetchone()
+        return {"study_sets": count, "bytes": size}
+
+    def clear(self) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM study_set_fields")
+        conn.execute("DELETE FROM study_sets")
+        conn.execute("PRAGMA incremental_vacuum")
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Delete least recently accessed sets until under max_bytes"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM study_sets").fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        evicted = 0
+        for set_id, size in conn.execute(
+            "SELECT id, size FROM study_sets ORDER BY accessed_at"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM study_set_fields WHERE set_id = ?", (set_id,))
+            conn.execute("DELETE FROM study_sets WHERE id = ?", (set_id,))
+            total -= size
+            evicted += 1
+        return evicted
+
+
+study_set_store = StudySetStore(Config.STUDY_SET_STORE_PATH, Config.STUDY_SET_STORE_MAX_BYTES)
@@ -0,0 +1,197 @@
+"""
+Synthetic LLM payloads shaped like StudyGenie's JSON outputs
+
+Given a prompt produced by QuizService, infer the task and item counts
+and build a schema-valid response with distinct, deterministic text.
+"""
+import hashlib
+import json
+import random
+import re
+from typing import Any, Dict, List
+
+VOCABULARY = (
+    "algorithm array binary cache class closure compiler concurrency database "
+    "decorator dictionary encapsulation exception function generator graph hash "
+    "heap immutable index inheritance interface iterator kernel lambda latency "
+    "linked list loop memory module mutex network object operator parser pointer "
+    "polymorphism process protocol query queue recursion reference register "
+    "scheduler schema scope semaphore set socket sorting stack string syntax "
+    "thread token transaction tree tuple type variable vector virtual"
+).split()
+
+DIFFICULTIES = ("easy", "medium", "hard")
+
+
+def _rng(prompt: str) -> random.Random:
+    seed = int.from_bytes(hashlib.sha256(prompt.encode()).digest()[:8], "big")
+    return random.Random(seed)
+
+
+def _phrase(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def _question(rng: random.Random) -> str:
+    return f"What best describes {_phrase(rng, rng.randint(6, 10))}?"
+
+
+def _mcq(rng: random.Random, topic: str) -> Dict[str, Any]:
+    correct = rng.randrange(4)
+    return {
+        "question": _question(rng),
+        "options": [
+            {"text": _phrase(rng, 4), "is_correct": i == correct}
+            for i in range(4)
+        ],
+        "explanation": _phrase(rng, 14),
+        "difficulty": rng.choice(DIFFICULTIES),
+        "topic": topic,
+    }
+
+
+def _interview(rng: random.Random, topic: str) -> Dict[str, Any]:
+    return {
+        "question": f"Explain {_phrase(rng, rng.randint(6, 10))}.",
+        "answer": _phrase(rng, 40),
+        "topic": topic,
+        "difficulty": rng.choice(DIFFICULTIES),
+        "follow_up_questions": [_question(rng), _question(rng)],
+    }
+
+
+def _flashcard(rng: random.Random, topic: str) -> Dict[str, Any]:
+    return {
+        "front": _question(rng),
+        "back": _phrase(rng, 20),
+        "difficulty": rng.choice(DIFFICULTIES),
+        "topic": topic,
+    }
+
+
+def _skill_map(rng: random.Random, count: int = 6) -> Dict[str, Any]:
+    items = [
+        {
+            "topic": _phrase(rng, 2).title(),
+            "subtopics": [_phrase(rng, 2) for _ in range(3)],
+            "description": _phrase(rng, 10),
+        }
+        for _ in range(count)
+    ]
+    return {"skill_map": items, "total_topics": count}
+
+
+def _topics(skill_map: Dict[str, Any]) -> List[str]:
+    return [item["topic"] for item in skill_map["skill_map"]]
+
+
+def _int(pattern: str, text: str, default: int) -> int:
+    match = re.search(pattern, text)
+    return int(match.group(1)) if match else default
+
+
+def _topic_name(prompt: str) -> str:
+    match = re.search(r'topic: "([^"]*)"', prompt)
+    return match.group(1) if match else "General"
+
+
+def _repair(prompt: str) -> Dict[str, Any]:
+    """Repair the malformed JSON produced by malformed() in a repair prompt"""
+    broken = prompt.split("INVALID JSON:", 1)[-1].strip()
+    fixed = re.sub(r",\s*([}\]])", r"\1", broken)
+    return json.loads(fixed)
+
+
+def generate_payload(prompt: str) -> Dict[str, Any]:
+    """
+    Build a schema-valid JSON object for a QuizService prompt
+
+    Args:
+        prompt: User prompt sent to the LLM
+
+    Returns:
+        Parsed JSON payload
+    """
+    rng = _rng(prompt)
+
+    if "Fix the following invalid JSON" in prompt:
+        return _repair(prompt)
+
+    # Prompts name their reply type (see prompt_compiler)
+    quiz = _int(r"Generate (\d+) quiz questions", prompt, 5)
+    interview = _int(r"and (\d+) interview questions", prompt, 5)
+
+    if "type StudySetBatchResponse" in prompt:
+        return {
+            "quiz": [_mcq(rng, "Batch") for _ in range(quiz)],
+            "interview_qa": [_interview(rng, "Batch") for _ in range(interview)],
+        }
+
+    if "type StudySetResponse" in prompt:
+        skill_map = _skill_map(rng)
+        topics = _topics(skill_map)
+        return {
+            "skill_map": skill_map,
+            "quiz": {
+                "quiz": [_mcq(rng, rng.choice(topics)) for _ in range(quiz)],
+                "total_questions": quiz,
+            },
+            "interview_qa": {
+                "interview_qa": [_interview(rng, rng.choice(topics)) for _ in range(interview)],
+                "total_questions": interview,
+            },
+        }
+
+    topic = _topic_name(prompt)
+
+    if "type FlashcardResponse" in prompt:
+        count = _int(r"Generate (\d+) flashcards", prompt, 10)
+        return {
+            "flashcards": [_flashcard(rng, topic) for _ in range(count)],
+            "total_cards": count,
+            "topic": topic,
+        }
+
+    if "type CodingChallengeResponse" in prompt:
+        match = re.search(r"Difficulty: (\w+)", prompt)
+        difficulty = match.group(1) if match else rng.choice(DIFFICULTIES)
+        return {
+            "challenge": {
+                "title": _phrase(rng, 3).title(),
+                "description": _phrase(rng, 40),
+                "difficulty": difficulty,
+                "topic": topic,
+                "signature": {
+                    "name": "solve",
+                    "params": [{"name": "data", "type": "list[int]"}],
+                    "returns": "int",
+                },
+                "starter_code": "def solve(data: list[int]) -> int:\n    pass\n",
+                "test_cases": [
+                    {"input": _phrase(rng, 3), "output": _phrase(rng, 2), "explanation": _phrase(rng, 6)}
+                    for _ in range(3)
+                ],
+                "hints": [_phrase(rng, 8) for _ in range(3)],
+                "time_complexity": "O(n)",
+                "space_complexity": "O(1)",
+                "xp_reward": 50,
+            }
+        }
+
+    if "type StarterCodeResponse" in prompt:
+        match = re.search(r"Language: (.+)", prompt)
+        language = match.group(1).strip() if match else "text"
+        return {"starter_code": f"// {language}\nsolve(data) {{\n    // TODO\n}}\n"}
+
+    count = _int(r"Generate (\d+) multiple-choice", prompt, 10)
+    return {
+        "quiz": [_mcq(rng, topic) for _ in range(count)],
+        "total_questions": count,
+        "topics_covered": [topic],
+    }
+
+
+def malformed(payload: Dict[str, Any]) -> str:
+    """Serialize a payload with a trailing comma so it fails to parse"""
+    text = json.dumps(payload)
+    return text[:-1] + ",}"
@@ -0,0 +1,244 @@
+"""
+Streaming upload ingestion
+
+The ingest request classes replace Werkzeug's upload buffering: each uploaded file
+is written straight to UPLOAD_FOLDER while it is received, hashed on
+the fly and sniffed for its magic bytes, so junk is rejected after the
+first chunk instead of after the whole body has been buffered.
+"""
+import hashlib
+import os
+import shutil
+import uuid
+import zipfile
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+from flask import Request as FlaskRequest
+from werkzeug.utils import secure_filename
+from werkzeug.wrappers import Request
+
+from app.config import Config
+
+PDF_MAGIC = b"%PDF-"
+ZIP_MAGIC = b"PK\x03\x04"
+
+# Bytes at the end of a file searched for the %%EOF trailer marker
+TRAILER_WINDOW = 1024
+
+# Copy buffer for archive members
+_COPY_CHUNK = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Upload stopped while streaming; carries a client-facing reason"""
+
+    def __init__(self, error: str, message: str):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+
+
+class HashingUploadStream:
+    """
+    Writable/readable upload container backed by a file on disk
+
+    Tracks the SHA-256 digest, size, leading bytes and trailing window
+    of everything written. The backing file is removed on close().
+    """
+
+    def __init__(self, path: str, signatures: Tuple[bytes, ...]):
+        self.path = path
+        self.signatures = signatures
+        self.size = 0
+        self.head = b""
+        self.tail = b""
+        self._hasher = hashlib.sha256()
+        self._file = open(path, "w+b")
+
+    # -----------------------
+    # Writing (called by the multipart parser)
+    # -----------------------
+    def write(self, data: bytes) -> int:
+        if len(self.head) < len(PDF_MAGIC):
+            self.head = (self.head + data)[:len(PDF_MAGIC)]
+            self._check_signature()
+
+        self._hasher.update(data)
+        self.size += len(data)
+        self.tail = (self.tail + data)[-TRAILER_WINDOW:]
+        return self._file.write(data)
+
+    def _check_signature(self) -> None:
+        # Compare the bytes seen so far against each accepted prefix
+        if not any(sig.startswith(self.head[:len(sig)]) for sig in self.signatures):
+            self.close()
+            raise UploadRejected("Invalid file type", "File content is not a PDF")
+
+    # -----------------------
+    # Reading (FileStorage API)
+    # -----------------------
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self._file.readline(size)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def readable(self) -> bool:
+        return True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    # -----------------------
+    # Ingestion results
+    # -----------------------
+    @property
+    def digest(self) -> str:
+        """Hex SHA-256 of the received bytes"""
+        return self._hasher.hexdigest()
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.head.startswith(PDF_MAGIC)
+
+    @property
+    def has_pdf_trailer(self) -> bool:
+        return b"%%EOF" in self.tail
+
+    def finish(self) -> str:
+        """Flush buffered bytes so the file can be opened by path"""
+        self._file.flush()
+        return self.path
+
+
+def expand_zip(
+    archive: HashingUploadStream,
+    open_member: Callable[[str], HashingUploadStream],
+    max_members: int,
+    max_bytes: int
+) -> List[Tuple[str, HashingUploadStream]]:
+    """
+    Copy the PDF members of an uploaded zip into upload streams
+
+    Directories, macOS metadata and non-.pdf members are skipped. The
+    member count and the declared uncompressed size are checked before
+    anything is inflated; zipfile never reads past the declared size.
+
+    Args:
+        archive: Fully received zip upload
+        open_member: Creates the stream for a member (by file name)
+        max_members: Most PDF members accepted
+        max_bytes: Cap on the members' total uncompressed size
+
+    Returns:
+        (member file name, stream) pairs in archive order
+    """
+    try:
+        with zipfile.ZipFile(archive.finish()) as zf:
+            members = [
+                info for info in zf.infolist()
+                if not info.is_dir()
+                and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith(".")
+                and info.filename.lower().endswith(".pdf")
+            ]
+            if len(members) > max_members:
+                raise UploadRejected(
+                    "Too many files", f"Archive contains more than {max_members} PDF files"
+                )
+            if sum(info.file_size for info in members) > max_bytes:
+                raise UploadRejected(
+                    "Archive too large", f"Archive expands to more than {max_bytes} bytes"
+                )
+
+            expanded = []
+            for info in members:
+                name = os.path.basename(info.filename)
+                stream = open_member(name)
+                try:
+                    with zf.open(info) as member:
+                        shutil.copyfileobj(member, stream, _COPY_CHUNK)
+                except UploadRejected as e:
+                    raise UploadRejected(e.error, f"{name}: {e.message}")
+                expanded.append((name, stream))
+            return expanded
+    except (zipfile.BadZipFile, zipfile.LargeZipFile, zlib.error, EOFError,
+            NotImplementedError, RuntimeError) as e:
+        # RuntimeError: encrypted member; NotImplementedError: compression method
+        raise UploadRejected("Invalid ZIP", f"Could not read archive: {e}")
+
+
+class UploadIngestMixin:
+    """
+    Request mixin streaming file uploads to disk through HashingUploadStream
+
+    upload_signatures lists the magic prefixes accepted for uploaded
+    files; views handling other formats (e.g. zip) widen it before
+    touching request.files.
+    """
+
+    upload_signatures: Tuple[bytes, ...] = (PDF_MAGIC,)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._upload_streams: List[HashingUploadStream] = []
+
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ):
+        return self.open_upload_stream(filename)
+
+    def open_upload_stream(
+        self,
+        filename: Optional[str],
+        signatures: Optional[Tuple[bytes, ...]] = None
+    ) -> HashingUploadStream:
+        """New upload file in UPLOAD_FOLDER, removed when the request closes"""
+        name = secure_filename(filename or "") or "upload"
+        path = os.path.join(Config.UPLOAD_FOLDER, f"{uuid.uuid4().hex}_{name}")
+        stream = HashingUploadStream(path, signatures or self.upload_signatures)
+        self._upload_streams.append(stream)
+        return stream
+
+    def close(self) -> None:
+        super().close()
+        # Also covers streams of a parse aborted before files were built
+        for stream in self._upload_streams:
+            stream.close()
+
+
+class IngestRequest(UploadIngestMixin, FlaskRequest):
+    """Flask request class (app.request_class)"""
+
+
+class StandaloneIngestRequest(UploadIngestMixin, Request):
+    """Werkzeug request for parsing uploads outside a Flask context"""
@@ -0,0 +1,446 @@
+"""
+LLM token usage and cost accounting (SQLite)
+
+Every completion's prompt and completion tokens, latency and cost are
+added to in-process aggregates keyed by endpoint, model, client and
+purpose:
+
+- primary: the first call of a generation
+- retry: a new attempt after an unusable reply
+- repair: a JSON repair call
+- hedge: the duplicate request of a hedged call
+
+Recording is a dict update under a lock; a daemon thread flushes the
+aggregates every USAGE_FLUSH_INTERVAL seconds into hour buckets
+(USAGE_BUCKET_SECONDS) of a local SQLite database shared by all
+workers. Served study sets are counted the same way (tokens and cost of
+the request that generated them, or a cache hit), so the admin report
+can show cost per study set and what the result cache saved.
+"""
+import atexit
+import hmac
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import Config
+from app.utils.metrics import current_endpoint
+
+PRIMARY = "primary"
+RETRY = "retry"
+REPAIR = "repair"
+HEDGE = "hedge"
+
+current_client: ContextVar[str] = ContextVar("current_client", default="unknown")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    bucket INTEGER NOT NULL,
+    endpoint TEXT NOT NULL,
+    model TEXT NOT NULL,
+    client TEXT NOT NULL,
+    purpose TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    latency_seconds REAL NOT NULL,
+    cost REAL NOT NULL,
+    first_seen REAL,
+    PRIMARY KEY (bucket, endpoint, model, client, purpose)
+);
+CREATE TABLE IF NOT EXISTS study_set_usage (
+    bucket INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    cache TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    cost REAL NOT NULL,
+    PRIMARY KEY (bucket, kind, cache)
+);
+"""
+
+_UPSERT_CALLS = """
+INSERT INTO llm_usage (bucket, endpoint, model, client, purpose, calls,
+                       prompt_tokens, completion_tokens, latency_seconds, cost, first_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (bucket, endpoint, model, client, purpose) DO UPDATE SET
+    calls = calls + excluded.calls,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    latency_seconds = latency_seconds + excluded.latency_seconds,
+    cost = cost + excluded.cost,
+    first_seen = MIN(COALESCE(first_seen, excluded.first_seen), excluded.first_seen)
+"""
+
+# Position of the earliest call's time in the llm_usage aggregates
+_FIRST_SEEN = 5
+
+_UPSERT_STUDY_SETS = """
+INSERT INTO study_set_usage (bucket, kind, cache, count, prompt_tokens, completion_tokens, cost)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (bucket, kind, cache) DO UPDATE SET
+    count = count + excluded.count,
+    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+    completion_tokens = completion_tokens + excluded.completion_tokens,
+    cost = cost + excluded.cost
+"""
+
+# Breakdowns of the admin report (column of llm_usage)
+BREAKDOWNS = ("endpoint", "model", "client", "purpose")
+
+
+def cost_of(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """USD cost of a completion (0 for models without a price)"""
+    prompt_price, completion_price = Config.LLM_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+class RequestUsage:
+    """Tokens and cost of the LLM calls made for one request"""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+        # Batches of one request complete on several threads
+        self._lock = threading.Lock()
+
+    def add(self, prompt_tokens: int, completion_tokens: int, cost: float) -> None:
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cost += cost
+
+
+current_request_usage: ContextVar[Optional[RequestUsage]] = ContextVar(
+    "current_request_usage", default=None
+)
+
+
+class UsageLedger:
+    """
+    In-process usage aggregates, flushed periodically to SQLite
+    """
+
+    def __init__(self, path: Path, flush_interval: float, bucket_seconds: int, enabled: bool = True):
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._calls: Dict[Tuple, List] = {}
+        self._study_sets: Dict[Tuple, List] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._initialized = False
+
+    # -----------------------
+    # Recording
+    # -----------------------
+    def record(
+        self,
+        model: str,
+        purpose: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        seconds: float
+    ) -> None:
+        """Add one completion to the aggregates"""
+        if not self.enabled:
+            return
+        cost = cost_of(model, prompt_tokens, completion_tokens)
+        request_usage = current_request_usage.get()
+        if request_usage is not None:
+            request_usage.add(prompt_tokens, completion_tokens, cost)
+
+        now = time.time()
+        key = (self._bucket(now), current_endpoint.get(), model, current_client.get(), purpose)
+        with self._lock:
+            totals = self._calls.get(key)
+            if totals is None:
+                totals = self._calls[key] = [0, 0, 0, 0.0, 0.0, now]
+            totals[0] += 1
+            totals[1] += prompt_tokens
+            totals[2] += completion_tokens
+            totals[3] += seconds
+            totals[4] += cost
+        self._ensure_flusher()
+
+    def record_study_set(self, kind: str, cache: str) -> None:
+        """
+        Count a served study set; generated ones (cache MISS) carry the
+        tokens and cost of the current request
+        """
+        if not self.enabled:
+            return
+        request_usage = current_request_usage.get()
+        generated = cache != "HIT" and request_usage is not None
+        prompt_tokens = request_usage.prompt_tokens if generated else 0
+        completion_tokens = request_usage.completion_tokens if generated else 0
+        cost = request_usage.cost if generated else 0.0
+
+        key = (self._bucket(time.time()), kind, cache)
+        with self._lock:
+            totals = self._study_sets.get(key)
+            if totals is None:
+                totals = self._study_sets[key] = [0, 0, 0, 0.0]
+            totals[0] += 1
+            totals[1] += prompt_tokens
+            totals[2] += completion_tokens
+            totals[3] += cost
+        self._ensure_flusher()
+
+    def _bucket(self, now: float) -> int:
+        now = int(now)
+        return now - now % self.bucket_seconds
+
+    # -----------------------
+    # Persistence
+    # -----------------------
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=5)
+        if not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(llm_usage)")}
+            if "first_seen" not in columns:
+                # Ledgers written before the column existed
+                conn.execute("ALTER TABLE llm_usage ADD COLUMN first_seen REAL")
+            self._initialized = True
+        return conn
+
+    def flush(self) -> int:
+        """
+        Write pending aggregates to SQLite
+
+        Returns:
+            Number of aggregate rows written
+        """
+        with self._lock:
+            calls, self._calls = self._calls, {}
+            study_sets, self._study_sets = self._study_sets, {}
+        if not calls and not study_sets:
+            return 0
+
+        with self._flush_lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(_UPSERT_CALLS, [(*key, *totals) for key, totals in calls.items()])
+                    conn.executemany(
+                        _UPSERT_STUDY_SETS, [(*key, *totals) for key, totals in study_sets.items()]
+                    )
+            except sqlite3.Error as e:
+                print(f"[USAGE_WARNING] Could not flush usage: {e}")
+                self._requeue(calls, study_sets)
+                return 0
+            finally:
+                conn.close()
+        return len(calls) + len(study_sets)
+
+    def _requeue(self, calls: Dict[Tuple, List], study_sets: Dict[Tuple, List]) -> None:
+        """Merge aggregates of a failed flush back for the next one"""
+        with self._lock:
+            for pending, failed in ((self._calls, calls), (self._study_sets, study_sets)):
+                for key, totals in failed.items():
+                    current = pending.get(key)
+                    if current is None:
+                        pending[key] = totals
+                        continue
+                    for i, value in enumerate(totals):
+                        if pending is self._calls and i == _FIRST_SEEN:
+                            current[i] = min(current[i], value)
+                        else:
+                            current[i] += value
+
+    def _ensure_flusher(self) -> None:
+        thread = self._flusher
+        if thread is not None and thread.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher.is_alive():
+                return
+            self._flusher = threading.Thread(target=self._flush_loop, name="usage-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[USAGE_WARNING] {e}")
+
+    def reset(self) -> None:
+        """
+        Drop aggregates and the flusher inherited across fork (the parent
+        flushes its own)
+        """
+        with self._lock:
+            self._calls = {}
+            self._study_sets = {}
+        self._flusher = None
+
+    # -----------------------
+    # Reporting
+    # -----------------------
+    def summary(self, hours: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Usage report over the last `hours` (all recorded usage if None)
+
+        Flushes this process first; other workers' usage appears after
+        their next flush.
+        """
+        self.flush()
+        now = time.time()
+        since = 0 if hours is None else int(now - hours * 3600)
+        # Whole buckets overlapping the window are included
+        since -= since % self.bucket_seconds
+
+        conn = self._connect()
+        try:
+            # The earliest call (the start of its bucket for older rows)
+            first = conn.execute(
+                "SELECT MIN(COALESCE(first_seen, bucket)) FROM llm_usage WHERE bucket >= ?", (since,)
+            ).fetchone()[0]
+            if hours is not None:
+                start = now - hours * 3600
+            else:
+                start = first if first is not None else now
+            window = max(1.0, now - start)
+
+            columns = (
+                "SUM(calls), SUM(prompt_tokens), SUM(completion_tokens), "
+                "SUM(latency_seconds), SUM(cost)"
+            )
+            totals = conn.execute(
+                f"SELECT {columns} FROM llm_usage WHERE bucket >= ?", (since,)
+            ).fetchone()
+            report = {
+                "window": {"since": start, "until": now, "seconds": round(window, 1)},
+                "totals": _usage_row(totals, window),
+            }
+            for name in BREAKDOWNS:
+                rows = conn.execute(
+                    f"SELECT {name}, {columns} FROM llm_usage WHERE bucket >= ? "
+                    f"GROUP BY {name} ORDER BY SUM(cost) DESC, {name}",
+                    (since,)
+                ).fetchall()
+                report[f"by_{name}"] = [{name: row[0], **_usage_row(row[1:], window)} for row in rows]
+
+            study_sets = conn.execute(
+                "SELECT kind, cache, SUM(count), SUM(prompt_tokens), SUM(completion_tokens), SUM(cost) "
+                "FROM study_set_usage WHERE bucket >= ? GROUP BY kind, cache",
+                (since,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        report["study_sets"] = _study_set_report(study_sets)
+        return report
+
+
+def _usage_row(row, window: float) -> Dict[str, Any]:
+    calls, prompt_tokens, completion_tokens, latency, cost = (value or 0 for value in row)
+    tokens = prompt_tokens + completion_tokens
+    return {
+        "calls": calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "tokens_per_second": round(tokens / window, 3),
+        # Generation speed while calls were running
+        "completion_tokens_per_call_second": round(completion_tokens / latency, 1) if latency else None,
+        "avg_latency_seconds": round(latency / calls, 3) if calls else None,
+        "cost_usd": round(cost, 6),
+    }
+
+
+def _study_set_report(rows) -> List[Dict[str, Any]]:
+    kinds: Dict[str, Dict[str, Any]] = {}
+    for kind, cache, count, prompt_tokens, completion_tokens, cost in rows:
+        entry = kinds.setdefault(kind, {"generated": 0, "cache_hits": 0, "tokens": 0, "cost": 0.0})
+        if cache == "HIT":
+            entry["cache_hits"] += count
+        else:
+            entry["generated"] += count
+            entry["tokens"] += prompt_tokens + completion_tokens
+            entry["cost"] += cost
+
+    report = []
+    for kind, entry in sorted(kinds.items()):
+        generated = entry["generated"]
+        avg_tokens = entry["tokens"] / generated if generated else 0.0
+        avg_cost = entry["cost"] / generated if generated else 0.0
+        report.append({
+            "kind": kind,
+            "generated": generated,
+            "cache_hits": entry["cache_hits"],
+            "avg_tokens": round(avg_tokens, 1),
+            "avg_cost_usd": round(avg_cost, 6),
+            # Hits would have cost about as much as an average generation
+            "cache_tokens_saved": round(avg_tokens * entry["cache_hits"]),
+            "cache_savings_usd": round(avg_cost * entry["cache_hits"], 6),
+        })
+    return report
+
+
+usage_ledger = UsageLedger(
+    Config.USAGE_DB_PATH,
+    flush_interval=Config.USAGE_FLUSH_INTERVAL,
+    bucket_seconds=Config.USAGE_BUCKET_SECONDS,
+    enabled=Config.USAGE_ENABLED,
+)
+
+
+@atexit.register
+def _flush_at_exit() -> None:
+    # Pending aggregates are lost on exit otherwise
+    if usage_ledger.enabled:
+        usage_ledger.flush()
+
+
+def init_app(app) -> None:
+    """
+    Attribute LLM usage to the calling client and register /admin/usage
+
+    Register after the metrics hooks (which set the current endpoint).
+    """
+    if not usage_ledger.enabled:
+        return
+    from flask import g, jsonify, request
+
+    from app.utils.admission import client_id
+
+    @app.before_request
+    def _start_usage():
+        client = client_id(request.remote_addr, request.headers.get("X-Forwarded-For"))
+        g._usage_tokens = (
+            current_client.set(client),
+            current_request_usage.set(RequestUsage()),
+        )
+
+    @app.teardown_request
+    def _clear_usage(exc):
+        tokens = g.pop("_usage_tokens", None)
+        if tokens is not None:
+            current_client.reset(tokens[0])
+            current_request_usage.reset(tokens[1])
+
+    @app.route("/admin/usage")
+    def admin_usage():
+        """Token usage and cost report (?hours=24 limits the window)"""
+        # Client addresses and spend are never served without a token
+        if not Config.ADMIN_TOKEN:
+            return jsonify({"error": "Not found", "message": "Set ADMIN_TOKEN to enable /admin/usage"}), 404
+        authorization = request.headers.get("Authorization", "").encode("utf-8")
+        if not hmac.compare_digest(authorization, f"Bearer {Config.ADMIN_TOKEN}".encode("utf-8")):
+            return jsonify({"error": "Unauthorized", "message": "Invalid or missing admin token"}), 401
+        hours = request.args.get("hours", type=float)
+        if hours is not None and hours <= 0:
+            return jsonify({"error": "Invalid hours", "message": "hours must be positive"}), 400
+        return jsonify(usage_ledger.summary(hours)), 200
@@ -0,0 +1,144 @@
+"""
+ChunkService benchmark: index-based chunker vs the previous rfind loop
+
+Chunks synthetic syllabus-like documents (units with headings,
+paragraphs, sentences and bullets) of several sizes and reports, for
+each implementation, the best wall time, throughput and the number and
+mean size of chunks. Time per MB staying flat as the document grows
+shows linear scaling. The previous implementation is reproduced below as
+legacy_chunk_text; unlike the new one it only sizes chunks in
+characters, and with an overlap above 70% of chunk_size its start can
+move backwards and never finish.
+
+Usage:
+    python -m benchmarks.bench_chunking --sizes 1 4 16 --repeat 3
+    python -m benchmarks.bench_chunking --unit tokens --chunk-size 400
+"""
+import argparse
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List
+
+from app.services.chunk_service import ChunkService
+
+_WORDS = (
+    "algorithm array binary cache class closure compiler concurrency database "
+    "graph hash heap index iterator kernel memory module network parser queue "
+    "recursion scheduler socket sorting stack thread transaction tree vector"
+).split()
+
+
+def make_document(size_bytes: int, seed: int = 0) -> str:
+    """Synthetic document of about size_bytes characters"""
+    rng = random.Random(seed)
+    parts: List[str] = []
+    size = 0
+    unit = 1
+    while size < size_bytes:
+        roll = rng.random()
+        if roll < 0.01:
+            part = f"\n\nUnit {unit}: {rng.choice(_WORDS).title()}\n"
+            unit += 1
+        elif roll < 0.06:
+            part = "\n\n"
+        elif roll < 0.12:
+            part = "\n- " + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(3, 8)))
+        else:
+            words = " ".join(rng.choice(_WORDS) for _ in range(rng.randint(6, 24)))
+            part = " " + words.capitalize() + "."
+        parts.append(part)
+        size += len(part)
+    return "".join(parts)
+
+
+def legacy_chunk_text(text: str, chunk_size: int, chunk_overlap: int) -> List[str]:
+    """ChunkService.chunk_text before the boundary index"""
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    text_length = len(text)
+    while start < text_length:
+        end = start + chunk_size
+        if end < text_length:
+            last_period = text.rfind('.', start, end)
+            last_newline = text.rfind('\n', start, end)
+            if last_period > start + chunk_size * 0.7:
+                end = last_period + 1
+            elif last_newline > start + chunk_size * 0.7:
+                end = last_newline + 1
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        start = end - chunk_overlap
+        if start >= text_length:
+            break
+    return chunks if chunks else [text]
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of repeat runs, in seconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench(text: str, args: argparse.Namespace) -> List[Dict[str, Any]]:
+    service = ChunkService(args.chunk_size, args.chunk_overlap, unit=args.unit)
+    megabytes = len(text) / 1e6
+    cases = {
+        "index (list)": lambda: service.chunk_text(text),
+        "index (spans)": lambda: sum(1 for _ in service.iter_spans(text)),
+    }
+    if args.unit == "chars":
+        cases["legacy rfind"] = lambda: legacy_chunk_text(text, args.chunk_size, args.chunk_overlap)
+
+    rows = []
+    for name, func in cases.items():
+        seconds = best_of(func, args.repeat)
+        result = func()
+        chunks = result if isinstance(result, int) else len(result)
+        rows.append({
+            "implementation": name,
+            "megabytes": round(megabytes, 2),
+            "seconds": round(seconds, 4),
+            "ms_per_mb": round(seconds * 1000 / megabytes, 1),
+            "chunks": chunks,
+            "mean_chunk_chars": round(len(text) / max(chunks, 1)),
+        })
+    return rows
+
+
+def main(argv=None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="ChunkService benchmark")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="Document sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=int, default=1500)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--unit", choices=("chars", "tokens"), default="chars")
+    parser.add_argument("--json", action="store_true", help="Print JSON rows")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in args.sizes:
+        rows.extend(bench(make_document(int(size * 1e6)), args))
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return rows
+
+    print(f"{'implementation':16s} {'MB':>6s} {'seconds':>9s} {'ms/MB':>8s} {'chunks':>8s} {'mean chars':>11s}")
+    for row in rows:
+        print(
+            f"{row['implementation']:16s} {row['megabytes']:6.2f} {row['seconds']:9.4f} "
+            f"{row['ms_per_mb']:8.1f} {row['chunks']:8d} {row['mean_chunk_chars']:11d}"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    main()
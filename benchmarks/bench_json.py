@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the LLM reply -> HTTP body path for quiz payloads
+
+Compares the previous pipeline (regex extraction, json.loads, key check,
+QuizResponse(**dict), model_dump(), sorted json.dumps) against the
+single-pass path (parse_json_as straight into the model, then
+pydantic-core serialization) on synthetic quizzes of several sizes.
+
+Usage:
+    python -m benchmarks.bench_json --sizes 20 100 500 --repeat 50
+"""
+import argparse
+import json
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from app.schemas.quiz_schema import QuizResponse
+from app.utils.json_validator import parse_json_as, validate_json_structure
+from app.utils.serialization import dumps
+from app.utils.synthetic_payloads import generate_payload
+
+
+def make_reply(num_questions: int) -> str:
+    """LLM-style reply text for a topic quiz of num_questions"""
+    prompt = f'Generate {num_questions} multiple-choice quiz questions about the topic: "Graphs"'
+    return json.dumps(generate_payload(prompt), indent=2)
+
+
+# -----------------------
+# Pipelines
+# -----------------------
+def legacy_parse(text: str) -> Dict[str, Any]:
+    text = re.sub(r'```json\s*', '', text)
+    text = re.sub(r'```\s*', '', text)
+    match = re.search(r'\{.*\}', text, re.DOTALL)
+    data = json.loads(match.group(0) if match else text.strip())
+    validate_json_structure(data, ["quiz"])
+    return QuizResponse(**data).model_dump()
+
+
+def legacy_serialize(data: Dict[str, Any]) -> bytes:
+    # Flask's default provider: sort_keys, ASCII escaping
+    return json.dumps(data, sort_keys=True).encode("utf-8")
+
+
+def single_pass_parse(text: str) -> QuizResponse:
+    return parse_json_as(text, QuizResponse)
+
+
+def single_pass_serialize(quiz: QuizResponse) -> bytes:
+    return dumps(quiz)
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_size(num_questions: int, repeat: int) -> Dict[str, Any]:
+    text = make_reply(num_questions)
+    legacy_data = legacy_parse(text)
+    model = single_pass_parse(text)
+
+    # Both paths must produce the same response document
+    assert json.loads(legacy_serialize(legacy_data)) == json.loads(single_pass_serialize(model))
+
+    timings = {
+        "legacy_parse_ms": best_of(lambda: legacy_parse(text), repeat),
+        "legacy_serialize_ms": best_of(lambda: legacy_serialize(legacy_data), repeat),
+        "single_pass_parse_ms": best_of(lambda: single_pass_parse(text), repeat),
+        "single_pass_serialize_ms": best_of(lambda: single_pass_serialize(model), repeat),
+    }
+    legacy_total = timings["legacy_parse_ms"] + timings["legacy_serialize_ms"]
+    new_total = timings["single_pass_parse_ms"] + timings["single_pass_serialize_ms"]
+    return {
+        "questions": num_questions,
+        "reply_bytes": len(text),
+        **{k: round(v, 4) for k, v in timings.items()},
+        "legacy_total_ms": round(legacy_total, 4),
+        "single_pass_total_ms": round(new_total, 4),
+        "speedup": round(legacy_total / new_total, 2) if new_total else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="Quiz parse/validate/serialize micro-benchmark")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[20, 100, 500, 2000])
+    parser.add_argument("--repeat", type=int, default=30, help="Runs per measurement (best is kept)")
+    parser.add_argument("--output", help="Optional JSON result path")
+    args = parser.parse_args(argv)
+
+    results = [bench_size(size, args.repeat) for size in args.sizes]
+
+    print(f"{'questions':>9} {'bytes':>9} {'legacy ms':>10} {'single ms':>10} {'speedup':>8}")
+    for row in results:
+        print(
+            f"{row['questions']:>9} {row['reply_bytes']:>9} "
+            f"{row['legacy_total_ms']:>10.3f} {row['single_pass_total_ms']:>10.3f} "
+            f"{row['speedup']:>7}x"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
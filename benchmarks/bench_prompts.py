@@ -0,0 +1,120 @@
+"""
+Input size of the prompts each endpoint sends to the LLM
+
+For every prompt type, builds the prompt for two different requests
+(topics / syllabi) and reports its size and the prefix both share,
+which is what provider-side prompt caching can reuse across requests.
+Tokens are estimated as words plus punctuation marks (close to BPE
+counts for JSON-heavy text; the live per-endpoint figures are in
+GET /admin/usage).
+
+Usage:
+    python -m benchmarks.bench_prompts
+    python -m benchmarks.bench_prompts --json
+"""
+import argparse
+import json
+import os
+import re
+from typing import Callable, Dict, List, Tuple
+
+from app.services.ai_service import JSON_SYSTEM_PROMPT
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+# Synthetic syllabi of about MAX_SYLLABUS_CHARS
+_WORDS = (
+    "algorithm array binary cache class closure compiler concurrency database "
+    "graph hash heap index iterator kernel memory module network parser queue "
+    "recursion scheduler socket sorting stack thread transaction tree vector"
+).split()
+
+
+def _syllabus(seed: int, chars: int = 8000) -> str:
+    words = [_WORDS[(i * 7 + seed * 3) % len(_WORDS)] for i in range(chars // 7)]
+    lines = [f"Unit {i // 12 + 1}: " + " ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+    return "\n".join(lines)[:chars]
+
+
+_AVOID = [f"What is the role of the {w} in a {v}?" for w, v in zip(_WORDS, reversed(_WORDS))][:11]
+
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+
+def _messages_text(prompt: str) -> str:
+    # Both messages, in the order they are sent
+    return JSON_SYSTEM_PROMPT + "\n" + prompt
+
+
+def _common_prefix(a: str, b: str) -> str:
+    size = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        size += 1
+    return a[:size]
+
+
+def prompt_cases() -> Dict[str, Callable[[int], str]]:
+    """Prompt builders per call type, parameterized by a request seed"""
+    from app.services.quiz_service import QuizService
+
+    topics = ["Binary Trees", "Operating Systems"]
+    return {
+        "upload_pdf (study set)": lambda s: QuizService._syllabus_prompt(_syllabus(s), 10, 10)[1],
+        "upload_pdf (extra batch)": lambda s: QuizService._syllabus_batch_prompt(
+            _syllabus(s), 4, 5, ["subtopic a", "subtopic b"], _AVOID
+        ),
+        "generate_quiz": lambda s: QuizService._topic_quiz_prompt(topics[s], "medium", 10),
+        "generate_flashcards": lambda s: QuizService._flashcards_prompt(topics[s], 15),
+        "generate_coding_challenge": lambda s: QuizService._coding_challenge_prompt(
+            topics[s], "hard", "python"
+        ),
+        # New language of a library challenge without a local template
+        "coding_challenge (variant)": lambda s: QuizService._starter_code_prompt(
+            {"title": topics[s], "signature": {
+                "name": "solve", "params": [{"name": "root", "type": "list[int]"}], "returns": "int"
+            }},
+            "kotlin"
+        ),
+    }
+
+
+def measure() -> List[Dict[str, object]]:
+    rows = []
+    for name, build in prompt_cases().items():
+        first, second = _messages_text(build(0)), _messages_text(build(1))
+        shared = _common_prefix(first, second)
+        rows.append({
+            "call": name,
+            "chars": len(first),
+            "tokens": estimate_tokens(first),
+            "cacheable_prefix_tokens": estimate_tokens(shared),
+        })
+    return rows
+
+
+def main(argv=None) -> List[Dict[str, object]]:
+    parser = argparse.ArgumentParser(description="Prompt input size per endpoint")
+    parser.add_argument("--json", action="store_true", help="Print JSON rows")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LLM_PROVIDER", "synthetic")
+    rows = measure()
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return rows
+
+    print(f"{'call':28s} {'chars':>7s} {'tokens':>7s} {'cacheable':>10s}")
+    for row in rows:
+        print(
+            f"{row['call']:28s} {row['chars']:7d} {row['tokens']:7d} "
+            f"{row['cacheable_prefix_tokens']:10d}"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    main()
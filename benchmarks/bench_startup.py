@@ -0,0 +1,166 @@
+"""
+Cold start benchmark: import time and time-to-first-200
+
+Measures, in fresh interpreters:
+- how long `import app.main` takes, and what the deferred heavy
+  imports (pdfplumber, groq) would add on top;
+- for gunicorn with the project config, in preload and lazy modes,
+  the time from process spawn to the first 200 from /health and the
+  latency of the first upload (the first request that needs pdfplumber).
+
+The app runs with LLM_PROVIDER=synthetic, so no network access is needed.
+
+Usage:
+    python -m benchmarks.bench_startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from benchmarks.make_pdfs import make_syllabus_pdf
+
+ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SNIPPET = """
+import time
+start = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from app.utils.startup import warm_imports
+warm_imports()
+warmed = time.perf_counter()
+print((imported - start) * 1000, (warmed - imported) * 1000)
+"""
+
+
+def _env(**extra: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.update({
+        "LLM_PROVIDER": "synthetic",
+        "LLM_SYNTHETIC_LATENCY_MS": "0",
+        "PYTHONUNBUFFERED": "1",
+        # Measure real extraction on the repeat upload, not a cache hit
+        "RESULT_CACHE_MAX_ENTRIES": "0",
+        "TEXT_CACHE_MAX_ENTRIES": "0",
+    })
+    env.update(extra)
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(runs: int) -> Dict[str, float]:
+    imports, heavy = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", IMPORT_SNIPPET],
+            cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+        ).stdout.split()
+        imports.append(float(out[0]))
+        heavy.append(float(out[1]))
+    return {
+        "import_app_ms": round(statistics.median(imports), 1),
+        "deferred_imports_ms": round(statistics.median(heavy), 1),
+    }
+
+
+def _multipart(pdf: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="syllabus.pdf"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode() + pdf + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def measure_server(preload: bool, timeout: float = 60.0) -> Dict[str, float]:
+    port = _free_port()
+    env = _env(PORT=str(port), WEB_CONCURRENCY="1", GUNICORN_PRELOAD=str(preload))
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "app.main:app", "-c", "gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        while True:
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError("Server did not become ready")
+            try:
+                with urllib.request.urlopen(f"{base}/health", timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        first_200 = time.perf_counter() - start
+
+        body, content_type = _multipart(make_syllabus_pdf(1))
+        request = urllib.request.Request(
+            f"{base}/api/upload-pdf", data=body, headers={"Content-Type": content_type}
+        )
+        upload_start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        first_upload = time.perf_counter() - upload_start
+
+        upload_start = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+        second_upload = time.perf_counter() - upload_start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+    return {
+        "time_to_first_200_ms": first_200 * 1000,
+        "first_upload_ms": first_upload * 1000,
+        "second_upload_ms": second_upload * 1000,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="StudyGenie cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5, help="Repetitions per measurement (median is kept)")
+    parser.add_argument("--output", help="Optional JSON result path")
+    args = parser.parse_args(argv)
+
+    report: Dict[str, Any] = {"import": measure_import(args.runs)}
+    print(
+        f"import app.main: {report['import']['import_app_ms']:.1f} ms "
+        f"(+{report['import']['deferred_imports_ms']:.1f} ms deferred heavy imports)"
+    )
+
+    for mode, preload in (("preload", True), ("lazy", False)):
+        runs = [measure_server(preload) for _ in range(args.runs)]
+        report[mode] = {
+            key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]
+        }
+        row = report[mode]
+        print(
+            f"gunicorn {mode:<8} first 200: {row['time_to_first_200_ms']:>7.1f} ms  "
+            f"first upload: {row['first_upload_ms']:>7.1f} ms  "
+            f"second upload: {row['second_upload_ms']:>7.1f} ms"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Study set store benchmark: storage size and latency per codec
+
+Stores synthetic study sets of several sizes with each available codec
+(raw JSON, zlib, and zstd when installed) and reports the bytes kept on
+disk relative to the raw JSON body, with the latency of a put, a full
+get and a projected get (?fields=quiz). The whole-body zlib size is
+listed as well, to show what compressing fields separately costs.
+
+Synthetic text is random vocabulary, so the ratios are a conservative
+estimate for real (more repetitive) study sets.
+
+Usage:
+    python -m benchmarks.bench_store --sizes 10 50 200 --repeat 20
+"""
+import argparse
+import json
+import tempfile
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.config import Config
+from app.schemas.study_set_schema import StudySetResponse
+from app.utils.compression import EncodedPayload
+from app.utils.study_set_store import StudySetStore, zstandard
+from app.utils.synthetic_payloads import generate_payload
+
+
+def make_study_set(num_questions: int) -> EncodedPayload:
+    """Serialized study set with num_questions quiz and interview questions"""
+    prompt = (
+        f'skill_map SYLLABUS "total_questions": {num_questions} '
+        f'"total_questions": {num_questions}'
+    )
+    return EncodedPayload.from_object(StudySetResponse(**generate_payload(prompt)))
+
+
+def best_of(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of repeat runs, in milliseconds"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_codec(payload: EncodedPayload, codec: str, repeat: int, workdir: Path) -> Dict[str, Any]:
+    store = StudySetStore(workdir / f"{codec}.sqlite3", max_bytes=1 << 30, codec=codec)
+
+    def put() -> None:
+        store.clear()
+        store.put(payload)
+
+    put_ms = best_of(put, repeat)
+    set_id = store.put(payload)
+    assert store.get(set_id) == payload.body
+
+    return {
+        "codec": codec,
+        "stored_bytes": store.stats()["bytes"],
+        "put_ms": round(put_ms, 3),
+        "get_ms": round(best_of(lambda: store.get(set_id), repeat), 3),
+        "get_quiz_ms": round(best_of(lambda: store.get(set_id, ["quiz"]), repeat), 3),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    parser = argparse.ArgumentParser(description="StudyGenie study set store benchmark")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[10, 50, 200])
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per measurement (best is kept)")
+    parser.add_argument("--output", help="Optional JSON result path")
+    args = parser.parse_args(argv)
+
+    codecs = ["raw", "zlib"] + (["zstd"] if zstandard is not None else [])
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            payload = make_study_set(size)
+            raw = len(payload.body)
+            whole_zlib = len(zlib.compress(payload.body, Config.STUDY_SET_STORE_ZLIB_LEVEL))
+            for codec in codecs:
+                row = bench_codec(payload, codec, args.repeat, Path(tmp))
+                row.update({
+                    "questions": size,
+                    "json_bytes": raw,
+                    "whole_body_zlib_bytes": whole_zlib,
+                    "ratio": round(row["stored_bytes"] / raw, 3),
+                })
+                results.append(row)
+
+    print(
+        f"{'questions':>9} {'codec':>5} {'json B':>8} {'stored B':>9} {'ratio':>6} "
+        f"{'body zlib B':>11} {'put ms':>7} {'get ms':>7} {'quiz ms':>8}"
+    )
+    for row in results:
+        print(
+            f"{row['questions']:>9} {row['codec']:>5} {row['json_bytes']:>8} "
+            f"{row['stored_bytes']:>9} {row['ratio']:>6.3f} {row['whole_body_zlib_bytes']:>11} "
+            f"{row['put_ms']:>7.3f} {row['get_ms']:>7.3f} {row['get_quiz_ms']:>8.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
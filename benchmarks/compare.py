@@ -0,0 +1,64 @@
+"""
+Compare two benchmark result files
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# (label, path into a scenario result, higher is better)
+FIELDS: List[Tuple[str, Tuple[str, ...], bool]] = [
+    ("throughput_rps", ("throughput_rps",), True),
+    ("p50_ms", ("latency_ms", "p50"), False),
+    ("p95_ms", ("latency_ms", "p95"), False),
+    ("p99_ms", ("latency_ms", "p99"), False),
+    ("peak_rss_mb", ("peak_rss_mb",), False),
+    ("error_rate", ("error_rate",), False),
+]
+
+
+def _get(result: Dict[str, Any], path: Tuple[str, ...]) -> float:
+    value: Any = result
+    for key in path:
+        value = value.get(key, 0) if isinstance(value, dict) else 0
+    return float(value or 0)
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], threshold: float) -> int:
+    """Print a per-scenario diff; return the number of regressions"""
+    regressions = 0
+    print(f"old: {old['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    for scenario, new_result in new["results"].items():
+        old_result = old["results"].get(scenario)
+        if old_result is None:
+            print(f"\n{scenario}: (new scenario)")
+            continue
+        print(f"\n{scenario}")
+        for label, path, higher_is_better in FIELDS:
+            before, after = _get(old_result, path), _get(new_result, path)
+            change = (after - before) / before if before else 0.0
+            worse = change < -threshold if higher_is_better else change > threshold
+            flag = "  REGRESSION" if worse else ""
+            regressions += int(worse)
+            print(f"  {label:15s} {before:10.2f} -> {after:10.2f}  ({change:+.1%}){flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare benchmark results")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change flagged as regression")
+    args = parser.parse_args()
+
+    old = json.loads(Path(args.old).read_text())
+    new = json.loads(Path(args.new).read_text())
+    regressions = compare(old, new, args.threshold)
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
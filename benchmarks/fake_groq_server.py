@@ -0,0 +1,259 @@
+"""
+Local stub of the Groq chat completions API for offline benchmarks
+
+Serves POST /openai/v1/chat/completions with synthetic, schema-valid
+JSON. Latency, token rate, failure rate and malformed-JSON rate are
+configurable so the full pipeline can be exercised deterministically.
+An optional per-API-key request quota answers 429 with Groq's
+x-ratelimit-* and retry-after headers (for the GROQ_BACKENDS router).
+
+Usage:
+    python -m benchmarks.fake_groq_server --port 8765 --latency-ms 800
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=stub python -m app.main
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from app.utils.synthetic_payloads import generate_payload, malformed
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+@dataclass
+class StubSettings:
+    """Behaviour knobs for the stub server"""
+    latency_ms: float = 200.0        # Fixed time-to-first-token
+    jitter_ms: float = 50.0          # Uniform +/- jitter on latency
+    token_rate: float = 0.0          # Completion tokens/sec (0 = instant)
+    failure_rate: float = 0.0        # Fraction of requests answered with HTTP 500
+    malformed_rate: float = 0.0      # Fraction of completions with broken JSON
+    rate_limit: int = 0              # Requests per API key per window (0 = unlimited)
+    rate_limit_window: float = 60.0  # Seconds
+    seed: int = 1234
+
+
+class _Stats:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.failures = 0
+        self.malformed = 0
+        self.rate_limited = 0
+        self.by_key: Dict[str, int] = {}
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "malformed": self.malformed,
+                "rate_limited": self.rate_limited,
+                "by_key": dict(self.by_key),
+            }
+
+
+class _RateLimiter:
+    """Fixed-window request quota per API key"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self.lock = threading.Lock()
+        self.windows: Dict[str, Tuple[float, int]] = {}
+
+    def take(self, key: str) -> Tuple[bool, Dict[str, str]]:
+        """Count a request; returns (allowed, rate limit headers)"""
+        now = time.monotonic()
+        with self.lock:
+            start, used = self.windows.get(key, (now, 0))
+            if now - start >= self.window:
+                start, used = now, 0
+            allowed = used < self.limit
+            if allowed:
+                used += 1
+            self.windows[key] = (start, used)
+        reset = max(0.0, start + self.window - now)
+        headers = {
+            "x-ratelimit-limit-requests": str(self.limit),
+            "x-ratelimit-remaining-requests": str(self.limit - used),
+            "x-ratelimit-reset-requests": f"{reset:.2f}s",
+        }
+        if not allowed:
+            headers["retry-after"] = str(max(1, math.ceil(reset)))
+        return allowed, headers
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _make_handler(settings: StubSettings, stats: _Stats, rng: random.Random):
+    rng_lock = threading.Lock()
+    limiter = _RateLimiter(settings.rate_limit, settings.rate_limit_window) if settings.rate_limit else None
+
+    def roll() -> float:
+        with rng_lock:
+            return rng.random()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # noqa: A002 - silence access log
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+
+            if self.path != COMPLETIONS_PATH:
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            api_key = self.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            with stats.lock:
+                stats.requests += 1
+                stats.by_key[api_key] = stats.by_key.get(api_key, 0) + 1
+
+            quota_headers: Dict[str, str] = {}
+            if limiter is not None:
+                allowed, quota_headers = limiter.take(api_key)
+                if not allowed:
+                    with stats.lock:
+                        stats.rate_limited += 1
+                    self._send_json(429, {
+                        "error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}
+                    }, quota_headers)
+                    return
+
+            jitter = (roll() * 2 - 1) * settings.jitter_ms
+            time.sleep(max(0.0, settings.latency_ms + jitter) / 1000)
+
+            if roll() < settings.failure_rate:
+                with stats.lock:
+                    stats.failures += 1
+                self._send_json(
+                    500, {"error": {"message": "stub failure", "type": "server_error"}}, quota_headers
+                )
+                return
+
+            messages = request.get("messages", [])
+            prompt = messages[-1]["content"] if messages else ""
+            content_obj = generate_payload(prompt)
+
+            is_repair = "Fix the following invalid JSON" in prompt
+            if not is_repair and roll() < settings.malformed_rate:
+                with stats.lock:
+                    stats.malformed += 1
+                content = malformed(content_obj)
+            else:
+                content = json.dumps(content_obj)
+
+            completion_tokens = _estimate_tokens(content)
+            if settings.token_rate > 0:
+                time.sleep(completion_tokens / settings.token_rate)
+
+            prompt_tokens = sum(_estimate_tokens(m.get("content", "")) for m in messages)
+            self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                },
+            }, quota_headers)
+
+    return Handler
+
+
+class FakeGroqServer:
+    """Threaded stub server that can run in the background of a benchmark"""
+
+    def __init__(self, settings: Optional[StubSettings] = None, host: str = "127.0.0.1", port: int = 0):
+        self.settings = settings or StubSettings()
+        self.stats = _Stats()
+        handler = _make_handler(self.settings, self.stats, random.Random(self.settings.seed))
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeGroqServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeGroqServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a local fake Groq server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="Requests per API key per window")
+    parser.add_argument("--rate-limit-window", type=float, default=60.0)
+    args = parser.parse_args()
+
+    settings = StubSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        token_rate=args.token_rate,
+        failure_rate=args.failure_rate,
+        malformed_rate=args.malformed_rate,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+    )
+    server = FakeGroqServer(settings, host=args.host, port=args.port)
+    print(f"Fake Groq server listening on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Generate synthetic syllabus PDFs of several sizes (no external deps)
+
+Usage:
+    python -m benchmarks.make_pdfs --out benchmarks/pdfs
+"""
+import argparse
+import random
+from pathlib import Path
+from typing import Dict, List
+
+from app.utils.synthetic_payloads import VOCABULARY
+
+# name -> page count
+SIZES: Dict[str, int] = {
+    "small": 1,
+    "medium": 5,
+    "large": 20,
+}
+
+LINES_PER_PAGE = 45
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def syllabus_lines(pages: int, seed: int = 7) -> List[List[str]]:
+    """Build page-by-page syllabus text lines"""
+    rng = random.Random(seed + pages)
+    result = []
+    unit = 1
+    for _ in range(pages):
+        lines = []
+        while len(lines) < LINES_PER_PAGE:
+            lines.append(f"Unit {unit}: {' '.join(rng.choice(VOCABULARY) for _ in range(3)).title()}")
+            for _ in range(rng.randint(4, 7)):
+                words = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(8, 12)))
+                lines.append(f"- {words.capitalize()}.")
+            unit += 1
+        result.append(lines[:LINES_PER_PAGE])
+    return result
+
+
+def build_pdf(pages: List[List[str]]) -> bytes:
+    """
+    Write a minimal PDF with one Helvetica text stream per page
+    """
+    objects: List[bytes] = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    catalog_id = add(b"")  # placeholder, filled below
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for lines in pages:
+        body = ["BT", "/F1 10 Tf", "12 TL", "50 780 Td"]
+        for line in lines:
+            body.append(f"({_escape(line)}) Tj T*")
+        body.append("ET")
+        stream = "\n".join(body).encode("latin-1")
+        content_id = add(
+            b"<< /Length " + str(len(stream)).encode() + b" >>\nstream\n" + stream + b"\nendstream"
+        )
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>".encode()
+        ))
+
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root {catalog_id} 0 R >>\n"
+        f"startxref\n{xref_offset}\n%%EOF\n"
+    ).encode()
+    return bytes(out)
+
+
+def make_syllabus_pdf(pages: int, seed: int = 7) -> bytes:
+    """Synthetic syllabus PDF with the given number of pages"""
+    return build_pdf(syllabus_lines(pages, seed))
+
+
+def write_pdfs(out_dir: Path) -> Dict[str, Path]:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name, pages in SIZES.items():
+        path = out_dir / f"syllabus_{name}.pdf"
+        path.write_bytes(make_syllabus_pdf(pages))
+        paths[name] = path
+    return paths
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic syllabus PDFs")
+    parser.add_argument("--out", default="benchmarks/pdfs")
+    args = parser.parse_args()
+    for name, path in write_pdfs(Path(args.out)).items():
+        print(f"{name}: {path} ({path.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
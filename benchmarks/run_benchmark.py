@@ -0,0 +1,319 @@
+"""
+Offline end-to-end benchmark of the StudyGenie API
+
+Starts a local fake Groq server, builds the real app with create_app()
+pointed at it, and drives every endpoint with concurrent requests.
+Reports throughput, p50/p95/p99 latency and peak RSS per scenario and
+writes the results as JSON for comparison between commits
+(see benchmarks/compare.py).
+
+Usage:
+    python -m benchmarks.run_benchmark --requests 20 --concurrency 4 --latency-ms 300
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from benchmarks.fake_groq_server import FakeGroqServer, StubSettings
+from benchmarks.make_pdfs import SIZES, make_syllabus_pdf
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+# -----------------------
+# Measurement helpers
+# -----------------------
+def percentile(values: List[float], pct: float) -> float:
+    """Linear-interpolated percentile of a list of values"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Fallback: lifetime peak (kilobytes on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RSSSampler:
+    """Track peak RSS in a background thread while a scenario runs"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self) -> "RSSSampler":
+        self.peak = current_rss_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            text=True,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# -----------------------
+# Scenarios
+# -----------------------
+def build_scenarios(quiz_questions: int, interview_questions: int) -> Dict[str, Callable]:
+    """Map scenario name -> callable(client) returning the HTTP status"""
+    pdfs = {name: make_syllabus_pdf(pages) for name, pages in SIZES.items()}
+
+    def upload(pdf_bytes: bytes) -> Callable:
+        def run(client) -> int:
+            response = client.post(
+                "/api/upload-pdf",
+                data={
+                    "file": (io.BytesIO(pdf_bytes), "syllabus.pdf"),
+                    "quiz_questions": str(quiz_questions),
+                    "interview_questions": str(interview_questions),
+                },
+                content_type="multipart/form-data",
+            )
+            return response.status_code
+        return run
+
+    def post_json(path: str, body: Dict[str, Any]) -> Callable:
+        def run(client) -> int:
+            return client.post(path, json=body).status_code
+        return run
+
+    scenarios: Dict[str, Callable] = {
+        f"upload_pdf_{name}": upload(data) for name, data in pdfs.items()
+    }
+    scenarios["generate_quiz"] = post_json(
+        "/api/generate-quiz", {"topic": "Binary Trees", "difficulty": "medium", "num_questions": 20}
+    )
+    scenarios["generate_flashcards"] = post_json(
+        "/api/generate-flashcards", {"topic": "Operating Systems", "num_cards": 20}
+    )
+    scenarios["generate_coding_challenge"] = post_json(
+        "/api/generate-coding-challenge", {"topic": "Graphs", "difficulty": "hard", "language": "python"}
+    )
+    return scenarios
+
+
+def run_scenario(
+    app, func: Callable, requests: int, concurrency: int, allow_errors: bool = False
+) -> Dict[str, Any]:
+    """
+    Run func requests times on concurrency threads
+
+    Raises RuntimeError on a non-2xx response unless allow_errors, so
+    instant rejections never pass for latency samples.
+    """
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(_):
+        client = app.test_client()
+        start = time.perf_counter()
+        status = func(client)
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    with RSSSampler() as sampler:
+        wall_start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(one, range(requests)))
+        wall = time.perf_counter() - wall_start
+
+    ok = sum(count for status, count in statuses.items() if status.startswith("2"))
+    if ok < requests and not allow_errors:
+        raise RuntimeError(
+            f"Non-2xx responses ({statuses}); pass --allow-errors to report their latencies anyway"
+        )
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "status_counts": statuses,
+        "error_rate": round(1 - ok / requests, 4) if requests else 0.0,
+        "throughput_rps": round(requests / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "mean": round(1000 * sum(latencies) / len(latencies), 2) if latencies else 0.0,
+            "p50": round(1000 * percentile(latencies, 50), 2),
+            "p95": round(1000 * percentile(latencies, 95), 2),
+            "p99": round(1000 * percentile(latencies, 99), 2),
+            "max": round(1000 * max(latencies), 2) if latencies else 0.0,
+        },
+        "peak_rss_mb": round(sampler.peak / (1024 * 1024), 2),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Offline StudyGenie benchmark")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--token-rate", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-limit", type=int, default=0,
+        help="Stub requests per API key per --rate-limit-window seconds (0 = unlimited)",
+    )
+    parser.add_argument("--rate-limit-window", type=float, default=60.0)
+    parser.add_argument(
+        "--backends", type=int, default=1,
+        help="Stub API keys pooled through GROQ_BACKENDS (1 = plain GROQ_API_KEY)",
+    )
+    parser.add_argument("--quiz-questions", type=int, default=10)
+    parser.add_argument("--interview-questions", type=int, default=10)
+    parser.add_argument(
+        "--provider",
+        choices=["stub", "synthetic", "replay"],
+        default="stub",
+        help="stub: fake Groq HTTP server; synthetic/replay: in-process LLM_PROVIDER",
+    )
+    parser.add_argument("--replay-path", help="Transcript for --provider replay")
+    parser.add_argument(
+        "--result-cache", action="store_true",
+        help="Keep the result caches and challenge library on (repeats are then served from them)",
+    )
+    parser.add_argument(
+        "--allow-errors", action="store_true",
+        help="Report scenarios with non-2xx responses (e.g. with --failure-rate) instead of failing",
+    )
+    parser.add_argument("--scenarios", nargs="*", help="Subset of scenario names to run")
+    parser.add_argument("--output", help="Result JSON path (default: benchmarks/results/<commit>-<time>.json)")
+    args = parser.parse_args(argv)
+
+    settings = StubSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        token_rate=args.token_rate,
+        failure_rate=args.failure_rate,
+        malformed_rate=args.malformed_rate,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+    )
+
+    server = FakeGroqServer(settings) if args.provider == "stub" else None
+
+    with server or contextlib.nullcontext(), tempfile.TemporaryDirectory() as store_dir:
+        # Config reads the environment at import time, so set it first
+        os.environ["GROQ_API_KEY"] = "benchmark-stub-key"
+        os.environ.setdefault("METRICS_ENABLED", "True")
+        # Every request comes from the test client's address; per-client
+        # admission limits would turn most of them into instant 429s
+        os.environ["ADMISSION_ENABLED"] = "False"
+        if not args.result_cache:
+            os.environ["RESULT_CACHE_MAX_ENTRIES"] = "0"
+            os.environ["TEXT_CACHE_MAX_ENTRIES"] = "0"
+            os.environ["CHALLENGE_LIBRARY_MAX_CHALLENGES"] = "0"
+        # Fresh SQLite stores per run: the real ones under data/ would be
+        # written to, and a stored challenge would be timed as a library hit
+        os.environ["STUDY_SET_STORE_PATH"] = os.path.join(store_dir, "study_sets.sqlite3")
+        os.environ["CHALLENGE_LIBRARY_PATH"] = os.path.join(store_dir, "challenges.sqlite3")
+        os.environ["USAGE_DB_PATH"] = os.path.join(store_dir, "usage.sqlite3")
+        if server is not None:
+            os.environ["GROQ_BASE_URL"] = server.base_url
+            os.environ["LLM_PROVIDER"] = "groq"
+            if args.backends > 1:
+                model = os.environ.get("GROQ_MODEL", "llama-3.3-70b-versatile")
+                for i in range(args.backends):
+                    os.environ[f"BENCHMARK_KEY_{i}"] = f"benchmark-stub-key-{i}"
+                os.environ["GROQ_BACKENDS"] = ",".join(
+                    f"BENCHMARK_KEY_{i}:{model}" for i in range(args.backends)
+                )
+        else:
+            os.environ["LLM_PROVIDER"] = args.provider
+            os.environ["LLM_SYNTHETIC_LATENCY_MS"] = str(args.latency_ms)
+            os.environ["LLM_REPLAY_LATENCY"] = "True"
+            if args.replay_path:
+                os.environ["LLM_REPLAY_PATH"] = args.replay_path
+
+        from app.main import create_app
+        app = create_app()
+
+        scenarios = build_scenarios(args.quiz_questions, args.interview_questions)
+        selected = args.scenarios or list(scenarios)
+
+        results: Dict[str, Any] = {}
+        for name in selected:
+            results[name] = run_scenario(
+                app, scenarios[name], args.requests, args.concurrency, args.allow_errors
+            )
+            lat = results[name]["latency_ms"]
+            print(
+                f"{name:28s} {results[name]['throughput_rps']:8.2f} req/s  "
+                f"p50 {lat['p50']:8.1f} ms  p95 {lat['p95']:8.1f} ms  p99 {lat['p99']:8.1f} ms  "
+                f"rss {results[name]['peak_rss_mb']:7.1f} MB  errors {results[name]['error_rate']:.2%}"
+            )
+
+        stub_stats = server.stats.snapshot() if server is not None else None
+
+        # Write pending usage while its database still exists
+        from app.utils.usage_ledger import usage_ledger
+        if usage_ledger.enabled:
+            usage_ledger.flush()
+
+    commit = git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": vars(args),
+            "stub": stub_stats,
+        },
+        "results": results,
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{commit or 'nogit'}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Production gunicorn configuration for StudyGenie AI Backend
+
+Loaded automatically by `gunicorn app.main:app` from the project root.
+Requests spend most of their time waiting on Groq, so each worker runs
+a thread pool (gthread) rather than one request per process.
+
+Environment:
+    PORT              Port to bind (default 5000)
+    WEB_CONCURRENCY   Worker processes (default 2)
+    GUNICORN_THREADS  Threads per worker (default 16; at least
+                      ADMISSION_MAX_IN_FLIGHT + ADMISSION_QUEUE_SIZE
+                      so queued requests have a thread to wait on)
+    GUNICORN_TIMEOUT  Worker timeout in seconds (default 120)
+    GUNICORN_GRACEFUL_TIMEOUT
+                      Seconds a stopping worker (restart, or recycling
+                      past MEMORY_HIGH_WATER_MB) waits for in-flight
+                      requests (default REQUEST_DEADLINE + 5)
+    GUNICORN_PRELOAD  Load the app and heavy imports in the master
+                      before forking (default True)
+"""
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+# Long enough for in-flight requests to finish when a worker is recycled
+graceful_timeout = int(os.getenv(
+    "GUNICORN_GRACEFUL_TIMEOUT", int(float(os.getenv("REQUEST_DEADLINE", 100))) + 5
+))
+keepalive = 5
+
+# Heartbeat files on tmpfs avoid stalls on slow container filesystems
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+preload_app = os.getenv("GUNICORN_PRELOAD", "True").lower() == "true"
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    # Runs in the master after the app is loaded and before workers fork
+    if not preload_app:
+        return
+    from app.utils.startup import warm_imports
+
+    timings = warm_imports()
+    summary = ", ".join(f"{name}={seconds * 1000:.0f}ms" for name, seconds in timings.items())
+    server.log.info(f"[STARTUP] Preloaded {summary}")
+
+
+def post_fork(server, worker):
+    from app.utils import memory
+    from app.utils.executors import start_pdf_executor
+    from app.utils.startup import reset_after_fork
+
+    reset_after_fork()
+
+    # Before the worker starts its threads, so the forkserver that starts
+    # the PDF pool processes is not forked from a threaded process
+    start_pdf_executor()
+
+    # The master replaces a worker that recycles itself past MEMORY_HIGH_WATER_MB
+    memory.enable_recycling()
+
+
+def worker_exit(server, worker):
+    # Write usage aggregated since the last periodic flush
+    from app.utils.usage_ledger import usage_ledger
+
+    if usage_ledger.enabled:
+        usage_ledger.flush()
@@ -0,0 +1,64 @@
+"""
+Compression/ETag hook together with the debug timing hook
+"""
+import gzip
+import json
+import os
+
+os.environ.setdefault("LLM_PROVIDER", "synthetic")
+
+import pytest
+
+from app.config import Config
+from app.main import create_app
+from app.utils.compression import EncodedPayload, content_hash, payload_response
+from app.utils.profiling import TIMING_HEADER
+
+
+class ProfilingConfig(Config):
+    PROFILING_ENABLED = True
+
+
+@pytest.fixture
+def client():
+    app = create_app(ProfilingConfig)
+    body = json.dumps({"items": ["x" * 40] * 100}).encode()
+
+    @app.route("/test/payload")
+    def payload():
+        return payload_response(EncodedPayload(body))
+
+    return app.test_client()
+
+
+def test_compressed_payload_keeps_debug_timing(client):
+    response = client.get("/test/payload", headers={TIMING_HEADER: "1", "Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    body = json.loads(gzip.decompress(response.get_data()))
+    assert "debug_timing" in body
+    assert len(body["items"]) == 100
+
+
+def test_uncompressed_payload_etag_matches_body(client):
+    response = client.get("/test/payload", headers={TIMING_HEADER: "1", "Accept-Encoding": "identity"})
+
+    assert response.status_code == 200
+    assert "Content-Encoding" not in response.headers
+    assert "debug_timing" in response.get_json()
+    assert response.get_etag()[0] == content_hash(response.get_data())
+
+    # The ETag validates the body that was sent, not the cached payload
+    cached = client.get("/test/payload", headers={"If-None-Match": response.headers["ETag"]})
+    assert cached.status_code == 200
+
+
+def test_payload_without_debug_timing_answers_conditional_get(client):
+    response = client.get("/test/payload", headers={"Accept-Encoding": "identity"})
+    assert "debug_timing" not in response.get_json()
+
+    cached = client.get(
+        "/test/payload", headers={"Accept-Encoding": "identity", "If-None-Match": response.headers["ETag"]}
+    )
+    assert cached.status_code == 304